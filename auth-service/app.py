@@ -1,20 +1,30 @@
+import os
+import sys
 import sqlite3
 import jwt
 import bcrypt
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 from typing import Optional
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import strawberry
-from strawberry.fastapi import GraphQLRouter
+from strawberry.dataloader import DataLoader
 
-# Konfigurasi Keamanan
-SECRET_KEY = "apotek-iae-secret-key-2025"
-ALGORITHM = "HS256"
+# Modul bersama antar service ada di root repo (folder shared/)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.db import Database
+from shared.auth import SECRET_KEY, ALGORITHM, AuthContext, get_auth_context
+from shared.metrics import MetricsExtension, metrics_endpoint
+from shared.tracing import TracingExtension, TracingMiddleware, traces_endpoint
+from shared.persisted_queries import PersistedQueryRouter, document_cache_extensions
+import passwords
 
 # Inisialisasi Database
+db = Database("auth_db.sqlite")
+
 def init_db():
-    conn = sqlite3.connect("auth_db.sqlite")
+    conn = db.connection()
     conn.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -30,8 +40,6 @@ def init_db():
     hashed = bcrypt.hashpw("apotek123".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
     conn.execute("INSERT OR IGNORE INTO users (username, email, password_hash, full_name, nim, role) VALUES (?,?,?,?,?,?)",
                  ("admin_naufal", "admin@apotek.com", hashed, "Naufal Admin", "102022300001", "admin"))
-    conn.commit()
-    conn.close()
 
 init_db()
 
@@ -49,6 +57,18 @@ class AuthPayload:
     token: str
     user: User
 
+# DataLoader per request: beberapa userById dalam satu operasi digabung jadi satu query
+async def load_users_by_id(ids):
+    placeholders = ", ".join("?" for _ in ids)
+    rows = await db.run(db.fetchall, f"SELECT * FROM users WHERE id IN ({placeholders})", list(ids))
+    by_id = {str(r["id"]): r for r in rows}
+    return [by_id.get(str(i)) for i in ids]
+
+async def get_context(request: Request) -> AuthContext:
+    context = await get_auth_context(request)
+    context["user_by_id"] = DataLoader(load_fn=load_users_by_id)
+    return context
+
 @strawberry.type
 class Query:
     @strawberry.field
@@ -65,24 +85,18 @@ class Query:
         )
 
     @strawberry.field
-    def userById(self, id: strawberry.ID) -> Optional[User]:
-        conn = sqlite3.connect("auth_db.sqlite")
-        conn.row_factory = sqlite3.Row
-        u = conn.execute("SELECT * FROM users WHERE id = ?", (id,)).fetchone()
-        conn.close()
+    async def userById(self, info, id: strawberry.ID) -> Optional[User]:
+        u = await info.context["user_by_id"].load(str(id))
         if u: return User(id=str(u["id"]), username=u["username"], email=u["email"], fullName=u["full_name"], nim=u["nim"], role=u["role"])
         return None
 
 @strawberry.type
 class Mutation:
     @strawberry.mutation
-    def login(self, username: str, password: str) -> Optional[AuthPayload]:
-        conn = sqlite3.connect("auth_db.sqlite")
-        conn.row_factory = sqlite3.Row
-        u = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
-        conn.close()
-        
-        if u and bcrypt.checkpw(password.encode('utf-8'), u["password_hash"].encode('utf-8')):
+    async def login(self, username: str, password: str) -> Optional[AuthPayload]:
+        u = await db.run(db.fetchone, "SELECT * FROM users WHERE username = ?", (username,))
+
+        if u and await passwords.check_password(password, u["password_hash"]):
             payload = {
                 "sub": str(u["id"]),
                 "username": u["username"],
@@ -99,41 +113,37 @@ class Mutation:
         return None
 
     @strawberry.mutation
-    def register(self, username: str, email: str, password: str) -> str:
-        conn = sqlite3.connect("auth_db.sqlite")
+    async def register(self, username: str, email: str, password: str) -> str:
         try:
-            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            hashed = await passwords.hash_password(password)
             # Default role='customer', full_name/nim kosong
-            conn.execute("INSERT INTO users (username, email, password_hash, full_name, nim, role) VALUES (?,?,?,?,?,?)",
+            await db.run(db.execute, "INSERT INTO users (username, email, password_hash, full_name, nim, role) VALUES (?,?,?,?,?,?)",
                         (username, email, hashed, "", "", "customer"))
-            conn.commit()
             return "Registrasi berhasil (Customer)"
         except sqlite3.IntegrityError:
             return "Username sudah digunakan"
         except Exception as e:
             return f"Error: {str(e)}"
-        finally:
-            conn.close()
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+schema = strawberry.Schema(query=Query, mutation=Mutation, extensions=document_cache_extensions() + [MetricsExtension, TracingExtension])
 
-async def get_context(request: Request):
-    auth = request.headers.get("Authorization")
-    if auth:
-        try:
-            payload = jwt.decode(auth.replace("Bearer ", ""), SECRET_KEY, algorithms=[ALGORITHM])
-            return {"user": payload}
-        except: pass
-    return {"user": None}
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    db.close_all()
+    passwords.shutdown()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TracingMiddleware, service="auth-service")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 from fastapi.responses import RedirectResponse
 @app.get("/")
 def root():
     return RedirectResponse(url="/graphql")
-app.include_router(GraphQLRouter(schema, context_getter=get_context), prefix="/graphql")
+app.include_router(PersistedQueryRouter(schema, context_getter=get_context), prefix="/graphql")
+app.add_route("/metrics", metrics_endpoint)
+app.add_route("/traces", traces_endpoint)
 
 if __name__ == "__main__":
     import uvicorn
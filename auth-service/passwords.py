@@ -0,0 +1,54 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+# Hashing bcrypt butuh ratusan ms CPU; dijalankan di thread pool khusus (bcrypt melepas GIL)
+# dengan batas antrian agar lonjakan login tidak menahan request GraphQL lain.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "16"))
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", "5"))
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_slots = None
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+async def _run(fn, *args):
+    global _slots
+    if _slots is None:
+        # Dibuat di dalam event loop yang sedang berjalan (bukan saat import)
+        _slots = asyncio.Semaphore(HASH_MAX_PENDING)
+    try:
+        await asyncio.wait_for(_slots.acquire(), timeout=HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PasswordHasherBusy("Server sedang sibuk, silakan coba lagi")
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, fn, *args)
+    finally:
+        _slots.release()
+
+
+def _hash(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _check(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+async def hash_password(password):
+    return await _run(_hash, password)
+
+
+async def check_password(password, password_hash):
+    return await _run(_check, password, password_hash)
+
+
+def shutdown():
+    _executor.shutdown(wait=False)
@@ -0,0 +1,80 @@
+"""Micro-benchmark overhead auth context per request GraphQL.
+
+Membandingkan get_context lama (jwt.decode di setiap request) dengan
+AuthContext di shared/auth.py (decode lazy + cache klaim per token).
+
+Jalankan dari root repo: python benchmarks/bench_auth_context.py
+"""
+import asyncio
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import jwt
+from shared.auth import SECRET_KEY, ALGORITHM, AuthContext, claims_cache
+
+ITERATIONS = 20000
+
+
+class FakeRequest:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+async def old_get_context(request):
+    # Salinan get_context sebelum shared/auth.py
+    auth = request.headers.get("Authorization")
+    if auth:
+        try:
+            token = auth.replace("Bearer ", "")
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            return {"user": payload, "token": token}
+        except Exception:
+            pass
+    return {"user": None, "token": None}
+
+
+def make_token():
+    payload = {
+        "sub": "1",
+        "username": "admin_naufal",
+        "role": "admin",
+        "email": "admin@apotek.com",
+        "nim": "102022300001",
+        "exp": datetime.utcnow() + timedelta(hours=8),
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def bench(label, fn):
+    seconds = timeit.timeit(fn, number=ITERATIONS)
+    print(f"{label:<48} {seconds / ITERATIONS * 1e6:8.2f} us/request")
+
+
+def main():
+    request = FakeRequest({"Authorization": f"Bearer {make_token()}"})
+    loop = asyncio.new_event_loop()
+
+    bench("lama: decode setiap request", lambda: loop.run_until_complete(old_get_context(request)))
+
+    # Resolver tidak membaca user (health, katalog): tidak ada decode sama sekali
+    bench("baru: resolver tidak membaca user", lambda: AuthContext(request.headers["Authorization"]))
+
+    # Resolver membaca user, token sama berulang (cache hit)
+    claims_cache.clear()
+    bench("baru: resolver membaca user (cache hit)", lambda: AuthContext(request.headers["Authorization"]).user)
+
+    # Resolver membaca user, cache dikosongkan tiap kali (cache miss, batas atas)
+    def miss():
+        claims_cache.clear()
+        return AuthContext(request.headers["Authorization"]).user
+    bench("baru: resolver membaca user (cache miss)", miss)
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
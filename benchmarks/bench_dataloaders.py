@@ -0,0 +1,105 @@
+"""Hitung jumlah statement SQL untuk query GraphQL dengan banyak alias.
+
+Membandingkan resolusi per item (DataLoader dengan max_batch_size=1 dan tanpa cache,
+setara resolver lama yang query satu per satu) dengan DataLoader per request di
+auth-service & inventory-service (semua lookup digabung jadi satu query IN).
+
+Yang dihitung hanya statement yang dikirim kode service; statement internal SQLite (trigger,
+shadow table FTS5) tidak dihitung. Batas jumlah statement (regresi ke N+1) diperiksa oleh
+tests/test_dataloader_statements.py yang memakai count_statements dari sini.
+
+Jalankan dari root repo: python benchmarks/bench_dataloaders.py
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT)
+
+# Satu thread database agar satu trace callback menangkap semua statement
+os.environ["DB_POOL_SIZE"] = "1"
+
+ALIASES = (1, 10, 50)
+
+
+def is_service_statement(sql):
+    # Statement bertingkat (trigger, virtual table) diawali "--"; FTS5 juga membaca tabel
+    # config/shadow-nya sendiri (nama skema dikutip: 'main'.)
+    sql = sql.lstrip()
+    return not sql.startswith("--") and "'main'." not in sql
+
+
+class FakeRequest:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+def load_service(name):
+    # Import app.py service di direktori sementara (database SQLite dibuat di sana)
+    service_dir = os.path.join(ROOT, name)
+    sys.path.insert(0, service_dir)
+    spec = importlib.util.spec_from_file_location(f"{name.replace('-', '_')}_app", os.path.join(service_dir, "app.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    sys.path.remove(service_dir)
+    return module
+
+
+async def count_statements(service, query, per_item_loaders):
+    statements = []
+    await service.db.run(lambda: service.db.connection().set_trace_callback(statements.append))
+
+    context = await service.get_context(FakeRequest())
+    if per_item_loaders:
+        for key, loader in list(context.extras.items()):
+            context[key] = type(loader)(load_fn=loader.load_fn, max_batch_size=1, cache=False)
+
+    result = await service.schema.execute(query, context_value=context)
+    assert not result.errors, result.errors
+    await service.db.run(lambda: service.db.connection().set_trace_callback(None))
+    return sum(1 for sql in statements if is_service_statement(sql))
+
+
+async def report(label, service, make_query):
+    print(label)
+    for n in ALIASES:
+        query = make_query(n)
+        before = await count_statements(service, query, per_item_loaders=True)
+        after = await count_statements(service, query, per_item_loaders=False)
+        print(f"  {n:>3} alias: {before:>4} statement per item -> {after:>2} statement dengan DataLoader")
+
+
+async def main():
+    workdir = tempfile.mkdtemp(prefix="bench_dataloaders_")
+    os.chdir(workdir)
+
+    auth = load_service("auth-service")
+    await report(
+        "auth-service userById",
+        auth,
+        lambda n: "{ " + " ".join(f'u{i}: userById(id: "{i % 3 + 1}") {{ username }}' for i in range(n)) + " }"
+    )
+
+    inventory = load_service("inventory-service")
+    names = ["Paracetamol", "amoxicillin", "Seretide", "para"]
+    await report(
+        "inventory-service checkStock",
+        inventory,
+        lambda n: "{ " + " ".join(f'm{i}: checkStock(medicineName: "{names[i % len(names)]}") {{ stock }}' for i in range(n)) + " }"
+    )
+    await report(
+        "inventory-service medicine(id)",
+        inventory,
+        lambda n: "{ " + " ".join(f'm{i}: medicine(id: "{i % 2 + 1}") {{ name isAvailable }}' for i in range(n)) + " }"
+    )
+
+    auth.db.close_all()
+    inventory.db.close_all()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
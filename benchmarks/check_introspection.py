@@ -0,0 +1,47 @@
+"""Pastikan query introspection (__typename, __schema, __type) berjalan di semua service.
+
+MetricsExtension & TracingExtension dipanggil untuk setiap field, termasuk field meta yang
+tidak ada di parent_type.fields; query ini gagal jika extension tidak menanganinya.
+Dijalankan dengan span ter-sampling agar jalur TracingExtension ikut diperiksa.
+
+Jalankan dari root repo: python benchmarks/check_introspection.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+# bench_dataloaders juga menambahkan root repo ke sys.path (untuk import shared)
+from bench_dataloaders import load_service
+
+from shared.tracing import start_span
+
+SERVICES = ("auth-service", "inventory-service", "transaction-service", "hospital-mock")
+
+QUERY = """
+{
+    __typename
+    __schema { queryType { name } }
+    __type(name: "Query") { name fields { name } }
+}
+"""
+
+
+async def main():
+    os.chdir(tempfile.mkdtemp(prefix="check_introspection_"))
+    failed = False
+    for name in SERVICES:
+        service = load_service(name)
+        with start_span("check_introspection", traceparent=f"00-{'1' * 32}-{'2' * 16}-01"):
+            result = await service.schema.execute(QUERY)
+        if result.errors:
+            failed = True
+            print(f"{name}: GAGAL {[str(e) for e in result.errors]}")
+        else:
+            print(f"{name}: OK ({result.data['__schema']['queryType']['name']})")
+        service.db.close_all()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
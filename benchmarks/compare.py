@@ -0,0 +1,43 @@
+"""Bandingkan dua hasil benchmarks/loadtest.py (mis. sebelum dan sesudah sebuah commit).
+
+Jalankan dari root repo: python benchmarks/compare.py lama.json baru.json
+"""
+import json
+import sys
+
+METRICS = ("throughput_per_s", "p50_ms", "p95_ms", "p99_ms")
+
+
+def change(old, new):
+    if old in (None, 0) or new is None:
+        return "-"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    print(f"{'operasi':<16}" + "".join(f"{m:>28}" for m in METRICS))
+    names = list(new["operations"]) + ["TOTAL"]
+    for name in names:
+        a = old["total"] if name == "TOTAL" else old["operations"].get(name)
+        b = new["total"] if name == "TOTAL" else new["operations"].get(name)
+        if not a or not b:
+            continue
+        cells = []
+        for m in METRICS:
+            if a[m] is None or b[m] is None:
+                cells.append(f"{'-':>28}")
+            else:
+                cells.append(f"{f'{a[m]:.1f} -> {b[m]:.1f} ({change(a[m], b[m])})':>28}")
+        print(f"{name:<16}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    main(sys.argv[1], sys.argv[2])
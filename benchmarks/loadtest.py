@@ -0,0 +1,402 @@
+"""Load test seluruh service (auth, inventory, transaction, hospital-mock).
+
+Menjalankan keempat service di port lokal dengan database sementara berisi data
+dalam jumlah realistis, lalu menjalankan workload campuran (login, katalog,
+preview, checkout, dashboard) dan melaporkan throughput serta latensi
+p50/p95/p99 per operasi. Hasil disimpan sebagai JSON agar bisa dibandingkan
+antar commit dengan benchmarks/compare.py.
+
+Jalankan dari root repo:
+    python benchmarks/loadtest.py                      # skala penuh
+    python benchmarks/loadtest.py --quick              # data kecil, cepat
+    python benchmarks/loadtest.py --duration 60 --concurrency 64 --output hasil.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+SERVICES = ("auth-service", "inventory-service", "transaction-service", "hospital-mock")
+
+# Bobot workload campuran (kira-kira pola pemakaian frontend)
+WORKLOAD = {
+    "login": 5,
+    "catalog_page": 25,
+    "catalog_search": 15,
+    "preview": 25,
+    "checkout": 10,
+    "dashboard": 20,
+}
+
+STEMS = [
+    "Paracetamol", "Amoxicillin", "Ibuprofen", "Cetirizine", "Omeprazole", "Metformin", "Amlodipine",
+    "Simvastatin", "Loratadine", "Ciprofloxacin", "Salbutamol", "Dexamethasone", "Ranitidine",
+    "Captopril", "Furosemide", "Lansoprazole", "Azithromycin", "Cefadroxil", "Mefenamic", "Ambroxol",
+]
+FORMS = ["Tablet", "Kapsul", "Sirup", "Salep", "Injeksi", "Tetes"]
+CATEGORIES = ["Bebas", "Bebas Terbatas", "Keras", "Psikotropika", "Herbal"]
+
+
+# ---------------------------------------------------------------------------
+# Seed data
+# ---------------------------------------------------------------------------
+
+def medicine_name(i):
+    return f"{STEMS[i % len(STEMS)]} {FORMS[(i // len(STEMS)) % len(FORMS)]} {(i % 9 + 1) * 50}mg #{i:05d}"
+
+
+def seed_inventory(path, count):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS medicines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            stock INTEGER,
+            price REAL,
+            category TEXT
+        )
+    """)
+    rng = random.Random(1)
+    conn.executemany(
+        "INSERT INTO medicines (id, name, stock, price, category) VALUES (?, ?, ?, ?, ?)",
+        ((i + 1, medicine_name(i), 1_000_000, rng.randrange(1000, 200000, 500), rng.choice(CATEGORIES)) for i in range(count))
+    )
+    conn.commit()
+    conn.close()
+
+
+def seed_transactions(path, count, days=120):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prescription_id TEXT,
+            total_price REAL,
+            status TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    rng = random.Random(2)
+    now = datetime.now()
+    conn.executemany(
+        "INSERT INTO transactions (prescription_id, total_price, status, created_at) VALUES (?, ?, 'PAID', ?)",
+        (
+            (f"HIST-{i:07d}", rng.randrange(5000, 500000, 500),
+             (now - timedelta(seconds=rng.randrange(days * 86400))).strftime("%Y-%m-%d %H:%M:%S"))
+            for i in range(count)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def seed_prescriptions(path, count, medicines):
+    rng = random.Random(3)
+    prescriptions = {}
+    for i in range(count):
+        items = rng.sample(range(medicines), rng.randint(1, min(4, medicines)))
+        prescriptions[f"BENCH-{i:05d}"] = {
+            "patient": f"Pasien {i}",
+            "doctor": f"Dr. {STEMS[i % len(STEMS)]}",
+            "medicines": [{"id": str(m + 1), "name": medicine_name(m), "qty": rng.randint(1, 3)} for m in items],
+        }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(prescriptions, f)
+    return list(prescriptions)
+
+
+# ---------------------------------------------------------------------------
+# Service lifecycle
+# ---------------------------------------------------------------------------
+
+class ServiceMesh:
+    def __init__(self, workdir, base_port):
+        self.workdir = workdir
+        self.ports = {name: base_port + i for i, name in enumerate(SERVICES)}
+        self.processes = []
+
+    def url(self, service):
+        return f"http://127.0.0.1:{self.ports[service]}/graphql"
+
+    def start(self, prescriptions_file):
+        env = dict(
+            os.environ,
+            INVENTORY_URL=self.url("inventory-service"),
+            HOSPITAL_URL=self.url("hospital-mock"),
+            MOCK_PRESCRIPTIONS_FILE=prescriptions_file,
+            TRACE_FILE="",
+            TRACE_SAMPLE_RATE=os.getenv("TRACE_SAMPLE_RATE", "0"),
+        )
+        for name in SERVICES:
+            cwd = os.path.join(self.workdir, name)
+            os.makedirs(cwd, exist_ok=True)
+            log = open(os.path.join(cwd, "service.log"), "w")
+            self.processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", os.path.join(ROOT, name),
+                 "--port", str(self.ports[name]), "--log-level", "warning"],
+                cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT,
+            ))
+
+    async def wait_ready(self, timeout=600):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            for name in SERVICES:
+                while True:
+                    try:
+                        resp = await client.post(self.url(name), json={"query": "{ __typename }"}, timeout=5)
+                        if resp.status_code == 200:
+                            break
+                    except httpx.HTTPError:
+                        pass
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"{name} tidak siap, lihat {self.workdir}/{name}/service.log")
+                    await asyncio.sleep(0.5)
+
+    def stop(self):
+        for proc in self.processes:
+            proc.terminate()
+        for proc in self.processes:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+# ---------------------------------------------------------------------------
+# Workload
+# ---------------------------------------------------------------------------
+
+class Workload:
+    def __init__(self, mesh, client, token, prescription_ids, medicines):
+        self.mesh = mesh
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.prescription_ids = prescription_ids
+        self.medicines = medicines
+        self.checkout_index = 0
+
+    async def graphql(self, service, query, variables=None, headers=None):
+        resp = await self.client.post(self.mesh.url(service), json={"query": query, "variables": variables or {}}, headers=headers)
+        resp.raise_for_status()
+        payload = resp.json()
+        if payload.get("errors"):
+            raise RuntimeError(payload["errors"][0]["message"])
+        return payload["data"]
+
+    async def login(self):
+        data = await self.graphql(
+            "auth-service", "mutation Login($u: String!, $p: String!) { login(username: $u, password: $p) { token } }",
+            {"u": "admin_naufal", "p": "apotek123"}
+        )
+        if not data["login"]:
+            raise RuntimeError("login gagal")
+
+    async def catalog_page(self):
+        await self.graphql(
+            "inventory-service",
+            "query Page($category: String, $sortBy: MedicineSortField!) { medicinesPage(first: 50, category: $category, sortBy: $sortBy) { items { id name stock price category isAvailable } pageInfo { endCursor hasNextPage } } }",
+            {"category": random.choice(CATEGORIES + [None]), "sortBy": random.choice(["NAME", "STOCK", "PRICE"])}
+        )
+
+    async def catalog_search(self):
+        await self.graphql(
+            "inventory-service",
+            "query Search($q: String!) { searchMedicines(query: $q, first: 20) { id name stock price } }",
+            {"q": random.choice(STEMS)[:random.randint(3, 8)]}
+        )
+
+    async def preview(self):
+        data = await self.graphql(
+            "transaction-service",
+            "query Preview($id: String!) { previewTransaction(prescriptionId: $id) { isSuccess message totalPrice } }",
+            {"id": random.choice(self.prescription_ids)}
+        )
+        if not data["previewTransaction"]["isSuccess"]:
+            raise RuntimeError(data["previewTransaction"]["message"])
+
+    async def checkout(self):
+        # Setiap checkout memakai resep berbeda (resep yang sudah dibayar tidak bisa dibayar ulang)
+        prescription_id = self.prescription_ids[self.checkout_index % len(self.prescription_ids)]
+        self.checkout_index += 1
+        data = await self.graphql(
+            "transaction-service",
+            "mutation Checkout($id: String!, $amount: Float!) { createTransaction(paymentAmount: $amount, prescriptionId: $id) }",
+            {"id": prescription_id, "amount": 1e9},
+            headers=self.headers
+        )
+        if not data["createTransaction"].startswith("Sukses"):
+            raise RuntimeError(data["createTransaction"])
+
+    async def dashboard(self):
+        # Sama seperti dashboard.js: statistik transaksi & inventory diambil bersamaan
+        await asyncio.gather(
+            self.graphql(
+                "transaction-service",
+                "query Dashboard($days: Int!) { dashboardStats(days: $days) { totalTransactions totalRevenue revenueChart { date value } } }",
+                {"days": random.choice([7, 30, 90])}
+            ),
+            self.graphql("inventory-service", "{ inventoryStats { medicinesCount criticalStockCount } }"),
+        )
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "throughput_per_s": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 3) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 3) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 3) if values else None,
+    }
+
+
+async def drive(workload, duration, warmup, concurrency):
+    names = list(WORKLOAD)
+    weights = [WORKLOAD[n] for n in names]
+    latencies = {n: [] for n in names}
+    errors = {n: 0 for n in names}
+    error_samples = {}
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def worker():
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                return
+            name = random.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                await getattr(workload, name)()
+                ok = True
+            except Exception as e:
+                ok = False
+                error_samples.setdefault(name, f"{type(e).__name__}: {e}")
+            if now >= measure_from:
+                if ok:
+                    latencies[name].append(time.perf_counter() - start)
+                else:
+                    errors[name] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    all_latencies = [v for n in names for v in latencies[n]]
+    return {
+        "operations": {n: summarize(latencies[n], errors[n], duration) for n in names},
+        "total": summarize(all_latencies, sum(errors.values()), duration),
+        "error_samples": error_samples,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result):
+    print(f"{'operasi':<16}{'n':>8}{'err':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(result["operations"].items()) + [("TOTAL", result["total"])]
+    for name, s in rows:
+        fmt = lambda v: f"{v:>10.2f}" if v is not None else f"{'-':>10}"
+        print(f"{name:<16}{s['count']:>8}{s['errors']:>6}{s['throughput_per_s']:>10.1f}{fmt(s['p50_ms'])}{fmt(s['p95_ms'])}{fmt(s['p99_ms'])}")
+    for name, sample in result["error_samples"].items():
+        print(f"  contoh error {name}: {sample}")
+
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix="apotek_loadtest_")
+    mesh = ServiceMesh(workdir, args.base_port)
+    try:
+        print(f"Seeding data di {workdir} ...")
+        seed_started = time.monotonic()
+        for name in SERVICES:
+            os.makedirs(os.path.join(workdir, name), exist_ok=True)
+        seed_inventory(os.path.join(workdir, "inventory-service", "inventory_db.sqlite"), args.medicines)
+        seed_transactions(os.path.join(workdir, "transaction-service", "transaction_db.sqlite"), args.transactions)
+        prescriptions_file = os.path.join(workdir, "prescriptions.json")
+        prescription_ids = seed_prescriptions(prescriptions_file, args.prescriptions, args.medicines)
+        print(f"  {args.medicines} obat, {args.transactions} transaksi, {args.prescriptions} resep "
+              f"({time.monotonic() - seed_started:.1f} s)")
+
+        mesh.start(prescriptions_file)
+        await mesh.wait_ready()
+
+        limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            resp = await client.post(mesh.url("auth-service"), json={
+                "query": 'mutation { login(username: "admin_naufal", password: "apotek123") { token } }'
+            })
+            token = resp.json()["data"]["login"]["token"]
+            workload = Workload(mesh, client, token, prescription_ids, args.medicines)
+            print(f"Workload {args.duration:.0f} s (warmup {args.warmup:.0f} s), concurrency {args.concurrency} ...")
+            result = await drive(workload, args.duration, args.warmup, args.concurrency)
+    finally:
+        mesh.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result["meta"] = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "keep")},
+        "workload": WORKLOAD,
+    }
+    print_report(result)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"loadtest-{result['meta']['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Hasil disimpan di {output}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--medicines", type=int, default=50_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--prescriptions", type=int, default=10_000)
+    parser.add_argument("--duration", type=float, default=30, help="lama pengukuran (detik)")
+    parser.add_argument("--warmup", type=float, default=5, help="pemanasan yang tidak diukur (detik)")
+    parser.add_argument("--concurrency", type=int, default=32, help="jumlah client virtual")
+    parser.add_argument("--base-port", type=int, default=18001)
+    parser.add_argument("--output", help="file JSON hasil (default benchmarks/results/)")
+    parser.add_argument("--keep", action="store_true", help="jangan hapus direktori data sementara")
+    parser.add_argument("--quick", action="store_true", help="data kecil dan durasi singkat untuk cek cepat")
+    args = parser.parse_args()
+    if args.quick:
+        args.medicines, args.transactions, args.prescriptions = 2_000, 20_000, 500
+        args.duration, args.warmup = 10, 2
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
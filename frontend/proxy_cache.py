@@ -0,0 +1,119 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from graphql import GraphQLError, OperationDefinitionNode, parse, print_ast
+
+
+@lru_cache(maxsize=512)
+def parse_operation(query, operation_name=None):
+    """Return (jenis operasi, query ternormalisasi) atau None jika query tidak bisa di-parse."""
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return None
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    if operation_name:
+        operations = [op for op in operations if op.name and op.name.value == operation_name]
+    if len(operations) != 1:
+        return None
+    # print_ast menghapus komentar & whitespace berbeda sehingga query yang sama punya key yang sama
+    return operations[0].operation.value, print_ast(document)
+
+
+def read_operation(body):
+    """Baca body request GraphQL. Return (jenis, query ternormalisasi, variables, operationName) atau None."""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get("query"), str):
+        return None
+    operation_name = payload.get("operationName")
+    parsed = parse_operation(payload["query"], operation_name)
+    if parsed is None:
+        return None
+    operation_type, normalized = parsed
+    variables = json.dumps(payload.get("variables") or {}, sort_keys=True, separators=(",", ":"))
+    return operation_type, normalized, variables, operation_name
+
+
+def make_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return etag in candidates or "W/" + etag in candidates
+
+
+class ResponseCache:
+    """Cache response query GraphQL (bukan mutation) di proxy frontend.
+
+    - Key: (service, query ternormalisasi, variables, operationName, role)
+    - TTL pendek per entry, ukuran dibatasi (LRU)
+    - Mutation yang lewat proxy menaikkan "generation" service terkait dan membuang entry-nya,
+      response yang mulai diambil sebelum mutation tidak akan disimpan
+    """
+
+    def __init__(self, ttl=5.0, max_size=500):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires_at, etag, body, content_type)
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, service):
+        return self._generations.get(service, 0)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key, generation, body, content_type):
+        etag = make_etag(body)
+        if self.ttl <= 0 or generation != self.generation(key[0]):
+            return etag
+        self._entries[key] = (time.monotonic() + self.ttl, etag, body, content_type)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return etag
+
+    def invalidate_service(self, service):
+        self._generations[service] = self.generation(service) + 1
+        for key in [k for k in self._entries if k[0] == service]:
+            del self._entries[key]
+        self.invalidations += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "notModified": self.not_modified,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hitRatio": self.hits / total if total else 0.0,
+        }
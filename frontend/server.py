@@ -1,10 +1,193 @@
+import asyncio
+import json
+import os
+import sys
 import uvicorn
-from fastapi import FastAPI, Request, Response
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response, WebSocket
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.responses import StreamingResponse
+from starlette.websockets import WebSocketDisconnect
 import httpx
 
-app = FastAPI()
+from proxy_cache import ResponseCache, etag_matches, read_operation
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.auth import verify_token
+from shared.tracing import TracingMiddleware, current_span, inject_traceparent, traces_endpoint
+
+# Konfigurasi proxy (connection pool & batas concurrency per service backend)
+PROXY_MAX_CONNECTIONS = int(os.getenv("PROXY_MAX_CONNECTIONS", "100"))
+PROXY_MAX_KEEPALIVE = int(os.getenv("PROXY_MAX_KEEPALIVE", "20"))
+PROXY_TIMEOUT = float(os.getenv("PROXY_TIMEOUT", "30"))
+PROXY_SERVICE_CONCURRENCY = int(os.getenv("PROXY_SERVICE_CONCURRENCY", "64"))
+PROXY_QUEUE_TIMEOUT = float(os.getenv("PROXY_QUEUE_TIMEOUT", "5"))
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+
+# Cache response query (read-only) di proxy
+PROXY_CACHE_TTL = float(os.getenv("PROXY_CACHE_TTL", "5"))
+PROXY_CACHE_SIZE = int(os.getenv("PROXY_CACHE_SIZE", "500"))
+PROXY_CACHE_SERVICES = set(os.getenv("PROXY_CACHE_SERVICES", "inventory").split(","))
+
+try:
+    import h2  # noqa: F401 - HTTP/2 hanya aktif jika paket h2 terpasang
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+try:
+    # Brotli (fallback ke gzip untuk browser yang tidak mendukung) jika paket brotli-asgi terpasang
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+try:
+    # Client WebSocket untuk meneruskan GraphQL subscription ke service backend
+    from websockets.asyncio.client import connect as ws_connect
+except ImportError:
+    ws_connect = None
+
+SERVICES = {
+    "auth": "http://localhost:8001/graphql",
+    "inventory": "http://localhost:8002/graphql",
+    "transaction": "http://localhost:8003/graphql",
+    "hospital": "http://localhost:8004/graphql"
+}
+
+# Mutation di service kiri mengubah data service kanan
+# (createTransaction memotong stok di inventory lewat panggilan antar service)
+CACHE_INVALIDATES = {
+    "inventory": ("inventory",),
+    "transaction": ("transaction", "inventory"),
+}
+
+# Subprotocol GraphQL over WebSocket yang didukung Strawberry
+WS_SUBPROTOCOLS = ("graphql-transport-ws", "graphql-ws")
+
+# Header hop-by-hop (RFC 7230) tidak boleh diteruskan proxy
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade",
+}
+
+# Satu client (connection pool) dan satu semaphore per service backend
+http_clients = {}
+service_slots = {}
+response_cache = ResponseCache(ttl=PROXY_CACHE_TTL, max_size=PROXY_CACHE_SIZE)
+
+def get_http_client(service):
+    client = http_clients.get(service)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=PROXY_MAX_CONNECTIONS,
+                max_keepalive_connections=PROXY_MAX_KEEPALIVE
+            ),
+            timeout=PROXY_TIMEOUT,
+            event_hooks={"request": [inject_traceparent]}
+        )
+        http_clients[service] = client
+    return client
+
+def get_service_slots(service):
+    slots = service_slots.get(service)
+    if slots is None:
+        slots = asyncio.Semaphore(PROXY_SERVICE_CONCURRENCY)
+        service_slots[service] = slots
+    return slots
+
+def filter_headers(headers, extra_excluded=()):
+    # Buang header hop-by-hop, termasuk yang disebut di header Connection
+    excluded = set(HOP_BY_HOP_HEADERS) | set(extra_excluded)
+    connection = headers.get("connection")
+    if connection:
+        excluded |= {h.strip().lower() for h in connection.split(",")}
+    return [(k, v) for k, v in headers.items() if k.lower() not in excluded]
+
+class UpstreamStreamingResponse(StreamingResponse):
+    """Stream response httpx (client.send(stream=True)) ke browser.
+
+    Koneksi upstream ditutup dan on_close (mis. melepas slot service) dipanggil tepat sekali
+    di finally: saat stream selesai, upstream error di tengah stream, atau client memutus
+    koneksi (BackgroundTask Starlette tidak dijalankan pada kasus error).
+    """
+
+    def __init__(self, upstream, on_close=None):
+        self.upstream = upstream
+        self.on_close = on_close
+        self._closed = False
+        super().__init__(
+            self._body(),
+            status_code=upstream.status_code,
+            # date & server ditulis ulang oleh uvicorn
+            headers=dict(filter_headers(upstream.headers, extra_excluded=("date", "server")))
+        )
+
+    async def _body(self):
+        try:
+            async for chunk in self.upstream.aiter_raw():
+                yield chunk
+        finally:
+            await self._close()
+
+    async def _close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self.on_close is not None:
+                self.on_close()
+        finally:
+            await self.upstream.aclose()
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Juga saat body belum sempat dibaca (client putus sebelum header terkirim)
+            await self._close()
+
+def has_graphql_errors(body):
+    try:
+        return bool(json.loads(body).get("errors"))
+    except (ValueError, AttributeError):
+        return True
+
+def request_role(request):
+    # Role ikut jadi bagian key cache, response bisa berbeda per role
+    authorization = request.headers.get("Authorization")
+    claims = verify_token(authorization.replace("Bearer ", "")) if authorization else None
+    return claims.get("role", "user") if claims else "anonymous"
+
+def invalidate_after_mutation(service):
+    for target in CACHE_INVALIDATES.get(service, (service,)):
+        response_cache.invalidate_service(target)
+
+def cached_response(request, etag, body, content_type, cache_status):
+    span = current_span.get()
+    if span is not None:
+        span.set_attribute("proxy.cache", cache_status)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": cache_status}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=content_type, headers=headers)
+
+@asynccontextmanager
+async def lifespan(app):
+    for service in SERVICES:
+        get_http_client(service)
+    yield
+    for client in http_clients.values():
+        await client.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+# Span per request API, traceparent diteruskan ke service backend
+app.add_middleware(TracingMiddleware, service="frontend", path_prefix="/api/")
 
 # Enable CORS
 app.add_middleware(
@@ -14,41 +197,149 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-SERVICES = {
-    "auth": "http://localhost:8001/graphql",
-    "inventory": "http://localhost:8002/graphql",
-    "transaction": "http://localhost:8003/graphql",
-    "hospital": "http://localhost:8004/graphql"
-}
+# Kompresi response (berlaku juga untuk response proxy yang di-stream)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
 
 @app.post("/api/{service}")
 async def proxy(service: str, request: Request):
     target_url = SERVICES.get(service)
     if not target_url:
         return Response("Service not found", status_code=404)
-    
+
+    # Host & content-length diatur ulang oleh httpx
+    headers = filter_headers(request.headers, extra_excluded=("host", "content-length", "if-none-match"))
+
+    # Body GraphQL kecil, dibaca utuh untuk menentukan jenis operasi (query/mutation)
     body = await request.body()
-    headers = dict(request.headers)
-    
-    # Remove host header to avoid issues
-    headers.pop("host", None)
-    headers.pop("content-length", None)
+    operation = read_operation(body)
+    operation_type = operation[0] if operation else None
 
-    async with httpx.AsyncClient() as client:
+    cache_key = None
+    if operation_type == "query" and service in PROXY_CACHE_SERVICES:
+        cache_key = (service,) + operation[1:] + (request_role(request),)
+        entry = response_cache.get(cache_key)
+        if entry is not None:
+            _, etag, cached_body, content_type = entry
+            return cached_response(request, etag, cached_body, content_type, "HIT")
+        generation = response_cache.generation(service)
+    elif operation_type == "mutation":
+        invalidate_after_mutation(service)
+
+    slots = get_service_slots(service)
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=PROXY_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return Response(f"Service '{service}' sedang sibuk", status_code=503)
+
+    client = get_http_client(service)
+
+    if cache_key is not None:
+        # Query yang bisa di-cache: response dibaca utuh agar bisa disimpan & diberi ETag
         try:
-            resp = await client.post(
-                target_url, 
-                content=body, 
-                headers=headers,
-                timeout=30.0
-            )
-            return Response(
-                content=resp.content,
-                status_code=resp.status_code,
-                headers=dict(resp.headers)
-            )
+            resp = await client.post(target_url, content=body, headers=headers)
         except Exception as e:
             return Response(f"Proxy Error: {str(e)}", status_code=502)
+        finally:
+            slots.release()
+        content_type = resp.headers.get("content-type", "application/json")
+        if resp.status_code == 200 and not has_graphql_errors(resp.content):
+            etag = response_cache.set(cache_key, generation, resp.content, content_type)
+            return cached_response(request, etag, resp.content, content_type, "MISS")
+        return Response(content=resp.content, status_code=resp.status_code, media_type=content_type)
+
+    try:
+        # Response di-stream ke browser
+        upstream_request = client.build_request("POST", target_url, content=body, headers=headers)
+        resp = await client.send(upstream_request, stream=True)
+    except Exception as e:
+        slots.release()
+        return Response(f"Proxy Error: {str(e)}", status_code=502)
+
+    def release():
+        slots.release()
+        if operation_type == "mutation":
+            # Invalidasi lagi setelah mutation selesai (query yang sempat jalan bersamaan ikut dibuang)
+            invalidate_after_mutation(service)
+
+    return UpstreamStreamingResponse(resp, on_close=release)
+
+@app.websocket("/api/{service}")
+async def proxy_websocket(websocket: WebSocket, service: str):
+    # Subscription: frame diteruskan apa adanya dua arah sampai salah satu sisi menutup koneksi
+    target_url = SERVICES.get(service)
+    if not target_url or ws_connect is None:
+        await websocket.close(code=1008 if not target_url else 1011)
+        return
+
+    subprotocols = [p for p in websocket.scope.get("subprotocols", []) if p in WS_SUBPROTOCOLS]
+    try:
+        upstream = await ws_connect(
+            "ws" + target_url[len("http"):],
+            subprotocols=subprotocols or None,
+            open_timeout=PROXY_TIMEOUT
+        )
+    except Exception as e:
+        print(f"Warning: Gagal membuka WebSocket ke {service}: {str(e)}")
+        await websocket.close(code=1011)
+        return
+    await websocket.accept(subprotocol=upstream.subprotocol)
+    client_gone = False
+
+    async def client_to_upstream():
+        nonlocal client_gone
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                client_gone = True
+                return
+            await upstream.send(message["text"] if message.get("text") is not None else message["bytes"])
+
+    async def upstream_to_client():
+        async for data in upstream:
+            if isinstance(data, bytes):
+                await websocket.send_bytes(data)
+            else:
+                await websocket.send_text(data)
+
+    tasks = [asyncio.create_task(client_to_upstream()), asyncio.create_task(upstream_to_client())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None and not isinstance(task.exception(), WebSocketDisconnect):
+                print(f"Warning: Proxy WebSocket {service} berhenti: {task.exception()!r}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await upstream.close()
+        if not client_gone:
+            try:
+                await websocket.close(code=upstream.close_code or 1000)
+            except (RuntimeError, WebSocketDisconnect):
+                # Browser sudah menutup koneksi lebih dulu
+                pass
+
+app.add_route("/traces", traces_endpoint)
+
+@app.get("/api/transaction/export")
+async def proxy_transaction_export(request: Request):
+    # Export histori transaksi (NDJSON/CSV) di-stream apa adanya; tidak memakai slot antrean
+    # service karena satu export bisa berjalan lama
+    target_url = SERVICES["transaction"].rsplit("/graphql", 1)[0] + "/transactions/export"
+    client = get_http_client("transaction")
+    headers = filter_headers(request.headers, extra_excluded=("host", "content-length", "if-none-match"))
+    try:
+        upstream_request = client.build_request("GET", target_url, params=request.query_params, headers=headers)
+        resp = await client.send(upstream_request, stream=True)
+    except Exception as e:
+        return Response(f"Proxy Error: {str(e)}", status_code=502)
+    return UpstreamStreamingResponse(resp)
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return response_cache.stats()
 
 # Mount static files
 app.mount("/", StaticFiles(directory=".", html=True), name="static")
@@ -4,7 +4,11 @@ export const GRAPHQL_URLS = {
     INVENTORY: '/api/inventory'
 };
 
-export async function fetchGraphQL(url, query, token = null) {
+// Response terakhir per request (url + token + body) beserta ETag dari proxy,
+// dipakai untuk If-None-Match agar data yang tidak berubah cukup dibalas 304
+const etagCache = new Map();
+
+export async function fetchGraphQL(url, query, token = null, variables = null) {
     const headers = {
         'Content-Type': 'application/json',
     };
@@ -15,14 +19,30 @@ export async function fetchGraphQL(url, query, token = null) {
         headers['Authorization'] = `Bearer ${authToken}`;
     }
 
+    const body = JSON.stringify(variables ? { query, variables } : { query });
+    const cacheKey = `${url}|${authToken || ''}|${body}`;
+    const cached = etagCache.get(cacheKey);
+    if (cached) {
+        headers['If-None-Match'] = cached.etag;
+    }
+
     try {
         const response = await fetch(url, {
             method: 'POST',
             headers,
-            body: JSON.stringify({ query }),
+            body,
         });
 
-        const json = await response.json();
+        let json;
+        if (response.status === 304 && cached) {
+            json = cached.json;
+        } else {
+            json = await response.json();
+            const etag = response.headers.get('ETag');
+            if (etag) {
+                etagCache.set(cacheKey, { etag, json });
+            }
+        }
 
         if (json.errors) {
             throw new Error(json.errors[0].message);
@@ -38,3 +58,49 @@ export async function fetchGraphQL(url, query, token = null) {
         throw error;
     }
 }
+
+// Subscription GraphQL lewat WebSocket (protokol graphql-transport-ws) melalui proxy /api/*.
+// Tersambung ulang otomatis; onResync dipanggil setelah tersambung ulang karena event
+// selama terputus tidak diterima (halaman sebaiknya memuat ulang datanya).
+export function subscribeGraphQL(url, query, variables, onData, onResync = null) {
+    const wsUrl = `${location.protocol === 'https:' ? 'wss:' : 'ws:'}//${location.host}${url}`;
+    const subscription = { connected: false, close: null };
+    let socket = null;
+    let closed = false;
+    let everConnected = false;
+    let retryDelay = 1000;
+
+    const connect = () => {
+        socket = new WebSocket(wsUrl, 'graphql-transport-ws');
+        socket.onopen = () => socket.send(JSON.stringify({ type: 'connection_init', payload: {} }));
+        socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'connection_ack') {
+                socket.send(JSON.stringify({ id: '1', type: 'subscribe', payload: { query, variables } }));
+                subscription.connected = true;
+                retryDelay = 1000;
+                if (everConnected && onResync) onResync();
+                everConnected = true;
+            } else if (message.type === 'next' && message.payload.data) {
+                onData(message.payload.data);
+            } else if (message.type === 'ping') {
+                socket.send(JSON.stringify({ type: 'pong' }));
+            } else if (message.type === 'error') {
+                console.error("Subscription Error:", message.payload);
+            }
+        };
+        socket.onclose = () => {
+            subscription.connected = false;
+            if (closed) return;
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        };
+    };
+
+    subscription.close = () => {
+        closed = true;
+        if (socket) socket.close();
+    };
+    connect();
+    return subscription;
+}
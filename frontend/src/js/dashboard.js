@@ -1,6 +1,6 @@
 import { Auth } from './auth.js';
 import { initLayout } from './layout.js';
-import { fetchGraphQL, GRAPHQL_URLS } from './api.js';
+import { fetchGraphQL, subscribeGraphQL, GRAPHQL_URLS } from './api.js';
 import { formatRupiah } from './utils.js';
 
 // Init
@@ -15,35 +15,51 @@ if (user) {
 const statsContainer = document.getElementById('stats-container');
 const revenueChartCtx = document.getElementById('revenueChart').getContext('2d');
 const stockChartCtx = document.getElementById('stockChart').getContext('2d');
+const revenueWindowSelect = document.getElementById('revenue-window');
+
+const STOCK_CHART_SIZE = 20;
+const CRITICAL_STOCK = 10;
 
 let revenueChartInstance = null;
 let stockChartInstance = null;
 
+// Data terakhir yang ditampilkan; subscription menerapkan delta ke sini lalu render ulang
+let currentStats = null;
+let revenueData = [];
+let stockData = [];
+
 async function loadDashboardData() {
     try {
         // Fetch Data
-        const transQuery = `query { dashboardStats { totalTransactions totalRevenue revenueChart { date value } } }`;
+        const days = parseInt(revenueWindowSelect.value) || 7;
+        const transQuery = `query { dashboardStats(days: ${days}) { totalTransactions totalRevenue revenueChart { date value } } }`;
         const transData = await fetchGraphQL(GRAPHQL_URLS.TRANSACTION, transQuery);
         const tStats = transData.dashboardStats;
 
-        const invQuery = `query { medicines { name stock } }`;
+        // Ringkasan stok dihitung di server; grafik hanya menampilkan obat dengan stok terendah
+        const invQuery = `query {
+            inventoryStats { medicinesCount criticalStockCount }
+            medicinesPage(first: ${STOCK_CHART_SIZE}, sortBy: STOCK) { items { id name stock } }
+        }`;
         const invData = await fetchGraphQL(GRAPHQL_URLS.INVENTORY, invQuery);
-        const medicines = invData.medicines || [];
+        const iStats = invData.inventoryStats;
+        const medicines = invData.medicinesPage.items || [];
 
         // Process Data
-        const criticalStock = medicines.filter(m => m.stock < 10).length;
-        const stockChartData = medicines.map(m => ({ name: m.name, stock: m.stock }));
+        stockData = medicines.map(m => ({ id: m.id, name: m.name, stock: m.stock }));
+        revenueData = tStats.revenueChart;
 
         // Render Stats
-        renderStats({
+        currentStats = {
             totalTransactions: tStats.totalTransactions,
             totalRevenue: tStats.totalRevenue,
-            medicinesCount: medicines.length,
-            criticalStockCount: criticalStock
-        });
+            medicinesCount: iStats.medicinesCount,
+            criticalStockCount: iStats.criticalStockCount
+        };
+        renderStats(currentStats);
 
         // Render Charts
-        renderCharts(tStats.revenueChart, stockChartData);
+        renderCharts(revenueData, stockData);
 
     } catch (error) {
         console.error(error);
@@ -124,4 +140,58 @@ function renderCharts(revenueData, stockData) {
     });
 }
 
+// Transaksi baru / dibatalkan: tambahkan delta ke total dan titik grafik hari tersebut
+function applyTransactionEvent(event) {
+    if (!currentStats) return;
+    currentStats.totalTransactions += event.transactionsDelta;
+    currentStats.totalRevenue += event.revenueDelta;
+    const point = revenueData.find(d => d.date === event.day);
+    if (point) {
+        point.value += event.revenueDelta;
+        revenueChartInstance.data.datasets[0].data = revenueData.map(d => d.value);
+        revenueChartInstance.update();
+    }
+    renderStats(currentStats);
+}
+
+// Perubahan stok: perbarui grafik stok dan jumlah stok kritis untuk obat yang sedang tampil
+function applyMedicineChange(change) {
+    if (!currentStats) return;
+    if (change.kind === 'CREATED' || change.kind === 'DELETED') {
+        currentStats.medicinesCount += change.kind === 'CREATED' ? 1 : -1;
+        renderStats(currentStats);
+        return;
+    }
+    const item = stockData.find(m => m.id === change.id);
+    if (!item || change.stock === null) return;
+    const wasCritical = item.stock < CRITICAL_STOCK;
+    const isCritical = change.stock < CRITICAL_STOCK;
+    item.stock = change.stock;
+    if (change.name !== null) item.name = change.name;
+    if (wasCritical !== isCritical) {
+        currentStats.criticalStockCount += isCritical ? 1 : -1;
+        renderStats(currentStats);
+    }
+    stockChartInstance.data.labels = stockData.map(d => d.name);
+    stockChartInstance.data.datasets[0].data = stockData.map(d => d.stock);
+    stockChartInstance.update();
+}
+
+subscribeGraphQL(
+    GRAPHQL_URLS.TRANSACTION,
+    `subscription { transactionEvents { day revenueDelta transactionsDelta } }`,
+    null,
+    (data) => applyTransactionEvent(data.transactionEvents),
+    loadDashboardData
+);
+subscribeGraphQL(
+    GRAPHQL_URLS.INVENTORY,
+    `subscription { medicineChanges { kind id name stock } }`,
+    null,
+    (data) => applyMedicineChange(data.medicineChanges),
+    loadDashboardData
+);
+
+revenueWindowSelect.addEventListener('change', loadDashboardData);
+
 loadDashboardData();
@@ -1,6 +1,6 @@
 import { Auth } from './auth.js';
 import { initLayout } from './layout.js';
-import { fetchGraphQL, GRAPHQL_URLS } from './api.js';
+import { fetchGraphQL, subscribeGraphQL, GRAPHQL_URLS } from './api.js';
 
 Auth.requireAuth();
 initLayout();
@@ -11,14 +11,35 @@ const modal = document.getElementById('modal');
 const form = document.getElementById('inventory-form');
 const modalTitle = document.getElementById('modal-title');
 const editIdInput = document.getElementById('edit-id');
+const loadMoreBtn = document.getElementById('load-more-btn');
+
+const PAGE_SIZE = 50;
 
 let medicines = [];
+let endCursor = null;
+let hasNextPage = false;
+let searchTerm = '';
 
-async function loadMedicines() {
+// Katalog dimuat per halaman (cursor) dan pencarian dilakukan di server
+async function loadMedicines(append = false) {
     try {
-        const query = `query { medicines { id name stock price category } }`;
-        const data = await fetchGraphQL(GRAPHQL_URLS.INVENTORY, query);
-        medicines = data.medicines || [];
+        const query = `query ($first: Int!, $after: String, $search: String) {
+            medicinesPage(first: $first, after: $after, search: $search) {
+                items { id name stock price category }
+                pageInfo { endCursor hasNextPage }
+            }
+        }`;
+        const variables = {
+            first: PAGE_SIZE,
+            after: append ? endCursor : null,
+            search: searchTerm || null
+        };
+        const data = await fetchGraphQL(GRAPHQL_URLS.INVENTORY, query, null, variables);
+        const page = data.medicinesPage;
+        medicines = append ? medicines.concat(page.items) : page.items;
+        endCursor = page.pageInfo.endCursor;
+        hasNextPage = page.pageInfo.hasNextPage;
+        loadMoreBtn.classList.toggle('hidden', !hasNextPage);
         renderTable(medicines);
     } catch (error) {
         console.error(error);
@@ -58,16 +79,55 @@ function renderTable(data) {
     if (window.lucide) window.lucide.createIcons();
 }
 
-// Filter
+// Perubahan stok/harga dikirim server sebagai delta lewat subscription, tabel diperbarui
+// tanpa memuat ulang katalog
+function applyMedicineChange(change) {
+    const index = medicines.findIndex(m => m.id === change.id);
+    if (change.kind === 'DELETED') {
+        if (index === -1) return;
+        medicines.splice(index, 1);
+    } else if (change.kind === 'UPDATED') {
+        if (index === -1) return;
+        for (const key of ['name', 'stock', 'price', 'category']) {
+            if (change[key] !== null) medicines[index][key] = change[key];
+        }
+    } else if (change.kind === 'CREATED') {
+        // Obat baru hanya ditampilkan jika masuk rentang halaman yang sudah dimuat (urut nama)
+        if (searchTerm || index !== -1) return;
+        const last = medicines[medicines.length - 1];
+        if (hasNextPage && last && change.name.localeCompare(last.name) > 0) return;
+        const { kind, ...medicine } = change;
+        medicines.push(medicine);
+        medicines.sort((a, b) => a.name.localeCompare(b.name));
+    }
+    renderTable(medicines);
+}
+
+const medicineChanges = subscribeGraphQL(
+    GRAPHQL_URLS.INVENTORY,
+    `subscription { medicineChanges { kind id name stock price category } }`,
+    null,
+    (data) => applyMedicineChange(data.medicineChanges),
+    () => loadMedicines()
+);
+
+// Tanpa subscription aktif (mis. WebSocket diblokir) data dimuat ulang setelah perubahan
+function refreshIfNotLive() {
+    if (!medicineChanges.connected) loadMedicines();
+}
+
+// Filter (debounce agar tidak request setiap ketikan)
+let searchTimer = null;
 searchInput.addEventListener('input', (e) => {
-    const term = e.target.value.toLowerCase();
-    const filtered = medicines.filter(m =>
-        m.name.toLowerCase().includes(term) ||
-        m.category.toLowerCase().includes(term)
-    );
-    renderTable(filtered);
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        searchTerm = e.target.value.trim();
+        loadMedicines();
+    }, 300);
 });
 
+loadMoreBtn.addEventListener('click', () => loadMedicines(true));
+
 // Modal Actions
 const openModal = () => {
     modal.classList.remove('hidden');
@@ -113,7 +173,7 @@ form.addEventListener('submit', async (e) => {
             await fetchGraphQL(GRAPHQL_URLS.INVENTORY, query);
         }
         closeModal();
-        loadMedicines();
+        refreshIfNotLive();
     } catch (error) {
         alert("Gagal menyimpan data: " + error.message);
     }
@@ -142,7 +202,7 @@ tableBody.addEventListener('click', async (e) => {
             try {
                 const query = `mutation { deleteMedicine(id: "${id}") }`;
                 await fetchGraphQL(GRAPHQL_URLS.INVENTORY, query);
-                loadMedicines();
+                refreshIfNotLive();
             } catch (error) {
                 alert("Gagal menghapus data");
             }
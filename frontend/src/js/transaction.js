@@ -28,6 +28,8 @@ const resetBtn = document.getElementById('reset-btn');
 
 // State
 let prescriptionId = '';
+// Satu idempotency key per pembayaran resep: klik ganda / retry tidak memproses ulang
+let idempotencyKey = null;
 
 function showError(msg) {
     errorAlert.classList.remove('hidden');
@@ -42,13 +44,14 @@ checkForm.addEventListener('submit', async (e) => {
     e.preventDefault();
     hideError();
     prescriptionId = prescriptionIdInput.value;
+    idempotencyKey = crypto.randomUUID();
 
     checkBtn.textContent = 'Mengecek...';
     checkBtn.disabled = true;
 
     try {
         const query = `query { 
-            previewTransaction(prescriptionId: "${prescriptionId}") {
+            previewTransaction(prescriptionId: "${prescriptionId}", reserve: true) {
                 isSuccess
                 message
                 patientName
@@ -96,14 +99,19 @@ payBtn.addEventListener('click', async () => {
     if (!payment) return alert("Masukkan nominal pembayaran!");
 
     hideError();
+    if (payBtn.disabled) return;
     payBtn.textContent = 'Memproses...';
     payBtn.disabled = true;
 
     try {
-        const query = `mutation { 
-            createTransaction(paymentAmount: ${payment}, prescriptionId: "${prescriptionId}") 
+        const query = `mutation Checkout($payment: Float!, $prescriptionId: String!, $idempotencyKey: String) {
+            createTransaction(paymentAmount: $payment, prescriptionId: $prescriptionId, idempotencyKey: $idempotencyKey)
         }`;
-        const data = await fetchGraphQL(GRAPHQL_URLS.TRANSACTION, query);
+        const data = await fetchGraphQL(GRAPHQL_URLS.TRANSACTION, query, null, {
+            payment,
+            prescriptionId,
+            idempotencyKey,
+        });
         const resultMessage = data.createTransaction;
 
         if (resultMessage.includes("Error")) {
@@ -123,6 +131,7 @@ payBtn.addEventListener('click', async () => {
 
 // RESET
 function reset() {
+    idempotencyKey = null;
     stepInput.classList.remove('hidden');
     stepPreview.classList.add('hidden');
     stepSuccess.classList.add('hidden');
@@ -1,9 +1,23 @@
+import asyncio
+import json
+import os
+import random
+import sys
 import strawberry
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from fastapi import FastAPI
-from strawberry.fastapi import GraphQLRouter
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
-# Mock Data - Data Resep untuk Testing
+# Modul bersama antar service ada di root repo (folder shared/)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.db import Database
+from shared.metrics import MetricsExtension, metrics_endpoint
+from shared.tracing import TracingExtension, TracingMiddleware, traces_endpoint
+from shared.persisted_queries import PersistedQueryRouter, document_cache_extensions
+import store
+
+# Mock Data - Data Resep untuk Testing (ditulis ke hospital_db.sqlite saat start jika belum ada)
 MOCK_PRESCRIPTIONS = {
     "RS-1001": {
         "patient": "Budi Santoso",
@@ -32,6 +46,36 @@ MOCK_PRESCRIPTIONS = {
     }
 }
 
+# Batas jumlah ID per panggilan validatePrescriptions
+MAX_BATCH_SIZE = int(os.getenv("MOCK_MAX_BATCH_SIZE", "500"))
+
+db = Database("hospital_db.sqlite")
+
+def init_db():
+    conn = db.connection()
+    store.init_store(conn)
+    store.import_prescriptions(conn, MOCK_PRESCRIPTIONS, replace=False)
+    # Resep tambahan dari file JSON (format sama dengan MOCK_PRESCRIPTIONS), mis. fixture benchmark.
+    # Untuk volume besar lebih cepat pakai seeder: python store.py --count 100000
+    mock_file = os.getenv("MOCK_PRESCRIPTIONS_FILE")
+    if mock_file:
+        with open(mock_file, encoding="utf-8") as f:
+            store.import_prescriptions(conn, json.load(f))
+
+init_db()
+
+# Injeksi gangguan untuk menguji ketahanan Transaction Service secara lokal.
+# Bisa diubah saat berjalan lewat POST /faults, mis. {"latency_ms": 2000, "failure_rate": 0.3}
+FAULTS = {
+    "latency_ms": float(os.getenv("MOCK_LATENCY_MS", "0")),
+    "latency_jitter_ms": float(os.getenv("MOCK_LATENCY_JITTER_MS", "0")),
+    # Sebagian kecil request dibuat sangat lambat (ekor latensi, untuk menguji hedging)
+    "slow_rate": float(os.getenv("MOCK_SLOW_RATE", "0")),
+    "slow_ms": float(os.getenv("MOCK_SLOW_MS", "5000")),
+    "failure_rate": float(os.getenv("MOCK_FAILURE_RATE", "0")),
+    "failure_status": int(os.getenv("MOCK_FAILURE_STATUS", "503")),
+}
+
 @strawberry.type
 class MedicineItem:
     id: str
@@ -41,6 +85,7 @@ class MedicineItem:
 @strawberry.type
 class PrescriptionResult:
     isValid: bool
+    id: Optional[str] = None
     patientName: Optional[str] = None
     medicines: Optional[List[MedicineItem]] = None
 
@@ -51,31 +96,96 @@ class Prescription:
     doctorName: str
     medicines: List[MedicineItem]
 
+def to_medicine_items(data):
+    return [MedicineItem(id=m["id"], name=m["name"], qty=m["qty"]) for m in data["medicines"]]
+
+def to_result(id, data):
+    if data is None:
+        return PrescriptionResult(isValid=False, id=id, patientName=None, medicines=None)
+    return PrescriptionResult(isValid=True, id=id, patientName=data["patient"], medicines=to_medicine_items(data))
+
 @strawberry.type
 class Query:
     @strawberry.field
-    def validatePrescription(self, id: str) -> PrescriptionResult:
-        if id in MOCK_PRESCRIPTIONS:
-            data = MOCK_PRESCRIPTIONS[id]
-            meds = [MedicineItem(id=m["id"], name=m["name"], qty=m["qty"]) for m in data["medicines"]]
-            return PrescriptionResult(isValid=True, patientName=data["patient"], medicines=meds)
-        return PrescriptionResult(isValid=False, patientName=None, medicines=None)
+    async def validatePrescription(self, id: str) -> PrescriptionResult:
+        found = await db.run(lambda: store.fetch_many(db.connection(), [id]))
+        return to_result(id, found.get(id))
+
+    @strawberry.field
+    async def validatePrescriptions(self, ids: List[str]) -> List[PrescriptionResult]:
+        # Validasi banyak resep dalam satu request; hasil berurutan sesuai ids
+        if len(ids) > MAX_BATCH_SIZE:
+            raise Exception(f"Maksimal {MAX_BATCH_SIZE} resep per permintaan")
+        found = await db.run(lambda: store.fetch_many(db.connection(), ids))
+        return [to_result(pid, found.get(pid)) for pid in ids]
 
     @strawberry.field
-    def allPrescriptions(self) -> List[Prescription]:
+    async def allPrescriptions(self, first: Optional[int] = None, after: Optional[str] = None) -> List[Prescription]:
+        # Tanpa first: semua resep (perilaku lama); dengan first/after: halaman berdasarkan id
+        rows = await db.run(lambda: store.fetch_page(db.connection(), first, after))
         return [
             Prescription(
-                id=k, 
-                patientName=v["patient"], 
-                doctorName=v["doctor"],
-                medicines=[MedicineItem(id=m["id"], name=m["name"], qty=m["qty"]) for m in v["medicines"]]
-            ) 
-            for k, v in MOCK_PRESCRIPTIONS.items()
+                id=pid,
+                patientName=data["patient"],
+                doctorName=data["doctor"],
+                medicines=to_medicine_items(data)
+            )
+            for pid, data in rows
         ]
 
-schema = strawberry.Schema(query=Query)
-app = FastAPI()
-app.include_router(GraphQLRouter(schema), prefix="/graphql")
+@strawberry.type
+class StatusUpdateResult:
+    success: bool
+    message: str
+
+@strawberry.type
+class Mutation:
+    @strawberry.mutation
+    async def updatePrescriptionStatus(self, id: str, status: str) -> StatusUpdateResult:
+        updated = await db.run(lambda: store.update_status(db.connection(), id, status))
+        if not updated:
+            return StatusUpdateResult(success=False, message=f"Resep {id} tidak ditemukan")
+        return StatusUpdateResult(success=True, message=f"Status resep {id}: {status}")
+
+schema = strawberry.Schema(query=Query, mutation=Mutation, extensions=document_cache_extensions() + [MetricsExtension, TracingExtension])
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    db.close_all()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TracingMiddleware, service="hospital-mock")
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    if not request.url.path.startswith("/graphql"):
+        return await call_next(request)
+    delay = FAULTS["latency_ms"] + random.uniform(0, FAULTS["latency_jitter_ms"])
+    if FAULTS["slow_rate"] and random.random() < FAULTS["slow_rate"]:
+        delay = FAULTS["slow_ms"]
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+    if FAULTS["failure_rate"] and random.random() < FAULTS["failure_rate"]:
+        return JSONResponse({"error": "Injected failure"}, status_code=FAULTS["failure_status"])
+    return await call_next(request)
+
+@app.get("/faults")
+def get_faults():
+    return FAULTS
+
+@app.post("/faults")
+async def set_faults(request: Request):
+    updates = await request.json()
+    unknown = set(updates) - set(FAULTS)
+    if unknown:
+        return JSONResponse({"error": f"Key tidak dikenal: {', '.join(sorted(unknown))}"}, status_code=400)
+    for key, value in updates.items():
+        FAULTS[key] = type(FAULTS[key])(value)
+    return FAULTS
+
+app.include_router(PersistedQueryRouter(schema), prefix="/graphql")
+app.add_route("/metrics", metrics_endpoint)
+app.add_route("/traces", traces_endpoint)
 
 if __name__ == "__main__":
     import uvicorn
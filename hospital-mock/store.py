@@ -0,0 +1,161 @@
+import argparse
+import os
+import random
+import sys
+
+# Penyimpanan resep mock di SQLite (pengganti dict di memori) agar bisa diisi data sintetis
+# dalam jumlah besar. Item resep disimpan berurutan per resep (WITHOUT ROWID, PK diawali
+# prescription_id) sehingga lookup banyak resep sekaligus cukup satu range scan per resep.
+
+# Batas jumlah parameter per statement IN (...)
+LOOKUP_CHUNK = 500
+
+
+def init_store(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS prescriptions (
+            id TEXT PRIMARY KEY,
+            patient_name TEXT NOT NULL,
+            doctor_name TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending'
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS prescription_items (
+            prescription_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            medicine_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            qty INTEGER NOT NULL,
+            PRIMARY KEY (prescription_id, position)
+        ) WITHOUT ROWID
+    """)
+
+
+def import_prescriptions(conn, prescriptions, replace=True):
+    # prescriptions: dict id -> {"patient", "doctor", "medicines": [{"id", "name", "qty"}]}
+    # replace=False hanya menambah resep yang belum ada (dipakai untuk data default)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for pid, data in prescriptions.items():
+            if replace:
+                conn.execute("DELETE FROM prescription_items WHERE prescription_id = ?", (pid,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO prescriptions (id, patient_name, doctor_name) VALUES (?, ?, ?)",
+                    (pid, data["patient"], data["doctor"])
+                )
+            else:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO prescriptions (id, patient_name, doctor_name) VALUES (?, ?, ?)",
+                    (pid, data["patient"], data["doctor"])
+                )
+                if cursor.rowcount == 0:
+                    continue
+            conn.executemany(
+                "INSERT INTO prescription_items (prescription_id, position, medicine_id, name, qty) VALUES (?, ?, ?, ?, ?)",
+                [(pid, i, str(m["id"]), m["name"], m["qty"]) for i, m in enumerate(data["medicines"])]
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _with_items(conn, rows):
+    result = {r["id"]: {
+        "patient": r["patient_name"], "doctor": r["doctor_name"], "status": r["status"], "medicines": []
+    } for r in rows}
+    ids = list(result)
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[start:start + LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        for item in conn.execute(
+            f"SELECT prescription_id, medicine_id, name, qty FROM prescription_items "
+            f"WHERE prescription_id IN ({placeholders}) ORDER BY prescription_id, position",
+            chunk
+        ):
+            result[item["prescription_id"]]["medicines"].append(
+                {"id": item["medicine_id"], "name": item["name"], "qty": item["qty"]}
+            )
+    return result
+
+
+def fetch_many(conn, ids):
+    # Return dict id -> data resep untuk id yang ada (id yang tidak ada tidak muncul)
+    ids = list(dict.fromkeys(ids))
+    rows = []
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[start:start + LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows.extend(conn.execute(
+            f"SELECT id, patient_name, doctor_name, status FROM prescriptions WHERE id IN ({placeholders})", chunk
+        ).fetchall())
+    return _with_items(conn, rows)
+
+
+def fetch_page(conn, first=None, after=None):
+    # Keyset pagination berdasarkan id; first=None mengambil semua (perilaku lama allPrescriptions)
+    sql = "SELECT id, patient_name, doctor_name, status FROM prescriptions"
+    params = []
+    if after is not None:
+        sql += " WHERE id > ?"
+        params.append(after)
+    sql += " ORDER BY id"
+    if first is not None:
+        sql += " LIMIT ?"
+        params.append(first)
+    rows = conn.execute(sql, params).fetchall()
+    data = _with_items(conn, rows)
+    return [(r["id"], data[r["id"]]) for r in rows]
+
+
+def update_status(conn, prescription_id, status):
+    cursor = conn.execute("UPDATE prescriptions SET status = ? WHERE id = ?", (status, prescription_id))
+    return cursor.rowcount > 0
+
+
+def synthetic_prescriptions(count, medicines, prefix="SYN", seed=3):
+    # medicines: list (id, name) yang dipakai acak di tiap resep
+    rng = random.Random(seed)
+    width = len(str(count))
+    for i in range(count):
+        items = rng.sample(medicines, rng.randint(1, min(4, len(medicines))))
+        yield f"{prefix}-{i:0{width}d}", {
+            "patient": f"Pasien {prefix} {i}",
+            "doctor": f"Dr. Sintetis {i % 50}",
+            "medicines": [{"id": mid, "name": name, "qty": rng.randint(1, 3)} for mid, name in items],
+        }
+
+
+if __name__ == "__main__":
+    # Seeder data sintetis: python store.py --count 100000 --inventory-db ../inventory-service/inventory_db.sqlite
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from shared.db import Database
+
+    parser = argparse.ArgumentParser(description="Isi hospital_db.sqlite dengan resep sintetis")
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--prefix", default="SYN")
+    parser.add_argument("--inventory-db", help="ambil nama obat dari database Inventory agar resep bisa di-preview")
+    parser.add_argument("--batch", type=int, default=5_000)
+    args = parser.parse_args()
+
+    medicines = [("1", "Paracetamol"), ("2", "Amoxicillin")]
+    if args.inventory_db:
+        inventory = Database(args.inventory_db)
+        medicines = [(str(r["id"]), r["name"]) for r in inventory.fetchall("SELECT id, name FROM medicines")]
+        inventory.close_all()
+
+    db = Database("hospital_db.sqlite")
+    conn = db.connection()
+    init_store(conn)
+    batch = {}
+    for pid, data in synthetic_prescriptions(args.count, medicines, args.prefix):
+        batch[pid] = data
+        if len(batch) >= args.batch:
+            import_prescriptions(conn, batch)
+            batch = {}
+    if batch:
+        import_prescriptions(conn, batch)
+    total = conn.execute("SELECT COUNT(*) FROM prescriptions").fetchone()[0]
+    print(f"{args.count} resep sintetis ditulis, total {total} resep di hospital_db.sqlite")
+    db.close_all()
@@ -1,19 +1,34 @@
-import sqlite3
-from typing import List, Optional
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from enum import Enum
+from typing import AsyncGenerator, List, Optional
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.requests import HTTPConnection
 import strawberry
-from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-import strawberry
-from strawberry.fastapi import GraphQLRouter
-import jwt
+from strawberry.dataloader import DataLoader
 
-SECRET_KEY = "apotek-iae-secret-key-2025"
-ALGORITHM = "HS256"
+# Modul bersama antar service ada di root repo (folder shared/)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.db import Database
+from shared.auth import AuthContext, get_auth_context
+from shared.metrics import MetricsExtension, metrics_endpoint
+from shared.tracing import TracingExtension, TracingMiddleware, traces_endpoint
+from shared.persisted_queries import PersistedQueryRouter, document_cache_extensions
+from shared.pubsub import broadcaster
+import catalog
+import change_feed
+import reservations
+
+db = Database("inventory_db.sqlite")
 
 def init_db():
-    conn = sqlite3.connect("inventory_db.sqlite")
+    conn = db.connection()
     conn.execute("""
         CREATE TABLE IF NOT EXISTS medicines (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -23,13 +38,31 @@ def init_db():
             category TEXT
         )
     """)
+    # Index case-insensitive untuk pencarian obat berdasarkan nama (dipakai Transaction Service)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medicines_name_nocase ON medicines (name COLLATE NOCASE)")
     conn.execute("INSERT OR IGNORE INTO medicines (id, name, stock, price, category) VALUES (1, 'Paracetamol', 100, 5000, 'Bebas')")
     conn.execute("INSERT OR IGNORE INTO medicines (id, name, stock, price, category) VALUES (2, 'Amoxicillin', 20, 15000, 'Keras')")
-    conn.commit()
-    conn.close()
+    # Hasil deductStockBatch per reference (mis. "tx-12") agar pengiriman ulang dari outbox
+    # Transaction Service tidak memotong stok dua kali
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stock_deductions (
+            reference TEXT PRIMARY KEY,
+            success INTEGER NOT NULL,
+            applied TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    catalog.init_catalog(conn)
+    change_feed.init_change_feed(conn)
+    reservations.init_reservations(conn)
 
 init_db()
 
+# Interval pemangkasan change feed (perubahan lama di luar CHANGE_FEED_RETENTION)
+CHANGE_FEED_PRUNE_INTERVAL = float(os.getenv("CHANGE_FEED_PRUNE_INTERVAL", "300"))
+# Interval sweeper reservasi stok yang sudah kedaluwarsa
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))
+
 @strawberry.type
 class Medicine:
     id: strawberry.ID
@@ -42,122 +75,456 @@ class Medicine:
     def isAvailable(self) -> bool:
         return self.stock > 0
 
+def row_to_medicine(r):
+    return Medicine(id=str(r["id"]), name=r["name"], stock=r["stock"], price=r["price"], category=r["category"])
+
+@strawberry.enum
+class MedicineSortField(Enum):
+    NAME = "NAME"
+    STOCK = "STOCK"
+    PRICE = "PRICE"
+
+@strawberry.type
+class PageInfo:
+    endCursor: Optional[str]
+    hasNextPage: bool
+
+@strawberry.type
+class MedicinePage:
+    items: List[Medicine]
+    pageInfo: PageInfo
+
+@strawberry.type
+class InventoryStats:
+    medicinesCount: int
+    criticalStockCount: int
+
+# Batas stok kritis (sama dengan yang ditampilkan di dashboard)
+CRITICAL_STOCK = 10
+
+@strawberry.input
+class StockDelta:
+    id: strawberry.ID
+    qty: int
+
+@strawberry.type
+class StockDeductItem:
+    id: strawberry.ID
+    success: bool
+    stock: Optional[int] = None
+
+@strawberry.type
+class StockDeductResult:
+    success: bool
+    message: str
+    items: List[StockDeductItem]
+
+@strawberry.type
+class ReservationItem:
+    id: strawberry.ID
+    success: bool
+    available: Optional[int] = None
+
+@strawberry.type
+class ReservationResult:
+    success: bool
+    message: str
+    items: List[ReservationItem]
+    reservationId: Optional[str] = None
+    expiresAt: Optional[str] = None
+
+@strawberry.type
+class StockAvailability:
+    id: strawberry.ID
+    stock: int
+    reserved: int
+    available: int
+
+@strawberry.enum
+class ChangeKind(Enum):
+    CREATED = "CREATED"
+    UPDATED = "UPDATED"
+    DELETED = "DELETED"
+
+@strawberry.type
+class MedicineChange:
+    # Delta: hanya field yang berubah yang diisi (UPDATED stok cukup id + stock)
+    kind: ChangeKind
+    id: strawberry.ID
+    name: Optional[str] = None
+    stock: Optional[int] = None
+    price: Optional[float] = None
+    category: Optional[str] = None
+
+MEDICINE_CHANGES = "medicine_changes"
+
+@strawberry.type
+class ChangeRecord:
+    # Keadaan obat setelah perubahan ke-seq (DELETED hanya berisi id)
+    seq: int
+    kind: ChangeKind
+    id: strawberry.ID
+    name: Optional[str] = None
+    stock: Optional[int] = None
+    price: Optional[float] = None
+    category: Optional[str] = None
+
+@strawberry.type
+class ChangeFeedPage:
+    changes: List[ChangeRecord]
+    lastSeq: int
+    headSeq: int
+    hasMore: bool
+    resetRequired: bool
+
+@strawberry.type
+class CatalogSnapshotPage:
+    items: List[Medicine]
+    lastId: Optional[int]
+    hasMore: bool
+
+def publish_medicine_change(kind, id, **fields):
+    broadcaster.publish(MEDICINE_CHANGES, MedicineChange(kind=kind, id=str(id), **fields))
+
+# DataLoader per request: lookup per item dalam satu operasi GraphQL digabung jadi satu query
+async def load_medicines_by_id(ids):
+    placeholders = ", ".join("?" for _ in ids)
+    rows = await db.run(db.fetchall, f"SELECT * FROM medicines WHERE id IN ({placeholders})", [int(i) for i in ids])
+    by_id = {str(r["id"]): r for r in rows}
+    return [by_id.get(str(i)) for i in ids]
+
+async def load_medicines_by_name(names):
+    return await db.run(lambda: catalog.find_many_by_name(db.connection(), names))
+
+async def get_context(request: HTTPConnection) -> AuthContext:
+    context = await get_auth_context(request)
+    context["medicine_by_id"] = DataLoader(load_fn=load_medicines_by_id)
+    context["medicine_by_name"] = DataLoader(load_fn=load_medicines_by_name)
+    return context
+
 @strawberry.type
 class Query:
     @strawberry.field
-    def medicines(self, category: Optional[str] = None) -> List[Medicine]:
-        conn = sqlite3.connect("inventory_db.sqlite")
-        conn.row_factory = sqlite3.Row
+    async def medicines(self, category: Optional[str] = None) -> List[Medicine]:
         if category:
-            rows = conn.execute("SELECT * FROM medicines WHERE category = ?", (category,)).fetchall()
+            rows = await db.run(db.fetchall, "SELECT * FROM medicines WHERE category = ?", (category,))
         else:
-            rows = conn.execute("SELECT * FROM medicines").fetchall()
-        conn.close()
+            rows = await db.run(db.fetchall, "SELECT * FROM medicines")
         return [Medicine(id=str(r["id"]), name=r["name"], stock=r["stock"], price=r["price"], category=r["category"]) for r in rows]
 
     @strawberry.field
-    def checkStock(self, medicineName: str) -> Optional[Medicine]:
-        conn = sqlite3.connect("inventory_db.sqlite")
-        conn.row_factory = sqlite3.Row
-        row = conn.execute("SELECT * FROM medicines WHERE name LIKE ?", (f"%{medicineName}%",)).fetchone()
-        conn.close()
+    async def medicine(self, info, id: strawberry.ID) -> Optional[Medicine]:
+        row = await info.context["medicine_by_id"].load(str(id))
+        return row_to_medicine(row) if row else None
+
+    @strawberry.field
+    async def checkStock(self, info, medicineName: str) -> Optional[Medicine]:
+        # Nama persis dulu, lalu pencarian full-text (prefix per kata) tanpa scan tabel
+        row = await info.context["medicine_by_name"].load(medicineName)
         if row:
             return Medicine(id=str(row["id"]), name=row["name"], stock=row["stock"], price=row["price"], category=row["category"])
         return None
 
+    @strawberry.field
+    async def medicinesPage(
+        self,
+        first: int = 50,
+        after: Optional[str] = None,
+        category: Optional[str] = None,
+        search: Optional[str] = None,
+        sortBy: MedicineSortField = MedicineSortField.NAME,
+        descending: bool = False
+    ) -> MedicinePage:
+        # Katalog per halaman (cursor = posisi item terakhir), disortir di server
+        rows, end_cursor, has_next = await db.run(
+            lambda: catalog.fetch_page(db.connection(), first, after, sortBy.value, descending, category, search)
+        )
+        return MedicinePage(
+            items=[row_to_medicine(r) for r in rows],
+            pageInfo=PageInfo(endCursor=end_cursor, hasNextPage=has_next)
+        )
+
+    @strawberry.field
+    async def searchMedicines(self, query: str, first: int = 20) -> List[Medicine]:
+        rows = await db.run(lambda: catalog.search(db.connection(), query, first))
+        return [row_to_medicine(r) for r in rows]
+
+    @strawberry.field
+    async def inventoryStats(self) -> InventoryStats:
+        row = await db.run(
+            db.fetchone,
+            "SELECT COUNT(*), (SELECT COUNT(*) FROM medicines WHERE stock < ?) FROM medicines",
+            (CRITICAL_STOCK,)
+        )
+        return InventoryStats(medicinesCount=row[0], criticalStockCount=row[1])
+
+    @strawberry.field
+    async def medicinesByNames(self, names: List[str]) -> List[Medicine]:
+        # Lookup beberapa obat sekaligus (case-insensitive) dalam satu query
+        if not names:
+            return []
+        placeholders = ", ".join("?" for _ in names)
+        rows = await db.run(db.fetchall, f"SELECT * FROM medicines WHERE name COLLATE NOCASE IN ({placeholders})", names)
+        return [Medicine(id=str(r["id"]), name=r["name"], stock=r["stock"], price=r["price"], category=r["category"]) for r in rows]
+
+    @strawberry.field
+    async def stockAvailability(self, ids: List[strawberry.ID]) -> List[StockAvailability]:
+        # Stok tersedia = stok fisik - reservasi aktif
+        if not ids:
+            return []
+        found = await db.run(lambda: reservations.availability(db.connection(), [int(i) for i in ids]))
+        return [
+            StockAvailability(id=str(i), stock=found[int(i)][0], reserved=found[int(i)][1], available=found[int(i)][0] - found[int(i)][1])
+            for i in ids if int(i) in found
+        ]
+
+    @strawberry.field
+    async def changesSince(self, seq: int, limit: int = 1000) -> ChangeFeedPage:
+        # Perubahan katalog setelah seq, berurutan; dipakai replika katalog di Transaction Service
+        rows, head, reset = await db.run(lambda: change_feed.changes_since(db.connection(), seq, limit))
+        changes = [
+            ChangeRecord(
+                seq=r["seq"], kind=ChangeKind(r["kind"]), id=str(r["medicine_id"]),
+                name=r["name"], stock=r["stock"], price=r["price"], category=r["category"]
+            )
+            for r in rows
+        ]
+        last_seq = changes[-1].seq if changes else (head if reset else seq)
+        return ChangeFeedPage(changes=changes, lastSeq=last_seq, headSeq=head, hasMore=last_seq < head, resetRequired=reset)
+
+    @strawberry.field
+    async def changeFeedHead(self) -> int:
+        return await db.run(lambda: change_feed.head_seq(db.connection()))
+
+    @strawberry.field
+    async def catalogSnapshot(self, afterId: int = 0, first: int = 1000) -> CatalogSnapshotPage:
+        rows, has_more = await db.run(lambda: change_feed.snapshot_page(db.connection(), afterId, first))
+        return CatalogSnapshotPage(
+            items=[row_to_medicine(r) for r in rows],
+            lastId=rows[-1]["id"] if rows else None,
+            hasMore=has_more
+        )
+
 @strawberry.type
 class Mutation:
     @strawberry.mutation
-    def createMedicine(self, info, name: str, stock: int, price: float, category: str) -> Optional[Medicine]:
+    async def createMedicine(self, info, name: str, stock: int, price: float, category: str) -> Optional[Medicine]:
         user = info.context.get("user")
         if not user or user["role"] not in ["admin", "apoteker"]:
             raise Exception("Unauthorized: Hanya Admin/Apoteker yang boleh akses")
             
-        conn = sqlite3.connect("inventory_db.sqlite")
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO medicines (name, stock, price, category) VALUES (?, ?, ?, ?)", (name, stock, price, category))
+        cursor = await db.run(db.execute, "INSERT INTO medicines (name, stock, price, category) VALUES (?, ?, ?, ?)", (name, stock, price, category))
         new_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        publish_medicine_change(ChangeKind.CREATED, new_id, name=name, stock=stock, price=price, category=category)
         return Medicine(id=str(new_id), name=name, stock=stock, price=price, category=category)
 
     @strawberry.mutation
-    def updateMedicine(self, info, id: strawberry.ID, name: Optional[str] = None, stock: Optional[int] = None, price: Optional[float] = None, category: Optional[str] = None) -> str:
+    async def updateMedicine(self, info, id: strawberry.ID, name: Optional[str] = None, stock: Optional[int] = None, price: Optional[float] = None, category: Optional[str] = None) -> str:
         user = info.context.get("user")
         if not user or user["role"] not in ["admin", "apoteker"]:
             raise Exception("Unauthorized: Hanya Admin/Apoteker yang boleh akses")
 
-        conn = sqlite3.connect("inventory_db.sqlite")
         queries = []
         params = []
+        changes = {}
         if name:
             queries.append("name = ?")
             params.append(name)
+            changes["name"] = name
         if stock is not None:
             queries.append("stock = ?")
             params.append(stock)
+            changes["stock"] = stock
         if price is not None:
             queries.append("price = ?")
             params.append(price)
+            changes["price"] = price
         if category:
             queries.append("category = ?")
             params.append(category)
+            changes["category"] = category
         
         if not queries:
-            conn.close()
             return "Tidak ada perubahan"
 
         params.append(id)
-        cursor = conn.execute(f"UPDATE medicines SET {', '.join(queries)} WHERE id = ?", params)
-        conn.commit()
+        cursor = await db.run(db.execute, f"UPDATE medicines SET {', '.join(queries)} WHERE id = ?", params)
         updated = cursor.rowcount > 0
-        conn.close()
+        if updated:
+            publish_medicine_change(ChangeKind.UPDATED, id, **changes)
         return "Berhasil diperbarui" if updated else "ID tidak ditemukan"
 
     @strawberry.mutation
-    def deleteMedicine(self, info, id: strawberry.ID) -> str:
+    async def deleteMedicine(self, info, id: strawberry.ID) -> str:
         user = info.context.get("user")
         if not user or user["role"] not in ["admin", "apoteker"]:
             raise Exception("Unauthorized: Hanya Admin/Apoteker yang boleh akses")
 
-        conn = sqlite3.connect("inventory_db.sqlite")
-        cursor = conn.execute("DELETE FROM medicines WHERE id = ?", (id,))
-        conn.commit()
+        cursor = await db.run(db.execute, "DELETE FROM medicines WHERE id = ?", (id,))
         deleted = cursor.rowcount > 0
-        conn.close()
+        if deleted:
+            publish_medicine_change(ChangeKind.DELETED, id)
         return "Berhasil dihapus" if deleted else "ID tidak ditemukan"
 
     @strawberry.mutation
-    def updateStock(self, info, id: strawberry.ID, amount: int) -> str:
+    async def updateStock(self, info, id: strawberry.ID, amount: int) -> str:
         user = info.context.get("user")
         # Catatan: Transaction Service akan forward token Admin saat penjualan
         if not user or user["role"] not in ["admin", "apoteker"]:
             raise Exception("Unauthorized: Hanya Admin/Apoteker yang boleh akses")
 
-        conn = sqlite3.connect("inventory_db.sqlite")
-        conn.execute("UPDATE medicines SET stock = stock + ? WHERE id = ?", (amount, id))
-        conn.commit()
-        conn.close()
+        row = await db.run(db.fetchone, "UPDATE medicines SET stock = stock + ? WHERE id = ? RETURNING stock", (amount, id))
+        if row is not None:
+            publish_medicine_change(ChangeKind.UPDATED, id, stock=row["stock"])
         return "Stok berhasil diperbarui"
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
-app = FastAPI()
+    @strawberry.mutation
+    async def reserveStock(
+        self, info, items: List[StockDelta], ttlSeconds: int = reservations.RESERVATION_DEFAULT_TTL,
+        reservationId: Optional[str] = None
+    ) -> ReservationResult:
+        user = info.context.get("user")
+        if not user or user["role"] not in ["admin", "apoteker"]:
+            raise Exception("Unauthorized: Hanya Admin/Apoteker yang boleh akses")
+
+        if any(item.qty <= 0 for item in items):
+            return ReservationResult(success=False, message="Jumlah reservasi harus lebih dari 0", items=[])
+
+        # Semua item ditahan atau tidak sama sekali; reservationId yang sama diperbarui (bukan ditambah)
+        reservation_id, expires_at, results = await db.run(lambda: reservations.reserve(
+            db.connection(), [(item.id, item.qty) for item in items], ttlSeconds, reservationId
+        ))
+        return ReservationResult(
+            success=reservation_id is not None,
+            message="Stok berhasil direservasi" if reservation_id else "Stok tersedia tidak cukup, tidak ada stok yang direservasi",
+            items=[ReservationItem(id=str(mid), success=ok, available=available) for mid, ok, available in results],
+            reservationId=reservation_id,
+            expiresAt=datetime.fromtimestamp(expires_at, timezone.utc).isoformat() if reservation_id else None
+        )
+
+    @strawberry.mutation
+    async def releaseReservation(self, info, reservationId: str) -> bool:
+        user = info.context.get("user")
+        if not user or user["role"] not in ["admin", "apoteker"]:
+            raise Exception("Unauthorized: Hanya Admin/Apoteker yang boleh akses")
+        return await db.run(lambda: reservations.release(db.connection(), reservationId))
+
+    @strawberry.mutation
+    async def deductStockBatch(
+        self, info, items: List[StockDelta], reference: Optional[str] = None, reservationId: Optional[str] = None
+    ) -> StockDeductResult:
+        user = info.context.get("user")
+        if not user or user["role"] not in ["admin", "apoteker"]:
+            raise Exception("Unauthorized: Hanya Admin/Apoteker yang boleh akses")
+
+        if any(item.qty <= 0 for item in items):
+            return StockDeductResult(success=False, message="Jumlah potong stok harus lebih dari 0", items=[])
+
+        # Semua item dipotong dalam satu transaksi SQLite; cek stok & potong terjadi bersamaan
+        # (UPDATE ... WHERE stock >= qty), jika satu item gagal semua di-rollback.
+        # Dengan reference, hasil pertama disimpan dan dikembalikan lagi untuk panggilan berikutnya.
+        # Stok yang ditahan reservasi lain tidak ikut terpotong; reservationId milik checkout ini
+        # boleh dipakai dan dihapus (dikonversi jadi potongan stok) di transaksi yang sama.
+        def deduct():
+            conn = db.connection()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = None
+                if reference:
+                    previous = conn.execute(
+                        "SELECT success, applied FROM stock_deductions WHERE reference = ?", (reference,)
+                    ).fetchone()
+                if previous is not None:
+                    success, applied = bool(previous["success"]), json.loads(previous["applied"])
+                    conn.execute("COMMIT")
+                else:
+                    conn.execute("SAVEPOINT deduct")
+                    applied = []
+                    for item in items:
+                        applied.append(reservations.deduct_reserved(conn, item.id, item.qty, reservationId, now))
+                    success = all(applied)
+                    if not success:
+                        conn.execute("ROLLBACK TO deduct")
+                    conn.execute("RELEASE deduct")
+                    if reservationId:
+                        reservations.release(conn, reservationId)
+                    if reference:
+                        conn.execute(
+                            "INSERT INTO stock_deductions (reference, success, applied) VALUES (?, ?, ?)",
+                            (reference, int(success), json.dumps(applied))
+                        )
+                    conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            ids = [item.id for item in items]
+            placeholders = ", ".join("?" for _ in ids)
+            stocks = {str(r[0]): r[1] for r in conn.execute(f"SELECT id, stock FROM medicines WHERE id IN ({placeholders})", ids)}
+            return success, applied, stocks
+
+        success, applied, stocks = await db.run(deduct)
+        if success:
+            for item in items:
+                publish_medicine_change(ChangeKind.UPDATED, item.id, stock=stocks.get(str(item.id)))
+
+        return StockDeductResult(
+            success=success,
+            message="Stok berhasil dipotong" if success else "Stok tidak cukup, tidak ada stok yang dipotong",
+            items=[
+                StockDeductItem(id=item.id, success=ok, stock=stocks.get(str(item.id)))
+                for item, ok in zip(items, applied)
+            ]
+        )
+
+@strawberry.type
+class Subscription:
+    @strawberry.subscription
+    async def medicineChanges(self, ids: Optional[List[strawberry.ID]] = None) -> AsyncGenerator[MedicineChange, None]:
+        # Push perubahan katalog/stok; ids membatasi ke obat tertentu (mis. yang sedang tampil)
+        wanted = {str(i) for i in ids} if ids else None
+        async for change in broadcaster.subscribe(MEDICINE_CHANGES):
+            if wanted is None or change.id in wanted:
+                yield change
+
+schema = strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription, extensions=document_cache_extensions() + [MetricsExtension, TracingExtension])
+async def prune_change_feed():
+    while True:
+        await asyncio.sleep(CHANGE_FEED_PRUNE_INTERVAL)
+        try:
+            await db.run(lambda: change_feed.prune(db.connection()))
+        except Exception as e:
+            print(f"Warning: Gagal memangkas change feed: {str(e)}")
+
+async def sweep_reservations():
+    # Hapus reservasi kedaluwarsa secara bulk (tidak memengaruhi stok tersedia, hanya ukuran tabel)
+    while True:
+        await asyncio.sleep(RESERVATION_SWEEP_INTERVAL)
+        try:
+            await db.run(lambda: reservations.sweep_expired(db.connection()))
+        except Exception as e:
+            print(f"Warning: Gagal membersihkan reservasi kedaluwarsa: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app):
+    tasks = [asyncio.create_task(prune_change_feed()), asyncio.create_task(sweep_reservations())]
+    yield
+    for task in tasks:
+        task.cancel()
+    db.close_all()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TracingMiddleware, service="inventory-service")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 from fastapi.responses import RedirectResponse
 @app.get("/")
 def root():
     return RedirectResponse(url="/graphql")
-async def get_context(request: Request):
-    auth = request.headers.get("Authorization")
-    if auth:
-        try:
-            payload = jwt.decode(auth.replace("Bearer ", ""), SECRET_KEY, algorithms=[ALGORITHM])
-            return {"user": payload}
-        except: pass
-    return {"user": None}
-
-app.include_router(GraphQLRouter(schema, context_getter=get_context), prefix="/graphql")
+app.include_router(PersistedQueryRouter(schema, context_getter=get_context), prefix="/graphql")
+app.add_route("/metrics", metrics_endpoint)
+app.add_route("/traces", traces_endpoint)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,160 @@
+import base64
+import json
+import re
+
+# Query katalog obat: index, full-text search (FTS5) dan pagination berbasis cursor (keyset).
+
+# Kolom sort -> ekspresi SQL. Sort nama memakai COLLATE NOCASE agar index nama terpakai.
+SORT_COLUMNS = {
+    "NAME": "name COLLATE NOCASE",
+    "STOCK": "stock",
+    "PRICE": "price",
+}
+
+MAX_PAGE_SIZE = 200
+
+
+def init_catalog(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medicines_category ON medicines (category, name COLLATE NOCASE)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medicines_stock ON medicines (stock)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medicines_price ON medicines (price)")
+
+    # Index full-text (external content) yang selalu sinkron dengan tabel medicines lewat trigger
+    fts_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'medicines_fts'"
+    ).fetchone() is not None
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS medicines_fts USING fts5(
+            name, category, content='medicines', content_rowid='id'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS medicines_fts_ai AFTER INSERT ON medicines BEGIN
+            INSERT INTO medicines_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS medicines_fts_ad AFTER DELETE ON medicines BEGIN
+            INSERT INTO medicines_fts(medicines_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS medicines_fts_au AFTER UPDATE OF name, category ON medicines BEGIN
+            INSERT INTO medicines_fts(medicines_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+            INSERT INTO medicines_fts(rowid, name, category) VALUES (new.id, new.name, new.category);
+        END
+    """)
+    if not fts_exists:
+        conn.execute("INSERT INTO medicines_fts(medicines_fts) VALUES ('rebuild')")
+
+
+def fts_query(text):
+    # "para 500" -> "para"* AND "500"* (prefix match per kata, aman dari sintaks FTS)
+    tokens = re.findall(r"\w+", text or "")
+    return " AND ".join(f'"{t}"*' for t in tokens)
+
+
+def encode_cursor(sort_value, row_id):
+    raw = json.dumps([sort_value, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return sort_value, int(row_id)
+    except Exception:
+        raise ValueError("Cursor tidak valid")
+
+
+def fetch_page(conn, first, after=None, sort_field="NAME", descending=False, category=None, search=None):
+    """Ambil satu halaman katalog. Return (rows, end_cursor, has_next_page)."""
+    first = max(1, min(first, MAX_PAGE_SIZE))
+    column = SORT_COLUMNS[sort_field]
+    order = "DESC" if descending else "ASC"
+    compare = "<" if descending else ">"
+
+    where = []
+    params = []
+    if category:
+        where.append("category = ?")
+        params.append(category)
+    if search:
+        match = fts_query(search)
+        if not match:
+            return [], None, False
+        where.append("id IN (SELECT rowid FROM medicines_fts WHERE medicines_fts MATCH ?)")
+        params.append(match)
+    if after:
+        sort_value, row_id = decode_cursor(after)
+        # Kondisi kolom tunggal ditambahkan agar SQLite bisa memakai index sebagai range
+        where.append(f"{column} {compare}= ? AND ({column}, id) {compare} (?, ?)")
+        params.extend([sort_value, sort_value, row_id])
+
+    sql = "SELECT * FROM medicines"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {column} {order}, id {order} LIMIT ?"
+    params.append(first + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    has_next_page = len(rows) > first
+    rows = rows[:first]
+    end_cursor = None
+    if rows:
+        last = rows[-1]
+        key = "name" if sort_field == "NAME" else sort_field.lower()
+        end_cursor = encode_cursor(last[key], last["id"])
+    return rows, end_cursor, has_next_page
+
+
+def find_by_name(conn, text):
+    # Nama persis (index NOCASE) dulu, lalu prefix match lewat FTS
+    row = conn.execute("SELECT * FROM medicines WHERE name = ? COLLATE NOCASE LIMIT 1", (text,)).fetchone()
+    if row:
+        return row
+    match = fts_query(text)
+    if not match:
+        return None
+    return conn.execute("""
+        SELECT m.* FROM medicines_fts f JOIN medicines m ON m.id = f.rowid
+        WHERE medicines_fts MATCH ? ORDER BY rank LIMIT 1
+    """, (match,)).fetchone()
+
+
+def find_many_by_name(conn, names):
+    # Versi batch dari find_by_name (dipakai DataLoader): satu query IN untuk nama persis,
+    # lalu satu query FTS untuk semua nama yang tidak ketemu. Return list sejajar dengan names.
+    placeholders = ", ".join("?" for _ in names)
+    rows = conn.execute(f"SELECT * FROM medicines WHERE name COLLATE NOCASE IN ({placeholders})", list(names)).fetchall()
+    by_name = {}
+    for r in rows:
+        by_name.setdefault(r["name"].lower(), r)
+
+    # Match terbaik per nama: subquery berkorelasi per baris VALUES, tetap satu statement
+    misses = {}
+    for n in names:
+        match = fts_query(n)
+        if n.lower() not in by_name and match:
+            misses.setdefault(n.lower(), match)
+    if misses:
+        values = ", ".join("(?, ?)" for _ in misses)
+        params = [v for pair in misses.items() for v in pair]
+        for r in conn.execute(f"""
+            WITH wanted(name, expr) AS (VALUES {values})
+            SELECT wanted.name AS wanted_name, m.* FROM wanted JOIN medicines m ON m.id = (
+                SELECT f.rowid FROM medicines_fts f WHERE medicines_fts MATCH wanted.expr ORDER BY rank LIMIT 1
+            )
+        """, params):
+            by_name[r["wanted_name"]] = r
+    return [by_name.get(n.lower()) for n in names]
+
+
+def search(conn, text, limit):
+    match = fts_query(text)
+    if not match:
+        return []
+    return conn.execute("""
+        SELECT m.* FROM medicines_fts f JOIN medicines m ON m.id = f.rowid
+        WHERE medicines_fts MATCH ? ORDER BY rank LIMIT ?
+    """, (match, max(1, min(limit, MAX_PAGE_SIZE)))).fetchall()
@@ -0,0 +1,99 @@
+import os
+
+# Change feed katalog: setiap INSERT/UPDATE/DELETE pada tabel medicines dicatat oleh trigger
+# ke medicine_changes dengan seq yang naik monoton (AUTOINCREMENT), di transaksi SQLite yang
+# sama dengan perubahannya. Konsumen (replika katalog di Transaction Service) cukup menyimpan
+# seq terakhir dan membaca changesSince(seq). Baris berisi keadaan obat SETELAH perubahan,
+# jadi menerapkan ulang perubahan yang sama aman (idempotent).
+
+# Jumlah perubahan terakhir yang disimpan; konsumen yang tertinggal lebih jauh harus snapshot ulang
+CHANGE_FEED_RETENTION = int(os.getenv("CHANGE_FEED_RETENTION", "100000"))
+CHANGE_FEED_MAX_PAGE = 5000
+SNAPSHOT_MAX_PAGE = 5000
+
+CREATED = "CREATED"
+UPDATED = "UPDATED"
+DELETED = "DELETED"
+
+
+def init_change_feed(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS medicine_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            medicine_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            name TEXT,
+            stock INTEGER,
+            price REAL,
+            category TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS medicine_changes_ai AFTER INSERT ON medicines BEGIN
+            INSERT INTO medicine_changes (medicine_id, kind, name, stock, price, category)
+            VALUES (new.id, '{CREATED}', new.name, new.stock, new.price, new.category);
+        END
+    """)
+    # UPDATE tanpa perubahan nilai (mis. SET stock = stock) tidak menambah entry
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS medicine_changes_au AFTER UPDATE ON medicines
+        WHEN old.name IS NOT new.name OR old.stock IS NOT new.stock
+            OR old.price IS NOT new.price OR old.category IS NOT new.category
+        BEGIN
+            INSERT INTO medicine_changes (medicine_id, kind, name, stock, price, category)
+            VALUES (new.id, '{UPDATED}', new.name, new.stock, new.price, new.category);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS medicine_changes_ad AFTER DELETE ON medicines BEGIN
+            INSERT INTO medicine_changes (medicine_id, kind) VALUES (old.id, '{DELETED}');
+        END
+    """)
+    prune(conn)
+
+
+def head_seq(conn):
+    # Seq terakhir yang pernah dibuat (tetap benar walau barisnya sudah dipangkas)
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'medicine_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def changes_since(conn, seq, limit):
+    """Return (rows, head, reset_required).
+
+    reset_required: seq konsumen lebih lama dari perubahan tertua yang masih disimpan, atau
+    lebih besar dari head (database Inventory diganti) — konsumen harus snapshot ulang.
+    """
+    limit = max(0, min(limit, CHANGE_FEED_MAX_PAGE))
+    # Satu transaksi baca agar head dan baris perubahan konsisten
+    conn.execute("BEGIN")
+    try:
+        head = head_seq(conn)
+        oldest = conn.execute("SELECT MIN(seq) FROM medicine_changes").fetchone()[0]
+        first_kept = oldest if oldest is not None else head + 1
+        if seq > head or seq < first_kept - 1:
+            return [], head, True
+        rows = conn.execute(
+            "SELECT * FROM medicine_changes WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+        ).fetchall()
+        return rows, head, False
+    finally:
+        conn.execute("COMMIT")
+
+
+def snapshot_page(conn, after_id, first):
+    # Katalog lengkap per halaman (keyset id) untuk bootstrap replika. Konsumen mencatat head
+    # SEBELUM halaman pertama lalu memutar ulang changesSince(head) setelahnya.
+    first = max(1, min(first, SNAPSHOT_MAX_PAGE))
+    rows = conn.execute(
+        "SELECT * FROM medicines WHERE id > ? ORDER BY id LIMIT ?", (after_id, first + 1)
+    ).fetchall()
+    return rows[:first], len(rows) > first
+
+
+def prune(conn, retention=CHANGE_FEED_RETENTION):
+    cursor = conn.execute(
+        "DELETE FROM medicine_changes WHERE seq <= (SELECT MAX(seq) FROM medicine_changes) - ?", (retention,)
+    )
+    return cursor.rowcount
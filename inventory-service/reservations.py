@@ -0,0 +1,120 @@
+import os
+import time
+import uuid
+
+# Reservasi stok jangka pendek: preview di kasir menahan stok obat selama beberapa menit agar
+# checkout tidak gagal karena stoknya keburu diambil transaksi lain. Stok di tabel medicines
+# tidak diubah; stok tersedia = stock - jumlah reservasi aktif (expires_at > sekarang), dihitung
+# dari index (medicine_id, expires_at, qty). Reservasi kedaluwarsa otomatis tidak dihitung,
+# sweeper hanya membersihkan barisnya secara bulk.
+
+RESERVATION_DEFAULT_TTL = int(os.getenv("RESERVATION_DEFAULT_TTL", "120"))
+RESERVATION_MAX_TTL = int(os.getenv("RESERVATION_MAX_TTL", "900"))
+
+# SQL stok yang ditahan reservasi aktif milik pihak lain (parameter: medicine_id, now, reservation_id)
+RESERVED_BY_OTHERS_SQL = """
+    SELECT COALESCE(SUM(qty), 0) FROM stock_reservations
+    WHERE medicine_id = ? AND expires_at > ? AND reservation_id IS NOT ?
+"""
+
+
+def init_reservations(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stock_reservations (
+            reservation_id TEXT NOT NULL,
+            medicine_id INTEGER NOT NULL,
+            qty INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (reservation_id, medicine_id)
+        ) WITHOUT ROWID
+    """)
+    # Covering index: SUM(qty) reservasi aktif per obat tanpa membaca tabel
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reservations_medicine ON stock_reservations (medicine_id, expires_at, qty)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reservations_expiry ON stock_reservations (expires_at)")
+    sweep_expired(conn)
+
+
+def reserve(conn, items, ttl_seconds, reservation_id=None):
+    """Tahan stok semua item (all-or-nothing). items: list (medicine_id, qty).
+
+    reservation_id yang sudah ada diganti isinya dan diperpanjang (preview ulang resep yang sama).
+    Return (reservation_id atau None, expires_at, list (medicine_id, ok, available)).
+    """
+    reservation_id = reservation_id or uuid.uuid4().hex
+    ttl = max(1, min(ttl_seconds, RESERVATION_MAX_TTL))
+    now = time.time()
+    expires_at = now + ttl
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("SAVEPOINT reserve")
+        conn.execute("DELETE FROM stock_reservations WHERE reservation_id = ?", (reservation_id,))
+        results = []
+        for medicine_id, qty in merge_items(items):
+            row = conn.execute(
+                f"SELECT stock - ({RESERVED_BY_OTHERS_SQL}) FROM medicines WHERE id = ?",
+                (medicine_id, now, reservation_id, medicine_id)
+            ).fetchone()
+            available = row[0] if row is not None else None
+            ok = available is not None and available >= qty
+            results.append((medicine_id, ok, available))
+            if ok:
+                conn.execute(
+                    "INSERT INTO stock_reservations (reservation_id, medicine_id, qty, expires_at) VALUES (?, ?, ?, ?)",
+                    (reservation_id, medicine_id, qty, expires_at)
+                )
+        success = all(ok for _, ok, _ in results)
+        if not success:
+            # Reservasi lama (jika ada) tetap berlaku
+            conn.execute("ROLLBACK TO reserve")
+        conn.execute("RELEASE reserve")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return (reservation_id if success else None), expires_at, results
+
+
+def deduct_reserved(conn, medicine_id, qty, reservation_id, now):
+    # Potong stok; reservasi aktif milik pihak lain tidak boleh terpakai, reservasi sendiri boleh.
+    # Dipanggil di dalam transaksi pemanggil (deductStockBatch).
+    cursor = conn.execute(
+        f"UPDATE medicines SET stock = stock - ? WHERE id = ? AND stock - ({RESERVED_BY_OTHERS_SQL}) >= ?",
+        (qty, medicine_id, medicine_id, now, reservation_id, qty)
+    )
+    return cursor.rowcount > 0
+
+
+def release(conn, reservation_id):
+    cursor = conn.execute("DELETE FROM stock_reservations WHERE reservation_id = ?", (reservation_id,))
+    return cursor.rowcount > 0
+
+
+def sweep_expired(conn, now=None):
+    cursor = conn.execute(
+        "DELETE FROM stock_reservations WHERE expires_at <= ?", (time.time() if now is None else now,)
+    )
+    return cursor.rowcount
+
+
+def availability(conn, medicine_ids):
+    # Return dict id -> (stock, reserved) untuk obat yang ada
+    now = time.time()
+    placeholders = ", ".join("?" for _ in medicine_ids)
+    rows = conn.execute(f"""
+        SELECT m.id, m.stock, (
+            SELECT COALESCE(SUM(r.qty), 0) FROM stock_reservations r
+            WHERE r.medicine_id = m.id AND r.expires_at > ?
+        ) AS reserved
+        FROM medicines m WHERE m.id IN ({placeholders})
+    """, [now] + list(medicine_ids)).fetchall()
+    return {r["id"]: (r["stock"], r["reserved"]) for r in rows}
+
+
+def merge_items(items):
+    # Obat yang sama muncul dua kali di input digabung jadi satu baris reservasi
+    merged = {}
+    for medicine_id, qty in items:
+        merged[int(medicine_id)] = merged.get(int(medicine_id), 0) + qty
+    return list(merged.items())
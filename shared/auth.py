@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from starlette.requests import HTTPConnection
+from strawberry.fastapi import BaseContext
+
+# Konfigurasi JWT (sama untuk semua service)
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "apotek-iae-secret-key-2025")
+ALGORITHM = "HS256"
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+SERVICE_TOKEN_TTL = int(os.getenv("SERVICE_TOKEN_TTL", "600"))
+
+
+class ClaimsCache:
+    """LRU cache klaim JWT yang sudah diverifikasi, key = hash token, berlaku sampai exp."""
+
+    def __init__(self, max_size=JWT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # sha256(token) -> (exp, claims)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            exp, claims = entry
+            if exp <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, key, exp, claims):
+        with self._lock:
+            self._entries[key] = (exp, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+claims_cache = ClaimsCache()
+
+
+def verify_token(token):
+    # Return klaim JWT jika token valid, None jika tidak
+    if not token:
+        return None
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    claims = claims_cache.get(key)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    # Hanya token dengan exp yang di-cache (agar tidak berlaku selamanya)
+    if claims.get("exp"):
+        claims_cache.set(key, claims["exp"], claims)
+    return claims
+
+
+_service_tokens = {}
+
+
+def service_token(service, role="apoteker"):
+    # Token untuk panggilan antar service yang tidak membawa token user (mis. dispatcher outbox).
+    # Dibuat ulang jika sisa masa berlakunya kurang dari separuh TTL.
+    cached = _service_tokens.get((service, role))
+    now = time.time()
+    if cached is not None and cached[0] - now > SERVICE_TOKEN_TTL / 2:
+        return cached[1]
+    exp = int(now + SERVICE_TOKEN_TTL)
+    token = jwt.encode(
+        {"sub": f"service:{service}", "username": service, "role": role, "exp": exp},
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+    _service_tokens[(service, role)] = (exp, token)
+    return token
+
+
+class AuthContext(BaseContext):
+    """Context GraphQL dengan user yang di-decode secara lazy.
+
+    Token baru diverifikasi saat resolver pertama kali membaca "user"/"token",
+    sehingga query seperti health atau katalog tidak membayar biaya jwt.decode.
+    Tetap kompatibel dengan pola lama `info.context.get("user")`.
+    """
+
+    def __init__(self, authorization=None):
+        super().__init__()
+        self._authorization = authorization
+        self._user = None
+        self._verified = False
+        self.extras = {}
+
+    @property
+    def raw_token(self):
+        if not self._authorization:
+            return None
+        return self._authorization.replace("Bearer ", "")
+
+    @property
+    def user(self):
+        if not self._verified:
+            self._user = verify_token(self.raw_token)
+            self._verified = True
+        return self._user
+
+    @property
+    def token(self):
+        # Token hanya diteruskan jika valid (sama seperti get_context sebelumnya)
+        return self.raw_token if self.user else None
+
+    def get(self, key, default=None):
+        if key == "user":
+            return self.user
+        if key == "token":
+            return self.token
+        return self.extras.get(key, default)
+
+    def __getitem__(self, key):
+        if key in ("user", "token"):
+            return self.get(key)
+        return self.extras[key]
+
+    def __setitem__(self, key, value):
+        self.extras[key] = value
+
+
+async def get_auth_context(request: HTTPConnection) -> AuthContext:
+    # HTTPConnection: dipakai untuk request HTTP biasa maupun koneksi WebSocket (subscription)
+    return AuthContext(request.headers.get("Authorization"))
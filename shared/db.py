@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import functools
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from .metrics import DB_POOL_WAIT, DB_QUERY_DURATION, callable_label, sql_label
+from .tracing import start_span
+
+# Konfigurasi SQLite (bisa di-override lewat environment variable)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHED_STATEMENTS = int(os.getenv("SQLITE_CACHED_STATEMENTS", "256"))
+# Jumlah thread untuk query SQLite (query blocking dijalankan di luar event loop)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+
+
+class Database:
+    """Koneksi SQLite persisten per thread untuk satu file database.
+
+    Setiap thread memakai satu koneksi yang dibuka sekali lalu dipakai ulang,
+    sehingga statement cache sqlite3 (prepared statement) tetap hangat antar request.
+    Database memakai WAL agar pembaca tidak diblok oleh transaksi tulis.
+
+    Koneksi berjalan dalam mode autocommit; operasi tulis dibungkus transaction().
+    Dari resolver async, panggil lewat `await db.run(...)` agar I/O SQLite berjalan di
+    thread pool terbatas dan tidak memblok event loop.
+    """
+
+    def __init__(self, path, pool_size=DB_POOL_SIZE):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._executor = None
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=SQLITE_CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def fetchone(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    async def run(self, fn, *args, **kwargs):
+        # Jalankan fn (yang memakai koneksi milik thread-nya sendiri) di thread pool database
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="sqlite")
+        loop = asyncio.get_running_loop()
+        # Context (span trace aktif) ikut dibawa ke thread database
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(context.run, self._timed, time.perf_counter(), fn, args, kwargs)
+        )
+
+    def _timed(self, submitted, fn, args, kwargs):
+        # Catat waktu antre di thread pool dan durasi kerja SQLite (label = SQL atau nama resolver)
+        started = time.perf_counter()
+        DB_POOL_WAIT.observe(started - submitted, database=self.name)
+        if getattr(fn, "__self__", None) is self and args and isinstance(args[0], str):
+            operation = sql_label(args[0])
+        else:
+            operation = callable_label(fn)
+        try:
+            with start_span(f"db {operation}", kind="client", root=False, database=self.name) as span:
+                if span is not None:
+                    span.set_attribute("db.queue_ms", round((started - submitted) * 1000, 3))
+                return fn(*args, **kwargs)
+        finally:
+            DB_QUERY_DURATION.observe(time.perf_counter() - started, database=self.name, operation=operation)
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        # BEGIN IMMEDIATE mengambil write lock di awal (dipakai untuk read-check-write)
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def close_all(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,200 @@
+import bisect
+import re
+import threading
+import time
+from functools import lru_cache
+from inspect import isawaitable
+
+from starlette.responses import Response
+from strawberry.extensions import SchemaExtension
+
+# Metrics format Prometheus (text exposition) tanpa dependency tambahan.
+# Semua metric disimpan in-process dan di-render oleh endpoint /metrics tiap service.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [count per bucket (+Inf terakhir), sum]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {total}")
+        return lines
+
+
+GRAPHQL_OPERATION_DURATION = Histogram(
+    "graphql_operation_duration_seconds", "Durasi eksekusi operasi GraphQL", ("operation_type", "status")
+)
+GRAPHQL_RESOLVER_DURATION = Histogram(
+    "graphql_resolver_duration_seconds", "Durasi resolver GraphQL (field dengan resolver sendiri)", ("field",)
+)
+HTTP_CLIENT_DURATION = Histogram(
+    "http_client_request_duration_seconds", "Durasi request HTTP keluar per upstream dan operasi",
+    ("upstream", "operation", "status")
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Durasi kerja SQLite di thread pool database", ("database", "operation")
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Waktu tunggu antrean thread pool database", ("database",)
+)
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+async def metrics_endpoint(request):
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@lru_cache(maxsize=512)
+def sql_label(sql):
+    # "SELECT * FROM medicines WHERE ..." -> "SELECT medicines" (label tetap sedikit walau parameter berbeda)
+    verb = sql.split(None, 1)[0].upper() if sql.strip() else "SQL"
+    table = re.search(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", sql, re.IGNORECASE)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+def callable_label(fn):
+    # Lambda di resolver -> "Query.checkStock", fungsi biasa -> nama fungsinya
+    name = getattr(fn, "__qualname__", None) or type(fn).__name__
+    return name.replace(".<locals>.<lambda>", "").replace(".<locals>.", ".")
+
+
+async def observe_request(upstream, operation, send):
+    """Jalankan coroutine request httpx (send) dan catat durasinya."""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = await send
+        status = str(response.status_code)
+        return response
+    finally:
+        HTTP_CLIENT_DURATION.observe(time.perf_counter() - start, upstream=upstream, operation=operation, status=status)
+
+
+_custom_resolver = {}
+
+
+def custom_resolver_definition(info):
+    # Definisi strawberry jika field punya resolver sendiri (bukan sekadar baca atribut), selain itu None.
+    # Field introspection (__typename, __schema, __type) tidak ada di parent_type.fields.
+    key = (info.parent_type.name, info.field_name)
+    if key not in _custom_resolver:
+        field = None if info.field_name.startswith("__") else info.parent_type.fields.get(info.field_name)
+        definition = field.extensions.get("strawberry-definition") if field is not None and field.extensions else None
+        _custom_resolver[key] = definition if definition is not None and definition.base_resolver is not None else None
+    return _custom_resolver[key]
+
+
+def has_custom_resolver(info):
+    return custom_resolver_definition(info) is not None
+
+
+class MetricsExtension(SchemaExtension):
+    """Catat durasi operasi GraphQL dan setiap resolver yang bukan sekadar baca atribut."""
+
+    def on_operation(self):
+        start = time.perf_counter()
+        yield
+        context = self.execution_context
+        try:
+            operation_type = context.operation_type.value
+        except Exception:
+            operation_type = "unknown"
+        status = "error" if context.errors or (context.result and context.result.errors) else "ok"
+        GRAPHQL_OPERATION_DURATION.observe(time.perf_counter() - start, operation_type=operation_type, status=status)
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        if not has_custom_resolver(info):
+            return _next(root, info, *args, **kwargs)
+        start = time.perf_counter()
+        result = _next(root, info, *args, **kwargs)
+        if isawaitable(result):
+            return self._await_resolver(result, start, info)
+        GRAPHQL_RESOLVER_DURATION.observe(time.perf_counter() - start, field=f"{info.parent_type.name}.{info.field_name}")
+        return result
+
+    async def _await_resolver(self, result, start, info):
+        try:
+            return await result
+        finally:
+            GRAPHQL_RESOLVER_DURATION.observe(time.perf_counter() - start, field=f"{info.parent_type.name}.{info.field_name}")
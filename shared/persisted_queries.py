@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from graphql import GraphQLError
+from strawberry.extensions import ParserCache, ValidationCache
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http.exceptions import HTTPException
+from strawberry.types import ExecutionResult
+
+# Automatic persisted queries (protokol Apollo APQ) + cache parse/validasi dokumen GraphQL.
+# Client cukup mengirim sha256 dokumen di extensions.persistedQuery; dokumen lengkap
+# hanya dikirim sekali saat server membalas PersistedQueryNotFound.
+
+PERSISTED_QUERY_CACHE_SIZE = int(os.getenv("PERSISTED_QUERY_CACHE_SIZE", "1000"))
+DOCUMENT_CACHE_SIZE = int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", "256"))
+
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def persisted_query_extensions(query):
+    return {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}
+
+
+def is_persisted_query_not_found(payload):
+    return any(
+        (e.get("extensions") or {}).get("code") == "PERSISTED_QUERY_NOT_FOUND"
+        for e in payload.get("errors") or []
+    )
+
+
+class PersistedQueryNotFound(Exception):
+    pass
+
+
+class PersistedQueryStore:
+    """Map sha256 -> dokumen GraphQL, ukuran dibatasi (LRU)."""
+
+    def __init__(self, max_size=PERSISTED_QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sha256_hash):
+        with self._lock:
+            query = self._documents.get(sha256_hash)
+            if query is not None:
+                self._documents.move_to_end(sha256_hash)
+            return query
+
+    def set(self, sha256_hash, query):
+        with self._lock:
+            self._documents[sha256_hash] = query
+            self._documents.move_to_end(sha256_hash)
+            while len(self._documents) > self.max_size:
+                self._documents.popitem(last=False)
+
+    def __len__(self):
+        return len(self._documents)
+
+
+persisted_queries = PersistedQueryStore()
+
+
+def document_cache_extensions():
+    # Dipasang di strawberry.Schema: dokumen yang sama tidak di-parse & divalidasi ulang
+    return [ParserCache(maxsize=DOCUMENT_CACHE_SIZE), ValidationCache(maxsize=DOCUMENT_CACHE_SIZE)]
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    """GraphQLRouter yang mendukung automatic persisted queries."""
+
+    async def parse_http_body(self, request):
+        request_data = await super().parse_http_body(request)
+
+        if request.method == "GET":
+            extensions = request.query_params.get("extensions")
+            extensions = json.loads(extensions) if extensions else None
+        elif "application/json" in (request.content_type or ""):
+            extensions = json.loads(await request.get_body()).get("extensions")
+        else:
+            extensions = None
+
+        persisted = (extensions or {}).get("persistedQuery")
+        if not persisted:
+            return request_data
+
+        sha256_hash = persisted.get("sha256Hash")
+        if not sha256_hash:
+            raise HTTPException(400, "persistedQuery.sha256Hash wajib diisi")
+        if request_data.query:
+            # Registrasi dokumen baru, hash harus cocok dengan isi dokumen
+            if query_hash(request_data.query) != sha256_hash:
+                raise HTTPException(400, "provided sha does not match query")
+            persisted_queries.set(sha256_hash, request_data.query)
+            return request_data
+
+        query = persisted_queries.get(sha256_hash)
+        if query is None:
+            raise PersistedQueryNotFound()
+        request_data.query = query
+        return request_data
+
+    async def execute_operation(self, request, context, root_value):
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryNotFound:
+            # Dibalas sebagai error GraphQL (bukan HTTP 4xx) sesuai protokol APQ
+            error = GraphQLError(PERSISTED_QUERY_NOT_FOUND, extensions={"code": "PERSISTED_QUERY_NOT_FOUND"})
+            return ExecutionResult(data=None, errors=[error])
@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+# Pub/sub in-process untuk GraphQL subscription: mutation mem-publish event kecil (delta),
+# setiap koneksi subscription punya antrean sendiri. Cukup karena tiap service berjalan
+# sebagai satu proses; jika service di-scale ke banyak worker perlu broker eksternal.
+
+# Subscriber yang antreannya penuh (client lambat) diputus agar tidak menahan memori
+PUBSUB_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "1000"))
+
+
+class SubscriberOverflow(Exception):
+    pass
+
+
+class Broadcaster:
+    def __init__(self, queue_size=PUBSUB_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = {}  # topic -> set of asyncio.Queue
+        self._loop = None
+
+    def publish(self, topic, event):
+        """Kirim event ke semua subscriber topic. Aman dipanggil dari thread lain (mis. db.run)."""
+        if not self._subscribers.get(topic):
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not self._loop:
+            self._loop.call_soon_threadsafe(self._publish, topic, event)
+        else:
+            self._publish(topic, event)
+
+    def _publish(self, topic, event):
+        for queue in list(self._subscribers.get(topic, ())):
+            if queue.full():
+                # Tandai overflow; subscriber berhenti setelah membaca penanda ini
+                queue.get_nowait()
+                queue.put_nowait(SubscriberOverflow())
+                self._subscribers[topic].discard(queue)
+            else:
+                queue.put_nowait(event)
+
+    async def subscribe(self, topic):
+        """Async generator event untuk satu subscriber (berhenti saat client disconnect)."""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(topic, set()).add(queue)
+        try:
+            while True:
+                event = await queue.get()
+                if isinstance(event, SubscriberOverflow):
+                    raise SubscriberOverflow("Subscriber terlalu lambat, event dibuang")
+                yield event
+        finally:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(queue)
+
+    def subscriber_count(self, topic):
+        return len(self._subscribers.get(topic, ()))
+
+
+broadcaster = Broadcaster()
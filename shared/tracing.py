@@ -0,0 +1,282 @@
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from starlette.responses import JSONResponse
+from strawberry.extensions import SchemaExtension
+
+from .metrics import custom_resolver_definition, observe_request
+
+# Tracing terdistribusi ringan (W3C traceparent) tanpa collector eksternal.
+# Span yang di-sample ditulis sebagai JSON lines ke TRACE_FILE dan disimpan di ring buffer
+# yang bisa dilihat lewat endpoint /traces di setiap service.
+# Default hanya 1% request yang di-sample; TRACE_SAMPLE_RATE=1 untuk menelusuri semua request.
+# TRACE_FILE dirotasi ke "<TRACE_FILE>.1" setelah TRACE_FILE_MAX_BYTES (satu cadangan).
+
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "2000"))
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+service_name = "unknown"
+current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "sampled", "attributes", "status", "start", "_started")
+
+    def __init__(self, name, kind, trace_id, parent_id, sampled, attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.status = "ok"
+        self.start = time.time()
+        self._started = time.perf_counter()
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self, duration):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentId": self.parent_id,
+            "service": service_name,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "durationMs": round(duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Tulis span ke file JSON lines lewat thread terpisah (tidak memblok event loop)."""
+
+    _STOP = object()
+
+    def __init__(self, path, buffer_size, max_bytes=TRACE_FILE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.recent = deque(maxlen=buffer_size)
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def export(self, record):
+        self.recent.append(record)
+        if not self.path or self._closed:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(record)
+
+    def _write_loop(self):
+        # Hanya thread ini yang menulis file; flush() cukup mengirim _STOP lalu menunggu
+        while True:
+            records = [self._queue.get()]
+            while records[-1] is not self._STOP:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = records[-1] is self._STOP
+            self._write([r for r in records if r is not self._STOP])
+            if stop:
+                return
+
+    def _write(self, records):
+        if not records:
+            return
+        f = None
+        try:
+            for record in records:
+                if f is None or (self.max_bytes > 0 and f.tell() >= self.max_bytes):
+                    f = self._open(f)
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            print(f"Warning: Gagal menulis trace ke {self.path}: {str(e)}")
+        finally:
+            if f is not None:
+                f.close()
+
+    def _open(self, current):
+        # Buka TRACE_FILE untuk append; rotasi ke "<path>.1" jika sudah mencapai max_bytes
+        if current is not None:
+            current.close()
+        if self.max_bytes > 0 and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        return open(self.path, "a", encoding="utf-8")
+
+    def flush(self, timeout=5.0):
+        # Dipanggil saat proses berhenti: thread penulis menulis sisa antrean lalu selesai
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(self._STOP)
+            thread.join(timeout)
+
+
+exporter = SpanExporter(TRACE_FILE, TRACE_BUFFER_SIZE)
+atexit.register(exporter.flush)
+
+
+def parse_traceparent(header):
+    # Return (trace_id, parent_span_id, sampled) atau None jika header tidak valid
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+
+
+@contextmanager
+def start_span(name, kind="internal", traceparent=None, root=True, **attributes):
+    """Buka span baru sebagai child dari span aktif (atau dari header traceparent).
+
+    root=False: hanya dibuat jika sudah ada span aktif yang di-sample (DB, resolver),
+    sehingga pekerjaan di luar request (init, background tanpa trace) tidak menambah overhead.
+    """
+    parent = current_span.get()
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote:
+        trace_id, parent_id, sampled = remote
+    elif parent is not None:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    elif root:
+        trace_id, parent_id, sampled = f"{random.getrandbits(128):032x}", None, random.random() < TRACE_SAMPLE_RATE
+    else:
+        yield None
+        return
+    if not root and not sampled:
+        yield None
+        return
+
+    span = Span(name, kind, trace_id, parent_id, sampled, attributes)
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.status = "error"
+        span.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        if span.sampled:
+            exporter.export(span.to_dict(time.perf_counter() - span._started))
+
+
+def current_traceparent():
+    span = current_span.get()
+    return span.traceparent if span is not None else None
+
+
+async def inject_traceparent(request):
+    # Event hook httpx: teruskan trace aktif ke service tujuan
+    traceparent = current_traceparent()
+    if traceparent:
+        request.headers["traceparent"] = traceparent
+
+
+async def traced_request(upstream, operation, send):
+    """observe_request + span client; traceparent disuntikkan oleh event hook inject_traceparent."""
+    with start_span(f"http {upstream}.{operation}", kind="client", root=False, upstream=upstream) as span:
+        response = await observe_request(upstream, operation, send)
+        if span is not None:
+            span.set_attribute("http.status_code", response.status_code)
+        return response
+
+
+class TracingMiddleware:
+    """ASGI middleware: span server untuk setiap request HTTP, melanjutkan traceparent dari caller."""
+
+    def __init__(self, app, service, path_prefix="/"):
+        global service_name
+        service_name = service
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in ("/metrics", "/traces") or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with start_span(f"{scope['method']} {scope['path']}", kind="server", traceparent=traceparent) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+class TracingExtension(SchemaExtension):
+    """Span untuk operasi GraphQL dan setiap resolver yang bukan sekadar baca atribut."""
+
+    def on_operation(self):
+        context = self.execution_context
+        with start_span("graphql.operation", root=False) as span:
+            yield
+            if span is not None:
+                try:
+                    span.set_attribute("graphql.operation_type", context.operation_type.value)
+                except Exception:
+                    pass
+                span.set_attribute("graphql.operation_name", context.operation_name)
+                if context.errors or (context.result and context.result.errors):
+                    span.status = "error"
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        span = current_span.get()
+        definition = custom_resolver_definition(info) if span is not None and span.sampled else None
+        if definition is None:
+            return _next(root, info, *args, **kwargs)
+        name = f"resolve {info.parent_type.name}.{info.field_name}"
+        if definition.is_async:
+            return self._traced(_next(root, info, *args, **kwargs), name)
+        with start_span(name, root=False):
+            return _next(root, info, *args, **kwargs)
+
+    async def _traced(self, result, name):
+        # Coroutine resolver baru berjalan saat di-await, jadi span dibuka di sini
+        with start_span(name, root=False):
+            return await result
+
+
+async def traces_endpoint(request):
+    # Viewer sederhana: span terbaru (opsional difilter ?traceId=...)
+    trace_id = request.query_params.get("traceId")
+    spans = list(exporter.recent)
+    if trace_id:
+        spans = [s for s in spans if s["traceId"] == trace_id]
+    return JSONResponse(spans[-500:])
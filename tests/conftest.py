@@ -0,0 +1,50 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+# Satu thread database agar trace callback menangkap semua statement; span tidak ditulis ke file
+os.environ.setdefault("DB_POOL_SIZE", "1")
+os.environ.setdefault("TRACE_FILE", "")
+os.environ.setdefault("CATALOG_REPLICA_ENABLED", "0")
+
+
+def load_module(service, name, module_name=None):
+    # Modul service (app.py dan helper-nya) saling impor dengan nama pendek (import outbox),
+    # jadi nama pendek milik service lain dibuang dulu dari sys.modules
+    service_dir = os.path.join(ROOT, service)
+    for filename in os.listdir(service_dir):
+        if filename.endswith(".py"):
+            sys.modules.pop(filename[:-3], None)
+    module_name = module_name or f"{service.replace('-', '_')}_{name}"
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(service_dir, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    sys.path.insert(0, service_dir)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(service_dir)
+    return module
+
+
+@pytest.fixture
+def load_service(tmp_path, monkeypatch):
+    """Import app.py sebuah service dengan database SQLite baru di direktori sementara."""
+    monkeypatch.chdir(tmp_path)
+    loaded = []
+
+    def load(service, name="app"):
+        module = load_module(service, name, f"{service.replace('-', '_')}_{name}_{len(loaded)}")
+        loaded.append(module)
+        return module
+
+    yield load
+    for module in loaded:
+        if hasattr(module, "db"):
+            module.db.close_all()
@@ -0,0 +1,148 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from conftest import load_module
+
+idempotency = load_module("transaction-service", "idempotency")
+
+CHECKOUT = """
+mutation ($amount: Float!, $id: String!, $key: String) {
+    createTransaction(paymentAmount: $amount, prescriptionId: $id, idempotencyKey: $key)
+}
+"""
+
+
+@pytest.fixture
+def transaction_app(load_service, monkeypatch):
+    app = load_service("transaction-service")
+    calls = {"validate": 0}
+    gate = {"event": None}
+
+    async def validate_prescription(prescription_id):
+        calls["validate"] += 1
+        if gate["event"] is not None:
+            await gate["event"].wait()
+        return {"patientName": "Budi", "medicines": [{"name": "Paracetamol", "qty": 2}]}
+
+    async def fetch_inventory_by_names(client, names, headers=None):
+        return {"paracetamol": {"id": "1", "name": "Paracetamol", "price": 5000.0, "stock": 100}}
+
+    async def reserve_stock(prescription_id, items, holder=None):
+        return True, [], None
+
+    monkeypatch.setattr(app, "validate_prescription", validate_prescription)
+    monkeypatch.setattr(app, "fetch_inventory_by_names", fetch_inventory_by_names)
+    monkeypatch.setattr(app, "reserve_stock", reserve_stock)
+    app.test_calls = calls
+    app.test_gate = gate
+    return app
+
+
+async def checkout(app, user, amount, key=None, prescription_id="RS-1"):
+    result = await app.schema.execute(
+        CHECKOUT,
+        variable_values={"amount": amount, "id": prescription_id, "key": key},
+        context_value={"user": {"sub": user, "role": "kasir"}, "token": None}
+    )
+    assert not result.errors, result.errors
+    return result.data["createTransaction"]
+
+
+def paid_count(app):
+    return app.db.fetchone("SELECT COUNT(*) FROM transactions WHERE status = 'PAID'")[0]
+
+
+def test_retry_with_same_key_returns_original_receipt(transaction_app):
+    async def scenario():
+        first = await checkout(transaction_app, "1", 20000, "k-1")
+        again = await checkout(transaction_app, "1", 20000, "k-1")
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert first == "Sukses! 2x Paracetamol. Kembalian: Rp 10,000"
+    assert again == first
+    assert paid_count(transaction_app) == 1
+
+
+@pytest.mark.parametrize("user, amount, key", [
+    ("2", 50000, "k-2"),    # kasir lain
+    ("1", 50000, "k-other"),  # kasir sama, key baru
+    ("1", 20000, None),     # tanpa key
+])
+def test_later_caller_does_not_see_first_payment(transaction_app, user, amount, key):
+    async def scenario():
+        await checkout(transaction_app, "1", 20000, "k-1")
+        return await checkout(transaction_app, user, amount, key)
+
+    message = asyncio.run(scenario())
+    assert message == "Error: Resep sudah dibayar (transaksi #1)"
+    assert "Kembalian" not in message
+    assert paid_count(transaction_app) == 1
+    if key:
+        # Key pemanggil kedua dilepas, tidak menyimpan hasil milik pembayaran lain
+        assert transaction_app.db.fetchone(
+            "SELECT 1 FROM idempotency_keys WHERE user_id = ? AND key = ?", (user, key)
+        ) is None
+
+
+def test_concurrent_identical_submits_share_one_checkout(transaction_app):
+    async def scenario():
+        transaction_app.test_gate["event"] = asyncio.Event()
+        submits = [
+            asyncio.ensure_future(checkout(transaction_app, "1", 20000)),
+            asyncio.ensure_future(checkout(transaction_app, "1", 20000)),
+            asyncio.ensure_future(checkout(transaction_app, "2", 20000)),
+            asyncio.ensure_future(checkout(transaction_app, "1", 30000)),
+        ]
+        await asyncio.sleep(0.05)
+        transaction_app.test_gate["event"].set()
+        return await asyncio.gather(*submits)
+
+    same_a, same_b, other_user, other_amount = asyncio.run(scenario())
+    assert same_a == same_b == "Sukses! 2x Paracetamol. Kembalian: Rp 10,000"
+    assert other_user.startswith("Error: Resep ini sedang diproses")
+    assert other_amount.startswith("Error: Resep ini sedang diproses")
+    assert transaction_app.test_calls["validate"] == 1
+    assert paid_count(transaction_app) == 1
+
+
+def test_key_cannot_be_reused_for_another_prescription(transaction_app):
+    async def scenario():
+        await checkout(transaction_app, "1", 20000, "k-1", prescription_id="RS-1")
+        return await checkout(transaction_app, "1", 20000, "k-1", prescription_id="RS-2")
+
+    assert asyncio.run(scenario()) == "Error: Idempotency key sudah dipakai untuk resep lain"
+
+
+@pytest.fixture
+def key_conn():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY, prescription_id TEXT, status TEXT)")
+    idempotency.init_idempotency(conn)
+    yield conn
+    conn.close()
+
+
+def test_in_progress_key_blocks_until_its_lease_expires(key_conn):
+    assert idempotency.claim_key(key_conn, "1", "k", "RS-1") is None
+    busy = idempotency.claim_key(key_conn, "1", "k", "RS-1", lease_seconds=60)
+    assert busy["status"] == idempotency.IN_PROGRESS
+
+    # Checkout pemilik key mati: setelah lease habis retry boleh mengambil alih
+    assert idempotency.claim_key(key_conn, "1", "k", "RS-1", lease_seconds=0) is None
+
+
+def test_expired_lease_is_not_reclaimed_for_another_prescription(key_conn):
+    idempotency.claim_key(key_conn, "1", "k", "RS-1")
+    row = idempotency.claim_key(key_conn, "1", "k", "RS-2", lease_seconds=0)
+    assert row["prescription_id"] == "RS-1"
+
+
+def test_completed_key_is_never_reclaimed(key_conn):
+    idempotency.claim_key(key_conn, "1", "k", "RS-1")
+    idempotency.complete_key(key_conn, "1", "k", "Sukses!")
+    row = idempotency.claim_key(key_conn, "1", "k", "RS-1", lease_seconds=0)
+    assert (row["status"], row["response"]) == (idempotency.DONE, "Sukses!")
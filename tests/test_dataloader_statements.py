@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from bench_dataloaders import count_statements
+
+CHECK_STOCK_NAMES = ["Paracetamol", "amoxicillin", "Seretide", "para"]
+
+# operasi -> (service, batas statement dengan DataLoader berapapun jumlah alias, pembuat query).
+# checkStock: satu query nama persis + satu query FTS untuk semua nama yang tidak ketemu.
+OPERATIONS = {
+    "userById": (
+        "auth-service", 1,
+        lambda n: "{ " + " ".join(f'u{i}: userById(id: "{i % 3 + 1}") {{ username }}' for i in range(n)) + " }"
+    ),
+    "checkStock": (
+        "inventory-service", 2,
+        lambda n: "{ " + " ".join(
+            f'm{i}: checkStock(medicineName: "{CHECK_STOCK_NAMES[i % len(CHECK_STOCK_NAMES)]}") {{ stock }}'
+            for i in range(n)
+        ) + " }"
+    ),
+    "medicine": (
+        "inventory-service", 1,
+        lambda n: "{ " + " ".join(f'm{i}: medicine(id: "{i % 2 + 1}") {{ name isAvailable }}' for i in range(n)) + " }"
+    ),
+}
+
+
+@pytest.mark.parametrize("aliases", [1, 10, 50])
+@pytest.mark.parametrize("operation", sorted(OPERATIONS))
+def test_statement_count_is_bounded(load_service, operation, aliases):
+    service_name, max_statements, make_query = OPERATIONS[operation]
+    service = load_service(service_name)
+    query = make_query(aliases)
+
+    per_item = asyncio.run(count_statements(service, query, per_item_loaders=True))
+    batched = asyncio.run(count_statements(service, query, per_item_loaders=False))
+
+    assert batched <= max_statements
+    if aliases == 50:
+        # Tanpa DataLoader jumlahnya ikut jumlah alias (N+1)
+        assert per_item >= aliases
@@ -0,0 +1,197 @@
+import asyncio
+import csv
+import io
+import json
+import sqlite3
+
+import pytest
+from starlette.testclient import TestClient
+
+from shared.auth import service_token
+
+HISTORY = """
+query ($first: Int!, $after: String, $from: String, $to: String) {
+    transactions(first: $first, after: $after, from: $from, to: $to) {
+        items { id createdAt items { name qty subtotal } }
+        pageInfo { endCursor hasNextPage }
+    }
+}
+"""
+
+# 12 transaksi di 3 hari; beberapa berbagi created_at yang sama persis (urutan ditentukan id)
+CREATED_AT = [
+    "2025-01-01 08:00:00", "2025-01-01 08:00:00", "2025-01-01 09:30:00", "2025-01-01 23:59:59",
+    "2025-01-02 00:00:00", "2025-01-02 10:00:00", "2025-01-02 10:00:00", "2025-01-02 10:00:00",
+    "2025-01-03 07:15:00", "2025-01-03 07:15:00", "2025-01-03 12:00:00", "2025-01-03 18:45:00",
+]
+
+
+@pytest.fixture
+def app(load_service):
+    app = load_service("transaction-service")
+    with app.db.transaction() as conn:
+        for i, created_at in enumerate(CREATED_AT):
+            transaction_id = conn.execute(
+                "INSERT INTO transactions (prescription_id, total_price, status, created_at) VALUES (?, ?, 'PAID', ?) "
+                "RETURNING id",
+                (f"RS-{i}", 1000.0 * (i + 1), created_at)
+            ).fetchone()[0]
+            if i % 4 != 3:
+                # Setiap transaksi ke-4 tanpa item (transaksi lama sebelum ledger)
+                app.ledger.record_items(conn, transaction_id, [
+                    {"id": "1", "name": "Paracetamol", "qty": i + 1, "price": 500.0},
+                    {"id": "2", "name": "Amoxicillin", "qty": 1, "price": 500.0 * i},
+                ])
+    return app
+
+
+def expected_order(descending=True, date_from=None, date_to=None):
+    rows = [
+        (created_at, i + 1) for i, created_at in enumerate(CREATED_AT)
+        if (date_from is None or created_at[:10] >= date_from) and (date_to is None or created_at[:10] <= date_to)
+    ]
+    return [transaction_id for _, transaction_id in sorted(rows, reverse=descending)]
+
+
+def walk(app, first, descending=True, date_from=None, date_to=None):
+    ids, after, pages = [], None, 0
+    while True:
+        rows, items, after, has_next = app.ledger.fetch_page(
+            app.db.connection(), first, after, date_from, date_to, descending=descending
+        )
+        ids.extend(r["id"] for r in rows)
+        pages += 1
+        if not has_next:
+            return ids, pages
+
+
+@pytest.mark.parametrize("first", [1, 5, 12, 50])
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_cover_every_transaction_once_in_order(app, first, descending):
+    ids, pages = walk(app, first, descending)
+    assert ids == expected_order(descending)
+    assert pages == max(1, -(-len(CREATED_AT) // first))
+
+
+@pytest.mark.parametrize("date_from, date_to", [
+    ("2025-01-02", "2025-01-02"),
+    ("2025-01-01", "2025-01-02"),
+    ("2025-01-03", None),
+    (None, "2025-01-01"),
+    ("2025-02-01", None),
+])
+def test_date_range_is_inclusive(app, date_from, date_to):
+    ids, _ = walk(app, 2, True, date_from, date_to)
+    assert ids == expected_order(True, date_from, date_to)
+
+
+def test_new_transactions_do_not_shift_later_pages(app):
+    rows, _, cursor, _ = app.ledger.fetch_page(app.db.connection(), 4)
+    first_page = [r["id"] for r in rows]
+    app.db.execute(
+        "INSERT INTO transactions (prescription_id, total_price, status, created_at) VALUES ('RS-new', 1, 'PAID', '2025-01-04 00:00:00')"
+    )
+    rows, _, _, _ = app.ledger.fetch_page(app.db.connection(), 4, cursor)
+    assert [r["id"] for r in rows] == expected_order()[4:8]
+    assert not set(first_page) & {r["id"] for r in rows}
+
+
+def test_items_follow_their_transaction_in_position_order(app):
+    rows, items, _, _ = app.ledger.fetch_page(app.db.connection(), 12, descending=False)
+    first = items[rows[0]["id"]]
+    assert [(i["position"], i["name"], i["qty"], i["subtotal"]) for i in first] == [
+        (0, "Paracetamol", 1, 500.0), (1, "Amoxicillin", 1, 0.0)
+    ]
+    assert items[rows[3]["id"]] == []
+
+
+@pytest.mark.parametrize("cursor", ["bukan-cursor", "W10=", "eyJhIjogMX0="])
+def test_invalid_cursor_is_rejected(app, cursor):
+    with pytest.raises(ValueError):
+        app.ledger.fetch_page(app.db.connection(), 5, cursor)
+
+
+def execute(app, variables, role="apoteker"):
+    return asyncio.run(app.schema.execute(
+        HISTORY, variable_values=variables, context_value={"user": {"sub": "1", "role": role}}
+    ))
+
+
+def test_history_query_pages_newest_first(app):
+    result = execute(app, {"first": 5})
+    page = result.data["transactions"]
+    assert [int(t["id"]) for t in page["items"]] == expected_order()[:5]
+    assert page["pageInfo"]["hasNextPage"]
+
+    result = execute(app, {"first": 5, "after": page["pageInfo"]["endCursor"]})
+    assert [int(t["id"]) for t in result.data["transactions"]["items"]] == expected_order()[5:10]
+
+
+def test_history_query_requires_admin_or_apoteker(app):
+    result = execute(app, {"first": 5}, role="kasir")
+    assert result.errors and "Unauthorized" in result.errors[0].message
+
+
+def export(app, **params):
+    client = TestClient(app.app)
+    headers = {"Authorization": f"Bearer {service_token('tests')}"}
+    return client.get("/transactions/export", params=params, headers=headers)
+
+
+def test_ndjson_export_streams_all_pages_oldest_first(app, monkeypatch):
+    monkeypatch.setattr(app.ledger, "EXPORT_PAGE_SIZE", 5)
+    response = export(app, format="ndjson")
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["id"] for r in records] == expected_order(descending=False)
+    assert records[0]["items"][0] == {
+        "medicineId": "1", "name": "Paracetamol", "qty": 1, "unitPrice": 500.0, "subtotal": 500.0
+    }
+
+
+def test_csv_export_has_one_row_per_item(app, monkeypatch):
+    monkeypatch.setattr(app.ledger, "EXPORT_PAGE_SIZE", 5)
+    response = export(app, format="csv", **{"from": "2025-01-02", "to": "2025-01-02"})
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == list(app.ledger.CSV_COLUMNS)
+    # 4 transaksi tanggal 2, satu tanpa item: 3 x 2 item + 1 baris kosong
+    assert len(rows) - 1 == 7
+    assert [int(r[0]) for r in rows[1:]] == [5, 5, 6, 6, 7, 7, 8]
+
+
+def test_export_rejects_bad_requests(app):
+    assert export(app, format="xml").status_code == 400
+    assert export(app, **{"from": "01-02-2025"}).status_code == 400
+    assert TestClient(app.app).get("/transactions/export").status_code == 401
+
+
+def test_ledger_backfill_runs_before_outbox_pruning(load_service, tmp_path):
+    # Database lama (sebelum ledger): item transaksi hanya ada di payload outbox deduct_stock
+    # yang sudah DONE dan lebih tua dari OUTBOX_RETENTION_DAYS
+    conn = sqlite3.connect(tmp_path / "transaction_db.sqlite")
+    conn.execute("""
+        CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, prescription_id TEXT,
+            total_price REAL, status TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+    """)
+    conn.execute("""
+        CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, aggregate_id TEXT,
+            payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'PENDING', attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL, last_error TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+    """)
+    conn.execute(
+        "INSERT INTO transactions (prescription_id, total_price, status, created_at) "
+        "VALUES ('RS-1', 10000, 'PAID', datetime('now', '-30 days'))"
+    )
+    conn.execute(
+        "INSERT INTO outbox (kind, aggregate_id, payload, status, available_at, created_at) "
+        "VALUES ('deduct_stock', '1', ?, 'DONE', 0, datetime('now', '-30 days'))",
+        (json.dumps({"transaction_id": 1, "items": [{"id": "1", "name": "Paracetamol", "qty": 2}]}),)
+    )
+    conn.commit()
+    conn.close()
+
+    app = load_service("transaction-service")
+    items = app.db.fetchall("SELECT transaction_id, name, qty, unit_price FROM transaction_items")
+    assert [tuple(i) for i in items] == [(1, "Paracetamol", 2, None)]
+    assert app.db.fetchone("SELECT COUNT(*) FROM outbox")[0] == 0
@@ -0,0 +1,240 @@
+import asyncio
+import sqlite3
+import time
+
+import httpx
+import pytest
+
+from conftest import load_module
+from shared.db import Database
+
+outbox = load_module("transaction-service", "outbox")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(outbox, "backoff_delay", lambda attempts: 0)
+    database = Database(str(tmp_path / "outbox.sqlite"))
+    outbox.init_outbox(database.connection())
+    yield database
+    database.close_all()
+
+
+def enqueue(db, kind, payload=None):
+    outbox.enqueue(db.connection(), kind, payload or {})
+
+
+def rows(db):
+    return [tuple(r) for r in db.fetchall("SELECT kind, status, attempts FROM outbox ORDER BY id")]
+
+
+def run_until(dispatcher, done, timeout=3.0):
+    async def scenario():
+        dispatcher.start()
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        alive = not dispatcher._task.done()
+        await dispatcher.stop()
+        return alive
+
+    return asyncio.run(scenario())
+
+
+def all_settled(db):
+    return lambda: db.fetchone(
+        "SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (outbox.PENDING, outbox.IN_FLIGHT)
+    )[0] == 0
+
+
+def test_transient_failures_are_retried_until_done(db):
+    failures = {"left": 2}
+
+    async def flaky(payload):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("Inventory down")
+
+    enqueue(db, "flaky")
+    assert run_until(outbox.OutboxDispatcher(db, {"flaky": flaky}), all_settled(db))
+    assert rows(db) == [("flaky", outbox.DONE, 3)]
+
+
+def test_followup_runs_with_done_and_after_commit_is_called(db):
+    committed = []
+
+    async def first(payload):
+        def followup(conn):
+            outbox.enqueue(conn, "second", {"from": "first"})
+            return lambda: committed.append("first")
+        return followup
+
+    async def second(payload):
+        committed.append(payload["from"])
+
+    enqueue(db, "first")
+    dispatcher = outbox.OutboxDispatcher(db, {"first": first, "second": second})
+    assert run_until(dispatcher, lambda: len(committed) == 2)
+    assert committed == ["first", "first"]
+    assert rows(db) == [("first", outbox.DONE, 1), ("second", outbox.DONE, 1)]
+
+
+def compensation(log):
+    def compensate(payload, error):
+        def followup(conn):
+            outbox.enqueue(conn, "undo", payload)
+            return lambda: log.append(error)
+        return followup
+    return compensate
+
+
+async def noop(payload):
+    return None
+
+
+def test_entry_goes_dead_after_max_attempts_and_is_compensated(db):
+    compensated = []
+
+    async def failing(payload):
+        raise RuntimeError("ditolak")
+
+    enqueue(db, "deduct", {"id": 1})
+    dispatcher = outbox.OutboxDispatcher(
+        db, {"deduct": failing, "undo": noop}, compensations={"deduct": compensation(compensated)}
+    )
+    assert run_until(dispatcher, all_settled(db))
+    assert rows(db) == [("deduct", outbox.DEAD, 3), ("undo", outbox.DONE, 1)]
+    assert compensated == ["RuntimeError: ditolak"]
+
+
+def test_permanent_error_is_dead_on_first_attempt(db):
+    compensated = []
+
+    async def rejected(payload):
+        raise outbox.PermanentDeliveryError("payload tidak valid")
+
+    enqueue(db, "deduct")
+    dispatcher = outbox.OutboxDispatcher(
+        db, {"deduct": rejected, "undo": noop}, compensations={"deduct": compensation(compensated)}
+    )
+    assert run_until(dispatcher, all_settled(db))
+    assert rows(db) == [("deduct", outbox.DEAD, 1), ("undo", outbox.DONE, 1)]
+    assert compensated == ["payload tidak valid"]
+
+
+def test_uncertain_outcome_is_never_dead_lettered(db):
+    attempts = {"count": 0}
+
+    async def timeout_then_ok(payload):
+        attempts["count"] += 1
+        if attempts["count"] <= 6:
+            raise outbox.UncertainDeliveryError("ReadTimeout")
+
+    enqueue(db, "deduct")
+    dispatcher = outbox.OutboxDispatcher(
+        db, {"deduct": timeout_then_ok}, compensations={"deduct": compensation([])}
+    )
+    assert run_until(dispatcher, all_settled(db))
+    assert rows(db) == [("deduct", outbox.DONE, 7)]
+
+
+def test_failed_status_write_does_not_stop_the_dispatcher(db, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_LEASE_SECONDS", 0.05)
+    mark_done = outbox.mark_done
+    failures = {"left": 1}
+
+    def locked_once(conn, entry_id):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        mark_done(conn, entry_id)
+
+    monkeypatch.setattr(outbox, "mark_done", locked_once)
+    outcomes = []
+    enqueue(db, "job")
+    enqueue(db, "job")
+    dispatcher = outbox.OutboxDispatcher(db, {"job": noop}, on_delivery=lambda kind, outcome: outcomes.append(outcome))
+
+    # Entry yang statusnya gagal ditulis tetap IN_FLIGHT dan dikirim ulang setelah lease habis
+    assert run_until(dispatcher, all_settled(db))
+    assert sorted(rows(db)) == [("job", outbox.DONE, 1), ("job", outbox.DONE, 2)]
+    assert sorted(outcomes) == ["done", "done", "error"]
+
+
+def test_backoff_is_capped_for_unlimited_retries():
+    assert outbox.backoff_delay(5000) <= outbox.OUTBOX_MAX_BACKOFF
+
+
+@pytest.fixture
+def transaction_app(load_service, monkeypatch):
+    app = load_service("transaction-service")
+    app.test_events = []
+    app.test_invalidated = []
+    monkeypatch.setattr(app, "publish_transaction_event", lambda *event: app.test_events.append(event))
+    monkeypatch.setattr(app.prescription_cache, "invalidate", app.test_invalidated.append)
+    return app
+
+
+def paid_transaction(app, prescription_id="RS-1"):
+    items = [{"id": "1", "name": "Paracetamol", "qty": 2, "price": 5000.0}]
+    transaction_id, _ = app.save_paid_transaction(prescription_id, 10000.0, "Sukses!", items, "1", "k-1")
+    app.held_reservations[prescription_id] = (time.time() + 60, "1")
+    return transaction_id, {
+        "transaction_id": transaction_id, "prescription_id": prescription_id,
+        "items": items, "reservation_id": app.reservation_id_for(prescription_id)
+    }
+
+
+def test_dead_stock_deduction_cancels_the_transaction(transaction_app):
+    app = transaction_app
+    transaction_id, payload = paid_transaction(app)
+
+    followup = app.compensate_stock_deduction(payload, "ditolak Inventory")
+    with app.db.transaction() as conn:
+        after_commit = followup(conn)
+    after_commit()
+
+    status, receipt = app.db.fetchone("SELECT status, receipt FROM transactions WHERE id = ?", (transaction_id,))
+    assert status == "CANCELLED"
+    assert "ditolak Inventory" in receipt
+    assert app.db.fetchone("SELECT SUM(total_revenue) FROM daily_revenue")[0] == 0
+    release = app.db.fetchone("SELECT payload FROM outbox WHERE kind = ?", (app.RELEASE_RESERVATION,))
+    assert release is not None and "rx-RS-1" in release[0]
+    assert app.test_invalidated == ["RS-1"]
+    assert [e[2] for e in app.test_events] == ["CANCELLED"]
+
+
+def fake_post(response=None, error=None):
+    async def post_persisted_query(*args, **kwargs):
+        if error is not None:
+            raise error
+        return response
+    return post_persisted_query
+
+
+@pytest.mark.parametrize("post, expected", [
+    (fake_post(error=httpx.ReadTimeout("timeout")), "UncertainDeliveryError"),
+    (fake_post(httpx.Response(503, json={})), "UncertainDeliveryError"),
+    (fake_post(httpx.Response(200, json={"errors": [{"message": "database is locked"}]})), "InventoryServiceError"),
+])
+def test_failed_deduction_keeps_the_local_hold(transaction_app, monkeypatch, post, expected):
+    app = transaction_app
+    _, payload = paid_transaction(app)
+    monkeypatch.setattr(app, "post_persisted_query", post)
+
+    with pytest.raises(Exception) as raised:
+        asyncio.run(app.deliver_stock_deduction(payload))
+    assert type(raised.value).__name__ == expected
+    assert "RS-1" in app.held_reservations
+
+
+def test_definite_deduction_result_drops_the_local_hold(transaction_app, monkeypatch):
+    app = transaction_app
+    _, payload = paid_transaction(app)
+    result = {"data": {"deductStockBatch": {"success": True, "items": [{"id": "1", "success": True}]}}}
+    monkeypatch.setattr(app, "post_persisted_query", fake_post(httpx.Response(200, json=result)))
+
+    assert asyncio.run(app.deliver_stock_deduction(payload)) is not None
+    assert "RS-1" not in app.held_reservations
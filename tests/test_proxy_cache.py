@@ -0,0 +1,180 @@
+import json
+import time
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from conftest import load_module
+from shared.auth import service_token
+
+proxy_cache = load_module("frontend", "proxy_cache")
+
+STOCK_QUERY = "query Stock { checkStock(medicineName: \"Paracetamol\") { stock } }"
+
+
+def body(query, variables=None, operation_name=None):
+    return json.dumps({"query": query, "variables": variables, "operationName": operation_name}).encode()
+
+
+def test_equivalent_queries_share_a_cache_key():
+    a = proxy_cache.read_operation(body("query   Stock {\n  # stok\n  checkStock(medicineName: \"Paracetamol\") { stock } }"))
+    b = proxy_cache.read_operation(body(STOCK_QUERY))
+    assert a == b
+    assert a[0] == "query"
+
+
+def test_variables_and_operation_name_are_part_of_the_key():
+    query = "query A($n: String!) { checkStock(medicineName: $n) { stock } } mutation B { x }"
+    a = proxy_cache.read_operation(body(query, {"n": "a", "z": 1}, "A"))
+    b = proxy_cache.read_operation(body(query, {"z": 1, "n": "a"}, "A"))
+    assert a == b
+    assert proxy_cache.read_operation(body(query, {"n": "b"}, "A")) != a
+    assert proxy_cache.read_operation(body(query, None, "B"))[0] == "mutation"
+    # Dokumen dengan dua operasi tanpa operationName tidak bisa ditentukan jenisnya
+    assert proxy_cache.read_operation(body(query)) is None
+
+
+@pytest.mark.parametrize("raw", [b"bukan json", b"[]", b'{"query": 1}', b'{"query": "query {"}'])
+def test_unreadable_bodies_are_not_cacheable(raw):
+    assert proxy_cache.read_operation(raw) is None
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+])
+def test_etag_matches(header, matches):
+    assert proxy_cache.etag_matches(header, '"abc"') is matches
+
+
+def test_entries_expire_after_ttl():
+    cache = proxy_cache.ResponseCache(ttl=0.05)
+    cache.set(("inventory", "q"), 0, b"{}", "application/json")
+    assert cache.get(("inventory", "q")) is not None
+    time.sleep(0.06)
+    assert cache.get(("inventory", "q")) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = proxy_cache.ResponseCache(max_size=2)
+    for key in ("a", "b"):
+        cache.set(("inventory", key), 0, key.encode(), "application/json")
+    cache.get(("inventory", "a"))
+    cache.set(("inventory", "c"), 0, b"c", "application/json")
+    assert cache.get(("inventory", "b")) is None
+    assert cache.get(("inventory", "a")) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_response_started_before_invalidation_is_not_stored():
+    cache = proxy_cache.ResponseCache()
+    cache.set(("transaction", "q"), 0, b"{}", "application/json")
+    generation = cache.generation("inventory")
+    cache.invalidate_service("inventory")
+    cache.set(("inventory", "q"), generation, b"{}", "application/json")
+    assert cache.get(("inventory", "q")) is None
+    # Service lain tidak ikut dibuang
+    assert cache.get(("transaction", "q")) is not None
+
+
+def graphql_response(payload):
+    # Body sebagai stream seperti response backend asli (proxy membaca lewat aiter_raw)
+    return httpx.Response(
+        200, headers={"content-type": "application/json"}, stream=httpx.ByteStream(json.dumps(payload).encode())
+    )
+
+
+class Upstream:
+    """Backend palsu untuk proxy: mencatat request dan membalas sesuai isi query."""
+
+    def __init__(self):
+        self.requests = []
+        self.stock = 10
+
+    def __call__(self, request):
+        self.requests.append(request)
+        payload = json.loads(request.content)
+        if payload["query"].lstrip().startswith("mutation"):
+            self.stock -= 1
+            return graphql_response({"data": {"ok": True}})
+        if "broken" in payload["query"]:
+            return graphql_response({"errors": [{"message": "boom"}]})
+        return graphql_response({"data": {"checkStock": {"stock": self.stock}}})
+
+
+@pytest.fixture
+def proxy(load_service, monkeypatch):
+    server = load_service("frontend", "server")
+    upstream = Upstream()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    monkeypatch.setattr(server, "get_http_client", lambda service: client)
+    with TestClient(server.app) as test_client:
+        yield test_client, upstream, server
+
+
+def post(client, service, query, headers=None):
+    return client.post(f"/api/{service}", content=body(query), headers={"content-type": "application/json", **(headers or {})})
+
+
+def test_repeated_query_is_served_from_cache(proxy):
+    client, upstream, _ = proxy
+    first = post(client, "inventory", STOCK_QUERY)
+    second = post(client, "inventory", STOCK_QUERY)
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert len(upstream.requests) == 1
+
+
+def test_matching_if_none_match_returns_304(proxy):
+    client, upstream, _ = proxy
+    etag = post(client, "inventory", STOCK_QUERY).headers["ETag"]
+
+    response = post(client, "inventory", STOCK_QUERY, {"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    assert post(client, "inventory", STOCK_QUERY, {"If-None-Match": '"lain"'}).status_code == 200
+    # Validasi ETag dilakukan proxy, header tidak diteruskan ke backend
+    assert all("if-none-match" not in r.headers for r in upstream.requests)
+
+
+@pytest.mark.parametrize("service", ["inventory", "transaction"])
+def test_mutation_invalidates_cached_inventory_queries(proxy, service):
+    client, upstream, _ = proxy
+    before = post(client, "inventory", STOCK_QUERY).json()
+    post(client, service, "mutation { deduct }")
+    after = post(client, "inventory", STOCK_QUERY)
+    assert after.headers["X-Cache"] == "MISS"
+    assert after.json()["data"]["checkStock"]["stock"] == before["data"]["checkStock"]["stock"] - 1
+
+
+def test_graphql_errors_are_not_cached(proxy):
+    client, upstream, _ = proxy
+    for _ in range(2):
+        response = post(client, "inventory", "{ broken }")
+        assert "X-Cache" not in response.headers
+    assert len(upstream.requests) == 2
+
+
+def test_cache_key_includes_the_caller_role(proxy):
+    client, upstream, _ = proxy
+    post(client, "inventory", STOCK_QUERY)
+    staff = post(client, "inventory", STOCK_QUERY, {"Authorization": f"Bearer {service_token('tests')}"})
+    assert staff.headers["X-Cache"] == "MISS"
+    assert len(upstream.requests) == 2
+
+
+def test_services_outside_the_cache_list_are_streamed(proxy):
+    client, upstream, _ = proxy
+    for _ in range(2):
+        response = post(client, "transaction", STOCK_QUERY)
+        assert response.status_code == 200
+        assert "X-Cache" not in response.headers
+    assert len(upstream.requests) == 2
@@ -1,25 +1,144 @@
+import asyncio
 import strawberry
 import httpx
 import sqlite3
+import sys
 import os
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Annotated, AsyncGenerator, List, Optional
+from fastapi import FastAPI, Request
+from fastapi import Query as QueryParam
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from strawberry.fastapi import GraphQLRouter
-from fastapi import Request
-import jwt
 
-SECRET_KEY = "apotek-iae-secret-key-2025"
-ALGORITHM = "HS256"
+from prescription_cache import PrescriptionCache
+from catalog_replica import CatalogReplica
+from resilience import CircuitBreaker, CircuitOpenError, RetryBudget, ResilientUpstream, RETRYABLE_ERRORS, CLOSED, HALF_OPEN, OPEN
+import revenue
+import idempotency
+import outbox
+import ledger
+
+# Modul bersama antar service ada di root repo (folder shared/)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared.db import Database
+from shared.auth import get_auth_context, service_token
+from shared.pubsub import broadcaster
+from shared.metrics import Counter, Gauge, MetricsExtension, metrics_endpoint
+from shared.tracing import TracingExtension, TracingMiddleware, inject_traceparent, traced_request, traces_endpoint
+from shared.persisted_queries import (
+    PersistedQueryRouter, document_cache_extensions, is_persisted_query_not_found, persisted_query_extensions
+)
 
 # Konfigurasi URL Service
 INVENTORY_URL = os.getenv("INVENTORY_URL", "http://localhost:8002/graphql")
 # Default ke local docker mock jika tidak ada env, tapi tetap support env var
 HOSPITAL_URL = os.getenv("HOSPITAL_URL", "https://80659810-1ede-4de9-81e4-a6828e406132-00-3hpi437nqx1h5.picard.replit.dev/records/graphql")
 
+# Konfigurasi HTTP client (connection pool dipakai ulang oleh semua request keluar)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+# Timeout per percobaan ke Hospital; HOSPITAL_DEADLINE membatasi total waktu termasuk retry
+HOSPITAL_TIMEOUT = float(os.getenv("HOSPITAL_TIMEOUT", "3"))
+HOSPITAL_DEADLINE = float(os.getenv("HOSPITAL_DEADLINE", "8"))
+INVENTORY_TIMEOUT = float(os.getenv("INVENTORY_TIMEOUT", "5"))
+
+try:
+    import h2  # noqa: F401 - HTTP/2 hanya aktif jika paket h2 terpasang
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    # Client dibuat saat startup (lifespan); fallback dibuat lazy jika app dipakai tanpa lifespan
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            ),
+            event_hooks={"request": [inject_traceparent]}
+        )
+    return http_client
+
+# Cache hasil validasi resep (TTL dalam detik)
+PRESCRIPTION_CACHE_TTL = float(os.getenv("PRESCRIPTION_CACHE_TTL", "60"))
+PRESCRIPTION_CACHE_NEGATIVE_TTL = float(os.getenv("PRESCRIPTION_CACHE_NEGATIVE_TTL", "10"))
+PRESCRIPTION_CACHE_SIZE = int(os.getenv("PRESCRIPTION_CACHE_SIZE", "1000"))
+# Data resep kedaluwarsa masih dipakai selama ini jika Hospital tidak bisa dihubungi
+PRESCRIPTION_CACHE_STALE_TTL = float(os.getenv("PRESCRIPTION_CACHE_STALE_TTL", "600"))
+
+prescription_cache = PrescriptionCache(
+    ttl=PRESCRIPTION_CACHE_TTL,
+    negative_ttl=PRESCRIPTION_CACHE_NEGATIVE_TTL,
+    max_size=PRESCRIPTION_CACHE_SIZE,
+    stale_ttl=PRESCRIPTION_CACHE_STALE_TTL
+)
+
+# Ketahanan panggilan ke Hospital Service (lihat resilience.py)
+HOSPITAL_MAX_ATTEMPTS = int(os.getenv("HOSPITAL_MAX_ATTEMPTS", "3"))
+HOSPITAL_RETRY_BACKOFF = float(os.getenv("HOSPITAL_RETRY_BACKOFF", "0.2"))
+HOSPITAL_RETRY_BUDGET_RATIO = float(os.getenv("HOSPITAL_RETRY_BUDGET_RATIO", "0.2"))
+HOSPITAL_RETRY_MIN_PER_SECOND = float(os.getenv("HOSPITAL_RETRY_MIN_PER_SECOND", "1"))
+HOSPITAL_BREAKER_FAILURES = int(os.getenv("HOSPITAL_BREAKER_FAILURES", "5"))
+HOSPITAL_BREAKER_RESET = float(os.getenv("HOSPITAL_BREAKER_RESET", "15"))
+HOSPITAL_HEDGE = os.getenv("HOSPITAL_HEDGE", "0") == "1"
+HOSPITAL_HEDGE_MIN_DELAY = float(os.getenv("HOSPITAL_HEDGE_MIN_DELAY", "0.05"))
+
+UPSTREAM_EVENTS = Counter(
+    "upstream_resilience_events_total", "Retry, hedge dan short-circuit per upstream", ("upstream", "event")
+)
+UPSTREAM_CIRCUIT_STATE = Gauge(
+    "upstream_circuit_state", "State circuit breaker (0 closed, 1 half-open, 2 open)", ("upstream",)
+)
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+def on_hospital_circuit_change(state):
+    UPSTREAM_CIRCUIT_STATE.set(CIRCUIT_STATE_VALUES[state], upstream="hospital")
+    print(f"Warning: Circuit breaker Hospital Service sekarang {state}")
+
+hospital = ResilientUpstream(
+    "hospital",
+    CircuitBreaker(
+        failure_threshold=HOSPITAL_BREAKER_FAILURES,
+        reset_timeout=HOSPITAL_BREAKER_RESET,
+        on_state_change=on_hospital_circuit_change
+    ),
+    RetryBudget(ratio=HOSPITAL_RETRY_BUDGET_RATIO, min_per_second=HOSPITAL_RETRY_MIN_PER_SECOND),
+    max_attempts=HOSPITAL_MAX_ATTEMPTS,
+    base_backoff=HOSPITAL_RETRY_BACKOFF,
+    deadline=HOSPITAL_DEADLINE,
+    hedge_min_delay=HOSPITAL_HEDGE_MIN_DELAY,
+    on_event=lambda upstream, event: UPSTREAM_EVENTS.inc(upstream=upstream, event=event)
+)
+UPSTREAM_CIRCUIT_STATE.set(0, upstream="hospital")
+
+@asynccontextmanager
+async def lifespan(app):
+    get_http_client()
+    dispatcher.start()
+    if CATALOG_REPLICA_ENABLED:
+        catalog_replica.start()
+    yield
+    await catalog_replica.stop()
+    # Entry outbox yang belum terkirim tetap di SQLite dan dilanjutkan saat service start lagi
+    await dispatcher.stop()
+    if http_client is not None:
+        await http_client.aclose()
+    db.close_all()
+
+db = Database("transaction_db.sqlite")
+
 def init_db():
-    conn = sqlite3.connect("transaction_db.sqlite")
+    conn = db.connection()
     conn.execute("""
         CREATE TABLE IF NOT EXISTS transactions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -29,11 +148,356 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
-    conn.commit()
-    conn.close()
+    revenue.init_rollup(conn)
+    idempotency.init_idempotency(conn)
+    outbox.init_outbox(conn)
+    # Backfill item ledger dari payload deduct_stock harus jalan sebelum entry DONE lama dipangkas
+    ledger.init_ledger(conn)
+    outbox.prune_done(conn)
 
 init_db()
 
+# Query Inventory untuk mengambil obat sesuai nama di resep (bukan seluruh katalog)
+MEDICINES_BY_NAMES_QUERY = """
+query medicinesByNames($names: [String!]!) {
+    medicinesByNames(names: $names) {
+        id
+        price
+        stock
+        name
+    }
+}
+"""
+
+# Potong stok semua item resep sekaligus (satu request, satu transaksi di Inventory).
+# reference membuat pengiriman ulang dari outbox tidak memotong stok dua kali.
+DEDUCT_STOCK_BATCH_MUTATION = """
+mutation deductStockBatch($items: [StockDelta!]!, $reference: String, $reservationId: String) {
+    deductStockBatch(items: $items, reference: $reference, reservationId: $reservationId) {
+        success
+        message
+        items {
+            id
+            success
+            stock
+        }
+    }
+}
+"""
+
+RELEASE_RESERVATION_MUTATION = """
+mutation releaseReservation($reservationId: String!) {
+    releaseReservation(reservationId: $reservationId)
+}
+"""
+
+RESERVE_STOCK_MUTATION = """
+mutation reserveStock($items: [StockDelta!]!, $ttlSeconds: Int!, $reservationId: String) {
+    reserveStock(items: $items, ttlSeconds: $ttlSeconds, reservationId: $reservationId) {
+        success
+        reservationId
+        expiresAt
+        items {
+            id
+            success
+            available
+        }
+    }
+}
+"""
+
+VALIDATE_PRESCRIPTION_QUERY = """
+query validate($id: String!) {
+    validatePrescription(id: $id) {
+        isValid
+        patientName
+        medicines {
+            name
+            qty
+        }
+    }
+}
+"""
+
+async def post_persisted_query(client, upstream, operation, url, query, variables, headers=None, timeout=None):
+    # Kirim hash dokumen saja (APQ), dokumen lengkap hanya dikirim jika service tujuan belum mengenalnya
+    payload = {"variables": variables, "extensions": persisted_query_extensions(query)}
+    resp = await traced_request(upstream, operation, client.post(url, json=payload, headers=headers or {}, timeout=timeout))
+    if resp.status_code == 200 and is_persisted_query_not_found(resp.json()):
+        resp = await traced_request(
+            upstream, operation, client.post(url, json={**payload, "query": query}, headers=headers or {}, timeout=timeout)
+        )
+    return resp
+
+class HospitalServiceError(Exception):
+    pass
+
+class InventoryServiceError(Exception):
+    pass
+
+def inventory_data(resp):
+    # Field data response Inventory; HTTP error atau GraphQL error jadi InventoryServiceError
+    if resp.status_code != 200:
+        raise InventoryServiceError(f"Inventory Service Error ({resp.status_code})")
+    body = resp.json()
+    if body.get("errors"):
+        raise InventoryServiceError(body["errors"][0].get("message", "GraphQL error"))
+    return body["data"]
+
+async def validate_prescription(prescription_id):
+    # Return data resep dari Hospital (dict), atau None jika resep tidak valid.
+    # Hasil (termasuk resep tidak valid) disimpan di cache agar preview berulang tidak ke Hospital lagi.
+    found, data = prescription_cache.get(prescription_id)
+    if found:
+        return data
+
+    # Query read-only: boleh di-retry dan di-hedge
+    try:
+        resp = await hospital.call(lambda: traced_request("hospital", "validatePrescription", get_http_client().post(
+            HOSPITAL_URL,
+            json={"query": VALIDATE_PRESCRIPTION_QUERY, "variables": {"id": prescription_id}},
+            timeout=HOSPITAL_TIMEOUT
+        )), hedge=HOSPITAL_HEDGE)
+    except (CircuitOpenError,) + RETRYABLE_ERRORS as e:
+        # Hospital tidak bisa dihubungi: pakai data resep valid terakhir jika masih ada
+        stale = stale_prescription(prescription_id)
+        if stale is not None:
+            return stale
+        raise hospital_unavailable(e)
+    if resp.status_code != 200:
+        raise HospitalServiceError(f"Hospital Service Error ({resp.status_code})")
+
+    data = (resp.json().get("data") or {}).get("validatePrescription")
+    return remember_prescription(prescription_id, data)
+
+def remember_prescription(prescription_id, data):
+    if not data or not data.get("isValid"):
+        data = None
+    prescription_cache.set(prescription_id, data)
+    return data
+
+def stale_prescription(prescription_id):
+    stale = prescription_cache.get_stale(prescription_id)
+    if stale is not None:
+        UPSTREAM_EVENTS.inc(upstream="hospital", event="stale_fallback")
+    return stale
+
+def hospital_unavailable(error):
+    if isinstance(error, CircuitOpenError):
+        return HospitalServiceError("Hospital Service sedang tidak tersedia, coba lagi nanti")
+    return HospitalServiceError(f"Hospital Service Error ({error})")
+
+VALIDATE_PRESCRIPTIONS_QUERY = """
+query validateMany($ids: [String!]!) {
+    validatePrescriptions(ids: $ids) {
+        id
+        isValid
+        patientName
+        medicines {
+            name
+            qty
+        }
+    }
+}
+"""
+
+# Hospital eksternal belum tentu punya validatePrescriptions; jika ditolak schema-nya,
+# batch dimatikan dan resep divalidasi satu per satu secara paralel
+hospital_supports_batch = True
+
+async def validate_prescriptions(prescription_ids):
+    """Validasi banyak resep dengan satu request ke Hospital.
+
+    Return (data, errors): data = dict id -> data resep (None jika tidak valid),
+    errors = dict id -> pesan error untuk resep yang tidak bisa divalidasi.
+    """
+    global hospital_supports_batch
+    data, errors = {}, {}
+    missing = []
+    for pid in dict.fromkeys(prescription_ids):
+        found, cached = prescription_cache.get(pid)
+        if found:
+            data[pid] = cached
+        else:
+            missing.append(pid)
+    if not missing:
+        return data, errors
+
+    if hospital_supports_batch:
+        try:
+            resp = await hospital.call(lambda: traced_request("hospital", "validatePrescriptions", get_http_client().post(
+                HOSPITAL_URL,
+                json={"query": VALIDATE_PRESCRIPTIONS_QUERY, "variables": {"ids": missing}},
+                timeout=HOSPITAL_TIMEOUT
+            )), hedge=HOSPITAL_HEDGE)
+        except (CircuitOpenError,) + RETRYABLE_ERRORS as e:
+            for pid in missing:
+                stale = stale_prescription(pid)
+                if stale is not None:
+                    data[pid] = stale
+                else:
+                    errors[pid] = str(hospital_unavailable(e))
+            return data, errors
+        if resp.status_code != 200:
+            for pid in missing:
+                errors[pid] = f"Hospital Service Error ({resp.status_code})"
+            return data, errors
+
+        body = resp.json()
+        results = (body.get("data") or {}).get("validatePrescriptions")
+        if results is not None:
+            for result in results:
+                data[result["id"]] = remember_prescription(result["id"], result)
+            return data, errors
+        print(f"Warning: Hospital tidak mendukung validatePrescriptions, validasi per resep: {body.get('errors')}")
+        hospital_supports_batch = False
+
+    outcomes = await asyncio.gather(*(validate_prescription(pid) for pid in missing), return_exceptions=True)
+    for pid, outcome in zip(missing, outcomes):
+        if isinstance(outcome, Exception):
+            errors[pid] = str(outcome)
+        else:
+            data[pid] = outcome
+    return data, errors
+
+UPDATE_PRESCRIPTION_STATUS_MUTATION = """
+mutation UpdateStatus($id: String!, $status: String!) {
+    updatePrescriptionStatus(id: $id, status: $status) {
+        success
+        message
+    }
+}
+"""
+
+async def update_prescription_status(prescription_id, status):
+    # Dipanggil dispatcher outbox: error koneksi / non-200 / breaker terbuka dilempar agar
+    # dicoba lagi oleh outbox (retry di sini dimatikan supaya tidak dobel dengan backoff outbox)
+    # Gunakan HOSPITAL_URL yang sudah dikonfigurasi (pastikan mengarah ke /records/graphql)
+    resp = await hospital.call(lambda: traced_request("hospital", "updatePrescriptionStatus", get_http_client().post(
+        HOSPITAL_URL,
+        json={
+            "query": UPDATE_PRESCRIPTION_STATUS_MUTATION,
+            "variables": {"id": prescription_id, "status": status}
+        },
+        timeout=HOSPITAL_TIMEOUT
+    )), retry=False)
+    if resp.status_code != 200:
+        raise HospitalServiceError(f"Hospital Service Error ({resp.status_code})")
+    body = resp.json()
+    if body.get("errors"):
+        # Ditolak oleh schema Hospital: dikirim ulang pun hasilnya sama
+        raise outbox.PermanentDeliveryError(body["errors"][0].get("message", "GraphQL error"))
+    result = (body.get("data") or {}).get("updatePrescriptionStatus") or {}
+    if not result.get("success"):
+        raise outbox.PermanentDeliveryError(result.get("message") or "Update status resep ditolak Hospital")
+
+# Replika katalog Inventory (lihat catalog_replica.py). Lookup harga/stok dilayani dari memori
+# selama lag replika <= CATALOG_REPLICA_MAX_LAG detik, selebihnya query langsung ke Inventory.
+CATALOG_REPLICA_ENABLED = os.getenv("CATALOG_REPLICA_ENABLED", "1") == "1"
+CATALOG_REPLICA_POLL_INTERVAL = float(os.getenv("CATALOG_REPLICA_POLL_INTERVAL", "1"))
+CATALOG_REPLICA_MAX_LAG = float(os.getenv("CATALOG_REPLICA_MAX_LAG", "5"))
+CATALOG_REPLICA_PAGE_SIZE = int(os.getenv("CATALOG_REPLICA_PAGE_SIZE", "1000"))
+
+CATALOG_REPLICA_LAG = Gauge(
+    "catalog_replica_lag_seconds", "Detik sejak replika katalog terakhir sampai di head change feed Inventory"
+)
+CATALOG_REPLICA_SEQ_LAG = Gauge(
+    "catalog_replica_seq_lag", "Jumlah perubahan katalog yang belum diterapkan ke replika"
+)
+CATALOG_REPLICA_READY = Gauge("catalog_replica_ready", "1 jika replika katalog cukup segar untuk dipakai")
+CATALOG_LOOKUPS = Counter(
+    "catalog_lookups_total", "Lookup harga/stok obat per sumber (replica atau inventory)", ("source",)
+)
+
+async def inventory_query(operation, query, variables):
+    resp = await post_persisted_query(
+        get_http_client(), "inventory", operation, INVENTORY_URL, query, variables, timeout=INVENTORY_TIMEOUT
+    )
+    return inventory_data(resp)
+
+def on_catalog_replica_sync(replica):
+    lag = replica.lag_seconds()
+    if lag is not None:
+        CATALOG_REPLICA_LAG.set(round(lag, 3))
+    CATALOG_REPLICA_SEQ_LAG.set(max(0, replica.head_seq - (replica.seq or 0)))
+    CATALOG_REPLICA_READY.set(int(replica.is_fresh()))
+
+catalog_replica = CatalogReplica(
+    inventory_query,
+    poll_interval=CATALOG_REPLICA_POLL_INTERVAL,
+    max_lag=CATALOG_REPLICA_MAX_LAG,
+    page_size=CATALOG_REPLICA_PAGE_SIZE,
+    on_sync=on_catalog_replica_sync
+)
+CATALOG_REPLICA_READY.set(0)
+
+async def fetch_inventory_by_names(client, names, headers=None):
+    # Return dict: nama obat (lowercase) -> data obat dari Inventory
+    names = list({n for n in names if n})
+    if not names:
+        return {}
+    found = catalog_replica.lookup(names)
+    if found is not None:
+        missing = [n for n in names if n.lower() not in found]
+        if not missing:
+            CATALOG_LOOKUPS.inc(source="replica")
+            return found
+        # Nama yang tidak ada di replika dicek langsung (mungkin obat baru dalam jendela lag)
+        names = missing
+    CATALOG_LOOKUPS.inc(source="inventory")
+    inv_res = await post_persisted_query(
+        client, "inventory", "medicinesByNames", INVENTORY_URL, MEDICINES_BY_NAMES_QUERY, {"names": names},
+        headers=headers, timeout=INVENTORY_TIMEOUT
+    )
+    inventory_medicines = inventory_data(inv_res)['medicinesByNames']
+    return {**(found or {}), **{m['name'].lower(): m for m in inventory_medicines}}
+
+# Reservasi stok di alur checkout: stok resep ditahan di Inventory selama STOCK_RESERVATION_TTL detik
+# agar checkout tidak kalah cepat dengan transaksi lain. Hanya dibuat jika kasir meminta
+# (previewTransaction(reserve: true)) atau saat checkout. Satu reservasi per resep (id "rx-<resep>"),
+# preview ulang oleh kasir yang sama memperbarui reservasi yang sama.
+STOCK_RESERVATION_TTL = int(os.getenv("STOCK_RESERVATION_TTL", "120"))
+# Checkout memperbarui reservasi jika sisa waktunya kurang dari ini
+STOCK_RESERVATION_MIN_REMAINING = float(os.getenv("STOCK_RESERVATION_MIN_REMAINING", "10"))
+
+# Resep -> (waktu epoch reservasi berakhir, user yang menahan; None jika dari checkout)
+held_reservations = {}
+
+def reservation_id_for(prescription_id):
+    return f"rx-{prescription_id}"
+
+def has_reservation(prescription_id):
+    expires_at, _ = held_reservations.get(prescription_id, (None, None))
+    return expires_at is not None and expires_at - time.time() >= STOCK_RESERVATION_MIN_REMAINING
+
+def held_by_other(prescription_id, user_id):
+    # Reservasi aktif milik kasir lain tidak diperpanjang oleh preview kasir ini
+    expires_at, holder = held_reservations.get(prescription_id, (None, None))
+    return expires_at is not None and expires_at > time.time() and holder not in (None, user_id)
+
+async def reserve_stock(prescription_id, items, holder=None):
+    """Tahan stok item resep (list dict id, qty, name). Return (berhasil, nama obat yang kurang, expiresAt).
+
+    Melempar InventoryServiceError / httpx error jika Inventory tidak bisa dihubungi.
+    """
+    headers = {"Authorization": f"Bearer {service_token('transaction-service')}"}
+    started = time.time()
+    resp = await post_persisted_query(
+        get_http_client(), "inventory", "reserveStock", INVENTORY_URL, RESERVE_STOCK_MUTATION,
+        {
+            "items": [{"id": x['id'], "qty": x['qty']} for x in items],
+            "ttlSeconds": STOCK_RESERVATION_TTL,
+            "reservationId": reservation_id_for(prescription_id)
+        },
+        headers=headers, timeout=INVENTORY_TIMEOUT
+    )
+    result = inventory_data(resp)["reserveStock"]
+    if not result["success"]:
+        failed_ids = {x['id'] for x in result['items'] if not x['success']}
+        return False, [x['name'] for x in items if str(x['id']) in failed_ids], None
+    held_reservations[prescription_id] = (started + STOCK_RESERVATION_TTL, holder)
+    return True, [], result["expiresAt"]
+
 @strawberry.type
 class ItemDetail:
     id: str
@@ -47,150 +511,563 @@ class ItemDetail:
 class PreviewResult:
     isSuccess: bool
     message: str
+    prescriptionId: Optional[str] = None
     patientName: Optional[str] = None
     items: Optional[List[ItemDetail]] = None
     totalPrice: Optional[float] = None
+    reservedUntil: Optional[str] = None
+
+@strawberry.type
+class OutboxStats:
+    pending: int
+    inFlight: int
+    done: int
+    dead: int
+    oldestPendingAt: Optional[str] = None
+
+@strawberry.type
+class TransactionEvent:
+    # Delta untuk dashboard: tambahkan revenueDelta/transactionsDelta ke total dan ke grafik hari `day`
+    transactionId: strawberry.ID
+    prescriptionId: str
+    status: str
+    day: str
+    totalPrice: float
+    revenueDelta: float
+    transactionsDelta: int
+
+TRANSACTION_EVENTS = "transaction_events"
+
+def publish_transaction_event(transaction_id, prescription_id, status, day, total_price):
+    sign = 1 if status == "PAID" else -1
+    broadcaster.publish(TRANSACTION_EVENTS, TransactionEvent(
+        transactionId=str(transaction_id),
+        prescriptionId=prescription_id,
+        status=status,
+        day=day,
+        totalPrice=total_price,
+        revenueDelta=sign * total_price,
+        transactionsDelta=sign
+    ))
+
+@strawberry.type
+class CatalogReplicaStats:
+    ready: bool
+    fresh: bool
+    medicines: int
+    seq: int
+    headSeq: int
+    snapshots: int
+    lagSeconds: Optional[float] = None
+    lastError: Optional[str] = None
+
+@strawberry.type
+class CircuitStats:
+    state: str
+    consecutiveFailures: int
+    retryTokens: float
+    p95LatencyMs: Optional[float] = None
 
 @strawberry.type
 class ChartDataPoint:
     date: str
     value: float
 
+@strawberry.type
+class TransactionItem:
+    medicineId: Optional[str]
+    name: str
+    qty: int
+    unitPrice: Optional[float] = None
+    subtotal: Optional[float] = None
+
+@strawberry.type
+class TransactionRecord:
+    id: int
+    prescriptionId: Optional[str]
+    totalPrice: float
+    status: str
+    createdAt: str
+    items: List[TransactionItem]
+
+@strawberry.type
+class PageInfo:
+    endCursor: Optional[str]
+    hasNextPage: bool
+
+@strawberry.type
+class TransactionPage:
+    items: List[TransactionRecord]
+    pageInfo: PageInfo
+
+def row_to_transaction(r, items):
+    return TransactionRecord(
+        id=r["id"],
+        prescriptionId=r["prescription_id"],
+        totalPrice=r["total_price"],
+        status=r["status"],
+        createdAt=r["created_at"],
+        items=[
+            TransactionItem(medicineId=i["medicine_id"], name=i["name"], qty=i["qty"], unitPrice=i["unit_price"], subtotal=i["subtotal"])
+            for i in items
+        ]
+    )
+
+def parse_date_range(date_from, date_to):
+    # Tanggal filter histori/export harus 'YYYY-MM-DD'
+    for value in (date_from, date_to):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"Tanggal '{value}' harus berformat YYYY-MM-DD")
+
+def can_read_ledger(user):
+    return bool(user) and user.get("role") in ["admin", "apoteker"]
+
 @strawberry.type
 class DashboardStats:
     totalTransactions: int
     totalRevenue: float
     revenueChart: List[ChartDataPoint]
 
+@strawberry.type
+class CacheStats:
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+    hitRatio: float
+
+# Pilihan rentang grafik pendapatan di dashboard (hari)
+DASHBOARD_WINDOWS = (7, 30, 90)
+
+def load_dashboard_stats(days):
+    # Dijawab dari rollup daily_revenue (blocking, dijalankan lewat db.run)
+    since_day = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    total_count, total_revenue, by_day = revenue.load_revenue_summary(db.connection(), since_day)
+
+    chart_data = []
+    for i in range(days - 1, -1, -1):
+        date_val = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+        chart_data.append(ChartDataPoint(date=date_val, value=by_day.get(date_val, 0.0)))
+
+    return DashboardStats(
+        totalTransactions=total_count,
+        totalRevenue=total_revenue,
+        revenueChart=chart_data
+    )
+
+# Jenis entry outbox (langkah saga checkout setelah transaksi tersimpan)
+DEDUCT_STOCK = "deduct_stock"
+PRESCRIPTION_STATUS = "prescription_status"
+RELEASE_RESERVATION = "release_reservation"
+
+def save_paid_transaction(prescription_id, total_price, receipt, items, paid_by=None, idempotency_key=None):
+    # Insert transaksi + item obat + update rollup pendapatan + catat potong stok di outbox dalam satu transaksi SQLite
+    with db.transaction() as conn:
+        transaction_id, day = conn.execute(
+            "INSERT INTO transactions (prescription_id, total_price, status, receipt, paid_by, idempotency_key) "
+            "VALUES (?, ?, ?, ?, ?, ?) RETURNING id, date(created_at)",
+            (prescription_id, total_price, "PAID", receipt, paid_by, idempotency_key)
+        ).fetchone()
+        ledger.record_items(conn, transaction_id, items)
+        revenue.record_paid_transaction(conn, transaction_id)
+        outbox.enqueue(conn, DEDUCT_STOCK, {
+            "transaction_id": transaction_id,
+            "prescription_id": prescription_id,
+            "items": items,
+            "reservation_id": reservation_id_for(prescription_id)
+        }, aggregate_id=str(transaction_id))
+    return transaction_id, day
+
+def cancel_transaction(conn, transaction_id, reason):
+    # Kompensasi saga: transaksi PAID yang stoknya gagal dipotong dibatalkan.
+    # Return callback event untuk subscriber (dipanggil setelah commit), None jika sudah tidak PAID.
+    row = conn.execute(
+        "SELECT prescription_id, total_price, date(created_at) AS day FROM transactions WHERE id = ? AND status = 'PAID'",
+        (transaction_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    revenue.record_cancelled_transaction(conn, transaction_id)
+    conn.execute(
+        "UPDATE transactions SET status = 'CANCELLED', receipt = ? WHERE id = ? AND status = 'PAID'",
+        (reason, transaction_id)
+    )
+    return lambda: publish_transaction_event(transaction_id, row["prescription_id"], "CANCELLED", row["day"], row["total_price"])
+
+async def deliver_stock_deduction(payload):
+    # Tidak ada token kasir di dispatcher: pakai token service (role apoteker)
+    headers = {"Authorization": f"Bearer {service_token('transaction-service')}"}
+    transaction_id = payload["transaction_id"]
+    items = payload["items"]
+    try:
+        resp = await post_persisted_query(
+            get_http_client(), "inventory", "deductStockBatch", INVENTORY_URL, DEDUCT_STOCK_BATCH_MUTATION,
+            {
+                "items": [{"id": x['id'], "qty": x['qty']} for x in items],
+                "reference": f"tx-{transaction_id}",
+                "reservationId": payload.get("reservation_id")
+            },
+            headers=headers, timeout=INVENTORY_TIMEOUT
+        )
+    except httpx.HTTPError as e:
+        # Request mungkin sudah diterapkan Inventory: ulang terus (idempotent lewat reference)
+        raise outbox.UncertainDeliveryError(f"{type(e).__name__}: {e}") from e
+    if resp.status_code >= 500:
+        raise outbox.UncertainDeliveryError(f"Inventory Service Error ({resp.status_code})")
+    result = inventory_data(resp)["deductStockBatch"]
+    # Hasil pasti dari deductStockBatch: reservasi sudah dikonversi (atau dilepas jika gagal).
+    # Error transport/GraphQL di atas akan di-retry, jadi catatan reservasi dibiarkan.
+    held_reservations.pop(payload["prescription_id"], None)
+
+    if result['success']:
+        # Stok di replika katalog diperbarui lewat change feed; tarik segera
+        catalog_replica.notify()
+        def next_step(conn):
+            outbox.enqueue(conn, PRESCRIPTION_STATUS, {
+                "prescription_id": payload["prescription_id"],
+                "status": "processed"
+            }, aggregate_id=str(transaction_id))
+        return next_step
+
+    failed_ids = {x['id'] for x in result['items'] if not x['success']}
+    failed_names = [x['name'] for x in items if x['id'] in failed_ids]
+    reason = f"Dibatalkan: Stok '{', '.join(failed_names)}' tidak cukup saat diproses"
+    print(f"Warning: Transaksi #{transaction_id} dibatalkan, {reason}")
+    # Resep boleh diproses ulang setelah transaksinya dibatalkan
+    prescription_cache.invalidate(payload["prescription_id"])
+    return lambda conn: cancel_transaction(conn, transaction_id, reason)
+
+def compensate_stock_deduction(payload, error):
+    # Entry potong stok DEAD: stok tidak pernah dipotong, jadi transaksi PAID dibatalkan seperti
+    # jalur stok tidak cukup dan reservasinya dilepas (lewat outbox, di transaksi yang sama)
+    transaction_id = payload["transaction_id"]
+    prescription_id = payload["prescription_id"]
+    reason = f"Dibatalkan: Stok gagal dipotong ({error})"
+    print(f"Warning: Transaksi #{transaction_id} dibatalkan, {reason}")
+
+    def followup(conn):
+        if payload.get("reservation_id"):
+            outbox.enqueue(conn, RELEASE_RESERVATION, {
+                "prescription_id": prescription_id,
+                "reservation_id": payload["reservation_id"]
+            }, aggregate_id=str(transaction_id))
+        publish = cancel_transaction(conn, transaction_id, reason)
+
+        def after_commit():
+            # Resep boleh diproses ulang setelah transaksinya dibatalkan
+            prescription_cache.invalidate(prescription_id)
+            if publish is not None:
+                publish()
+        return after_commit
+    return followup
+
+async def deliver_reservation_release(payload):
+    headers = {"Authorization": f"Bearer {service_token('transaction-service')}"}
+    resp = await post_persisted_query(
+        get_http_client(), "inventory", "releaseReservation", INVENTORY_URL, RELEASE_RESERVATION_MUTATION,
+        {"reservationId": payload["reservation_id"]},
+        headers=headers, timeout=INVENTORY_TIMEOUT
+    )
+    inventory_data(resp)
+    held_reservations.pop(payload["prescription_id"], None)
+
+async def deliver_prescription_status(payload):
+    await update_prescription_status(payload["prescription_id"], payload["status"])
+
+OUTBOX_DELIVERIES = Counter(
+    "outbox_deliveries_total", "Hasil pengiriman entry outbox per jenis", ("kind", "outcome")
+)
+
+# Potong stok yang DEAD (ditolak Inventory sampai OUTBOX_MAX_ATTEMPTS) dikompensasi: transaksi
+# dibatalkan dan reservasinya dilepas. Kegagalan yang hasilnya tidak pasti (koneksi putus, 5xx)
+# tidak pernah DEAD, lihat outbox.UncertainDeliveryError.
+dispatcher = outbox.OutboxDispatcher(
+    db,
+    {
+        DEDUCT_STOCK: deliver_stock_deduction,
+        PRESCRIPTION_STATUS: deliver_prescription_status,
+        RELEASE_RESERVATION: deliver_reservation_release
+    },
+    on_delivery=lambda kind, outcome: OUTBOX_DELIVERIES.inc(kind=kind, outcome=outcome),
+    compensations={DEDUCT_STOCK: compensate_stock_deduction}
+)
+
+# Checkout yang sedang berjalan per resep: prescription_id -> ((user, nominal, key), future)
+checkouts_in_flight = {}
+
+async def run_checkout(headers, payment_amount, prescription_id, user_id=None, idempotency_key=None):
+    """Pipeline checkout. Return (sudah_dibayar, pesan)."""
+    # 0. Resep yang sudah dibayar: tanpa memanggil service lain. Struk hanya untuk pembayar aslinya.
+    paid = await db.run(lambda: idempotency.find_paid_transaction(db.connection(), prescription_id))
+    if paid is not None:
+        return idempotency.paid_response(paid, user_id, idempotency_key)
+
+    # 1. Validasi & Ambil Resep (GraphQL API)
+    try:
+        data = await validate_prescription(prescription_id)
+    except HospitalServiceError: return False, "Error: Gagal koneksi ke Hospital Service"
+    except Exception as e: return False, f"Error: {str(e)}"
+
+    if not data:
+        return False, "Error: Resep tidak valid"
+
+    prescription_medicines = data.get('medicines', [])
+
+    # 2. Cek Inventory, Hitung Total & Siapkan Update Stok
+    total_price = 0
+    items_to_deduct = [] # List of tuples (id, qty)
+    
+    client = get_http_client()
+    try:
+        inventory_by_name = await fetch_inventory_by_names(
+            client, [item.get('name', '') for item in prescription_medicines], headers
+        )
+            
+        for item in prescription_medicines:
+            name = item.get('name', '')
+            qty = item.get('qty', 0)
+                
+            inv_item = inventory_by_name.get(name.lower())
+                
+            if not inv_item: return False, f"Error: Obat '{name}' tidak ada di katalog"
+            if inv_item['stock'] < qty: return False, f"Error: Stok '{name}' tidak cukup"
+                
+            total_price += inv_item['price'] * qty
+            items_to_deduct.append({
+                "id": inv_item['id'],
+                "qty": qty,
+                "name": inv_item['name'],
+                "price": inv_item['price']
+            })
+                
+    except Exception as e: return False, f"Error Inventory: {str(e)}"
+
+    # 3. Validasi Pembayaran
+    if payment_amount < total_price:
+        return False, f"Error: Pembayaran Kurang. Total: Rp {total_price:,.0f}"
+
+    # 3b. Pastikan stok ditahan sebelum transaksi dicatat PAID (biasanya sudah sejak cek resep kasir).
+    # Jika Inventory tidak bisa dihubungi, lanjut tanpa reservasi: stok tetap dicek ulang saat
+    # dipotong dan transaksi dibatalkan jika ternyata tidak cukup.
+    if not has_reservation(prescription_id):
+        try:
+            reserved, short_names, _ = await reserve_stock(prescription_id, items_to_deduct)
+        except Exception as e:
+            print(f"Warning: Reservasi stok resep {prescription_id} gagal, checkout tanpa reservasi: {str(e)}")
+        else:
+            if not reserved:
+                return False, f"Error: Stok '{', '.join(short_names)}' tidak cukup (sedang ditahan transaksi lain)"
+
+    # 4. Simpan Transaksi + outbox (unique index: resep PAID hanya boleh satu).
+    # Potong stok (atomic, stok dicek ulang di Inventory) dan update status resep ke Hospital
+    # dikirim dispatcher outbox setelah response dikembalikan ke kasir.
+    item_summary = ", ".join([f"{x['qty']}x {x['name']}" for x in items_to_deduct])
+    success_msg = f"Sukses! {item_summary}. Kembalian: Rp {payment_amount - total_price:,.0f}"
+    try:
+        transaction_id, day = await db.run(
+            save_paid_transaction, prescription_id, total_price, success_msg, items_to_deduct, user_id, idempotency_key
+        )
+    except sqlite3.IntegrityError:
+        # Proses lain sudah membayar resep ini lebih dulu
+        paid = await db.run(lambda: idempotency.find_paid_transaction(db.connection(), prescription_id))
+        if paid is None:
+            return False, "Error: Resep sedang diproses transaksi lain, coba lagi"
+        return idempotency.paid_response(paid, user_id, idempotency_key)
+    except Exception as e: return False, f"Error Database: {str(e)}"
+
+    # Hasil validasi di cache tidak berlaku lagi setelah resep diproses
+    prescription_cache.invalidate(prescription_id)
+    dispatcher.notify()
+    publish_transaction_event(transaction_id, prescription_id, "PAID", day, total_price)
+
+    return True, success_msg
+
+def build_preview(prescription_id, data, inventory_by_name):
+    # Cocokkan resep dari Hospital dengan Inventory Lokal (berdasarkan Nama Obat)
+    if not data:
+        return PreviewResult(isSuccess=False, prescriptionId=prescription_id, message=f"Resep ID {prescription_id} tidak valid atau tidak ditemukan.")
+
+    patient_name = data.get('patientName', 'Unknown')
+    prescription_medicines = data.get('medicines', [])
+
+    if not prescription_medicines:
+        return PreviewResult(isSuccess=False, prescriptionId=prescription_id, message="Resep kosong (tidak ada obat).")
+
+    items_detail = []
+    total_price = 0.0
+
+    for item in prescription_medicines:
+        # Hospital GraphQL returns 'qty', Inventory loop expects matching Logic
+        needed_qty = item.get('qty', 0)
+        med_name = item.get('name', '')
+            
+        # Cari obat di inventory kita berdasarkan nama (case-insensitive)
+        inv_item = inventory_by_name.get(med_name.lower())
+            
+        if not med_name:
+            return PreviewResult(isSuccess=False, prescriptionId=prescription_id, message=f"Data obat dari RS tidak lengkap: {str(item)}")
+            
+        if not inv_item:
+            return PreviewResult(isSuccess=False, prescriptionId=prescription_id, message=f"Obat '{med_name}' tidak tersedia di apotek kami.")
+            
+        if inv_item['stock'] < needed_qty:
+            return PreviewResult(isSuccess=False, prescriptionId=prescription_id, message=f"Stok '{med_name}' kurang (Sisa: {inv_item['stock']}).")
+            
+        subtotal = inv_item['price'] * needed_qty
+        total_price += subtotal
+            
+        # Instructions removed from Hospital Mock GraphQL, setting default
+        instructions = "Sesuai resep dokter"
+
+        items_detail.append(ItemDetail(
+            id=inv_item['id'],
+            name=inv_item['name'],
+            qty=needed_qty,
+            price=inv_item['price'],
+            subtotal=subtotal,
+            instructions=instructions
+        ))
+
+    return PreviewResult(
+        isSuccess=True,
+        message="OK",
+        prescriptionId=prescription_id,
+        patientName=patient_name,
+        items=items_detail,
+        totalPrice=total_price
+    )
+
+def prescription_medicine_names(data):
+    return [item.get('name', '') for item in (data or {}).get('medicines') or []]
+
+# Batas jumlah resep per previewTransactions (satu request ke Hospital dan satu ke Inventory)
+PREVIEW_BATCH_MAX = int(os.getenv("PREVIEW_BATCH_MAX", "100"))
+
 @strawberry.type
 class Query:
     @strawberry.field
     def health(self) -> str:
         return "OK"
+
+    @strawberry.field
+    def prescription_cache_stats(self) -> CacheStats:
+        return CacheStats(**prescription_cache.stats())
+
+    @strawberry.field
+    def hospital_circuit_stats(self) -> CircuitStats:
+        return CircuitStats(**hospital.stats())
+
+    @strawberry.field
+    def catalog_replica_stats(self) -> CatalogReplicaStats:
+        return CatalogReplicaStats(**catalog_replica.stats())
+
+    @strawberry.field
+    async def outbox_stats(self) -> OutboxStats:
+        counts, oldest = await db.run(lambda: outbox.outbox_stats(db.connection()))
+        return OutboxStats(
+            pending=counts[outbox.PENDING],
+            inFlight=counts[outbox.IN_FLIGHT],
+            done=counts[outbox.DONE],
+            dead=counts[outbox.DEAD],
+            oldestPendingAt=oldest
+        )
     
     @strawberry.field
-    def dashboard_stats(self) -> DashboardStats:
-        conn = sqlite3.connect("transaction_db.sqlite")
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*), SUM(total_price) FROM transactions WHERE status='PAID'")
-        row = cursor.fetchone()
-        total_count = row[0] if row[0] else 0
-        total_revenue = row[1] if row[1] else 0.0
-        
-        chart_data = []
-        for i in range(6, -1, -1):
-            date_val = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            cursor.execute("SELECT SUM(total_price) FROM transactions WHERE date(created_at) = ?", (date_val,))
-            res = cursor.fetchone()
-            val = res[0] if res[0] else 0.0
-            chart_data.append(ChartDataPoint(date=date_val, value=val))
-            
-        conn.close()
-        return DashboardStats(
-            totalTransactions=total_count,
-            totalRevenue=total_revenue,
-            revenueChart=chart_data
+    async def dashboard_stats(self, days: int = 7) -> DashboardStats:
+        if days not in DASHBOARD_WINDOWS:
+            raise Exception(f"Rentang dashboard harus salah satu dari {DASHBOARD_WINDOWS} hari")
+        return await db.run(load_dashboard_stats, days)
+
+    @strawberry.field
+    async def transactions(
+        self,
+        info,
+        first: int = 50,
+        after: Optional[str] = None,
+        date_from: Annotated[Optional[str], strawberry.argument(name="from")] = None,
+        date_to: Annotated[Optional[str], strawberry.argument(name="to")] = None
+    ) -> TransactionPage:
+        # Histori transaksi terbaru dulu, cursor = (created_at, id) baris terakhir
+        if not can_read_ledger(info.context.get("user")):
+            raise Exception("Unauthorized: Hanya Admin/Apoteker yang boleh akses")
+        parse_date_range(date_from, date_to)
+        rows, items, end_cursor, has_next = await db.run(
+            lambda: ledger.fetch_page(db.connection(), min(first, ledger.MAX_PAGE_SIZE), after, date_from, date_to)
+        )
+        return TransactionPage(
+            items=[row_to_transaction(r, items[r["id"]]) for r in rows],
+            pageInfo=PageInfo(endCursor=end_cursor, hasNextPage=has_next)
         )
 
     @strawberry.field
-    async def preview_transaction(self, prescription_id: str) -> PreviewResult:
+    async def preview_transaction(self, info, prescription_id: str, reserve: bool = False) -> PreviewResult:
         # 1. Ambil Data Resep dari External GraphQL API (Hospital)
-        prescription_medicines = []
-        patient_name = "Unknown"
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                # Query GraphQL ke Hospital
-                query = """
-                query validate($id: String!) {
-                    validatePrescription(id: $id) {
-                        isValid
-                        patientName
-                        medicines {
-                            name
-                            qty
-                        }
-                    }
-                }
-                """
-                resp = await client.post(
-                    HOSPITAL_URL, 
-                    json={"query": query, "variables": {"id": prescription_id}},
-                    timeout=10.0
+        try:
+            data = await validate_prescription(prescription_id)
+        except HospitalServiceError as e:
+            return PreviewResult(isSuccess=False, message=str(e))
+        except Exception as e:
+            return PreviewResult(isSuccess=False, message=f"Gagal koneksi ke Hospital Service: {str(e)}")
+
+        # 2. Ambil hanya obat yang ada di resep dari inventory kita
+        try:
+            inventory_by_name = await fetch_inventory_by_names(get_http_client(), prescription_medicine_names(data))
+        except Exception as e:
+            return PreviewResult(isSuccess=False, message=f"Gagal cek inventory: {str(e)}")
+
+        result = build_preview(prescription_id, data, inventory_by_name)
+
+        # 3. Tahan stok hanya jika diminta alur checkout kasir yang login (reserve: true).
+        # Resep yang sudah dibayar atau sedang ditahan kasir lain tidak direservasi ulang.
+        user = info.context.get("user")
+        if not (result.isSuccess and reserve and user):
+            return result
+        user_id = str(user.get("sub"))
+        if held_by_other(prescription_id, user_id):
+            return result
+        if await db.run(lambda: idempotency.find_paid_transaction(db.connection(), prescription_id)) is not None:
+            return result
+        items = [{"id": x.id, "qty": x.qty, "name": x.name} for x in result.items]
+        try:
+            reserved, short_names, expires_at = await reserve_stock(prescription_id, items, holder=user_id)
+        except Exception as e:
+            print(f"Warning: Reservasi stok resep {prescription_id} gagal: {str(e)}")
+        else:
+            if not reserved:
+                return PreviewResult(
+                    isSuccess=False, prescriptionId=prescription_id,
+                    message=f"Stok '{', '.join(short_names)}' sedang ditahan transaksi lain."
                 )
-                
-                if resp.status_code != 200:
-                    return PreviewResult(isSuccess=False, message=f"Hospital Service Error ({resp.status_code})")
+            result.reservedUntil = expires_at
+        return result
 
-                payload = resp.json()
-                data = payload.get("data", {}).get("validatePrescription")
-                
-                if not data or not data.get("isValid"):
-                    return PreviewResult(isSuccess=False, message=f"Resep ID {prescription_id} tidak valid atau tidak ditemukan.")
+    @strawberry.field
+    async def preview_transactions(self, prescription_ids: List[str]) -> List[PreviewResult]:
+        # Preview antrean resep sekaligus: satu request ke Hospital dan satu ke Inventory
+        if len(prescription_ids) > PREVIEW_BATCH_MAX:
+            raise Exception(f"Maksimal {PREVIEW_BATCH_MAX} resep per preview")
 
-                patient_name = data.get('patientName', 'Unknown')
-                prescription_medicines = data.get('medicines', [])
-                
-                if not prescription_medicines:
-                    return PreviewResult(isSuccess=False, message="Resep kosong (tidak ada obat).")
+        data, errors = await validate_prescriptions(prescription_ids)
 
-            except Exception as e:
-                return PreviewResult(isSuccess=False, message=f"Gagal koneksi ke Hospital Service: {str(e)}")
+        names = [name for pid in data for name in prescription_medicine_names(data[pid])]
+        inventory_error = None
+        try:
+            inventory_by_name = await fetch_inventory_by_names(get_http_client(), names)
+        except Exception as e:
+            inventory_by_name, inventory_error = {}, f"Gagal cek inventory: {str(e)}"
 
-        # 2. Cocokkan dengan Inventory Lokal (berdasarkan Nama Obat)
-        items_detail = []
-        total_price = 0.0
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                # Ambil semua obat dari inventory kita
-                inv_query = {"query": "query { medicines { id price stock name } }"}
-                inv_res = await client.post(INVENTORY_URL, json=inv_query)
-                inventory_medicines = inv_res.json()['data']['medicines']
-                
-                for item in prescription_medicines:
-                    # Hospital GraphQL returns 'qty', Inventory loop expects matching Logic
-                    needed_qty = item.get('qty', 0)
-                    med_name = item.get('name', '')
-                    
-                    # Cari obat di inventory kita yang namanya mirip (case-insensitive)
-                    inv_item = next((m for m in inventory_medicines if m['name'].lower() == med_name.lower()), None)
-                    
-                    if not med_name:
-                        return PreviewResult(isSuccess=False, message=f"Data obat dari RS tidak lengkap: {str(item)}")
-                    
-                    if not inv_item:
-                        return PreviewResult(isSuccess=False, message=f"Obat '{med_name}' tidak tersedia di apotek kami.")
-                    
-                    if inv_item['stock'] < needed_qty:
-                        return PreviewResult(isSuccess=False, message=f"Stok '{med_name}' kurang (Sisa: {inv_item['stock']}).")
-                    
-                    subtotal = inv_item['price'] * needed_qty
-                    total_price += subtotal
-                    
-                    # Instructions removed from Hospital Mock GraphQL, setting default
-                    instructions = "Sesuai resep dokter"
-
-                    items_detail.append(ItemDetail(
-                        id=inv_item['id'],
-                        name=inv_item['name'],
-                        qty=needed_qty,
-                        price=inv_item['price'],
-                        subtotal=subtotal,
-                        instructions=instructions
-                    ))
-                    
-            except Exception as e:
-                return PreviewResult(isSuccess=False, message=f"Gagal cek inventory: {str(e)}")
-
-        return PreviewResult(
-            isSuccess=True,
-            message="OK",
-            patientName=patient_name,
-            items=items_detail,
-            totalPrice=total_price
-        )
+        results = []
+        for pid in prescription_ids:
+            if pid in errors:
+                results.append(PreviewResult(isSuccess=False, prescriptionId=pid, message=errors[pid]))
+            elif inventory_error and prescription_medicine_names(data.get(pid)):
+                results.append(PreviewResult(isSuccess=False, prescriptionId=pid, message=inventory_error))
+            else:
+                results.append(build_preview(pid, data.get(pid), inventory_by_name))
+        return results
 
 @strawberry.type
 class Mutation:
@@ -199,7 +1076,8 @@ class Mutation:
         self, 
         info,
         payment_amount: float, 
-        prescription_id: str
+        prescription_id: str,
+        idempotency_key: Optional[str] = None
     ) -> str:
         user = info.context.get("user")
         if not user:
@@ -207,142 +1085,112 @@ class Mutation:
         
         token = info.context.get("token") # Kita simpan raw token juga di context
         headers = {"Authorization": f"Bearer {token}"} if token else {}
-        
-        # 1. Validasi & Ambil Resep (GraphQL API)
-        prescription_medicines = []
-        async with httpx.AsyncClient() as client:
-            try:
-                query = """
-                query validate($id: String!) {
-                    validatePrescription(id: $id) {
-                        isValid
-                        medicines {
-                            name
-                            qty
-                        }
-                    }
-                }
-                """
-                resp = await client.post(
-                    HOSPITAL_URL, 
-                    json={"query": query, "variables": {"id": prescription_id}},
-                    timeout=10.0
-                )
-                if resp.status_code != 200: return "Error: Gagal koneksi ke Hospital Service"
-                
-                payload = resp.json()
-                data = payload.get("data", {}).get("validatePrescription")
-                
-                if not data or not data.get("isValid"):
-                    return "Error: Resep tidak valid"
-                    
-                prescription_medicines = data.get('medicines', [])
-            except Exception as e: return f"Error: {str(e)}"
-
-        # 2. Cek Inventory, Hitung Total & Siapkan Update Stok
-        total_price = 0
-        items_to_deduct = [] # List of tuples (id, qty)
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                inv_query = {"query": "query { medicines { id price stock name } }"}
-                inv_res = await client.post(INVENTORY_URL, json=inv_query, headers=headers)
-                inventory_medicines = inv_res.json()['data']['medicines']
-                
-                for item in prescription_medicines:
-                    name = item.get('name', '')
-                    qty = item.get('qty', 0)
-                    
-                    inv_item = next((m for m in inventory_medicines if m['name'].lower() == name.lower()), None)
-                    
-                    if not inv_item: return f"Error: Obat '{name}' tidak ada di katalog"
-                    if inv_item['stock'] < qty: return f"Error: Stok '{name}' tidak cukup"
-                    
-                    total_price += inv_item['price'] * qty
-                    items_to_deduct.append({
-                        "id": inv_item['id'],
-                        "qty": qty,
-                        "name": inv_item['name']
-                    })
-                    
-            except Exception as e: return f"Error Inventory: {str(e)}"
-
-        # 3. Validasi Pembayaran
-        if payment_amount < total_price:
-            return f"Error: Pembayaran Kurang. Total: Rp {total_price:,.0f}"
-
-        # 4. Eksekusi Potong Stok
-        async with httpx.AsyncClient() as client:
-            try:
-                for item in items_to_deduct:
-                    # Mutation updateStock expects amount to add, so we send negative
-                    deduct_amount = -1 * item['qty']
-                    mutation = f"mutation {{ updateStock(id: \"{item['id']}\", amount: {deduct_amount}) }}"
-                    await client.post(INVENTORY_URL, json={"query": mutation}, headers=headers)
-            except Exception: return "Error: Gagal update stok"
-
-        # 5. Simpan Transaksi
-        success_msg = ""
-        try:
-            conn = sqlite3.connect("transaction_db.sqlite")
-            conn.execute("INSERT INTO transactions (prescription_id, total_price, status) VALUES (?, ?, ?)", (prescription_id, total_price, "PAID"))
-            conn.commit()
-            conn.close()
-            
-            item_summary = ", ".join([f"{x['qty']}x {x['name']}" for x in items_to_deduct])
-            success_msg = f"Sukses! {item_summary}. Kembalian: Rp {payment_amount - total_price:,.0f}"
-        except Exception as e: return f"Error Database: {str(e)}"
-        
-        # 6. Update Status Resep ke Hospital Service (processed)
-        # Kita lakukan secara async dan tidak membatalkan transaksi jika gagal (Best Effort)
-        async with httpx.AsyncClient() as client:
-            try:
-                mutation_update = """
-                mutation UpdateStatus($id: String!, $status: String!) {
-                    updatePrescriptionStatus(id: $id, status: $status) {
-                        success
-                        message
-                    }
-                }
-                """
-                
-                # Gunakan HOSPITAL_URL yang sudah dikonfigurasi (pastikan mengarah ke /records/graphql)
-                await client.post(
-                    HOSPITAL_URL, 
-                    json={
-                        "query": mutation_update, 
-                        "variables": {
-                            "id": prescription_id,
-                            "status": "processed"
-                        }
-                    },
-                    timeout=5.0
-                )
-            except Exception as e:
-                # Log error tapi jangan raise exception agar transaksi tetap dianggap sukses
-                print(f"Warning: Gagal update status prescription ke Hospital: {str(e)}")
+        user_id = str(user.get("sub"))
+
+        # Submit ulang dengan idempotency key yang sama: kembalikan hasil yang tersimpan
+        if idempotency_key:
+            existing = await db.run(lambda: idempotency.claim_key(db.connection(), user_id, idempotency_key, prescription_id))
+            if existing is not None:
+                if existing["prescription_id"] != prescription_id:
+                    return "Error: Idempotency key sudah dipakai untuk resep lain"
+                if existing["status"] == idempotency.DONE:
+                    return existing["response"]
+                return "Error: Transaksi dengan idempotency key ini sedang diproses"
 
-        return success_msg
+        # Double submit yang identik (user, nominal & key sama) untuk resep yang sedang diproses:
+        # tunggu hasil yang sama. Submit lain untuk resep itu ditolak sampai checkout pertama selesai,
+        # agar tidak menerima struk/kembalian milik pembayaran orang lain.
+        submit = (user_id, payment_amount, idempotency_key)
+        running = checkouts_in_flight.get(prescription_id)
+        if running is None:
+            inflight = asyncio.ensure_future(run_checkout(headers, payment_amount, prescription_id, user_id, idempotency_key))
+            checkouts_in_flight[prescription_id] = (submit, inflight)
+            inflight.add_done_callback(lambda _: checkouts_in_flight.pop(prescription_id, None))
+        elif running[0] == submit:
+            inflight = running[1]
+        else:
+            if idempotency_key:
+                await db.run(lambda: idempotency.release_key(db.connection(), user_id, idempotency_key))
+            return "Error: Resep ini sedang diproses oleh checkout lain, coba lagi sebentar"
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
-async def get_context(request: Request):
-    auth = request.headers.get("Authorization")
-    if auth:
         try:
-            token = auth.replace("Bearer ", "")
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            return {"user": payload, "token": token}
-        except: pass
-    return {"user": None, "token": None}
+            paid, message = await asyncio.shield(inflight)
+        except BaseException:
+            if idempotency_key:
+                await db.run(lambda: idempotency.release_key(db.connection(), user_id, idempotency_key))
+            raise
+
+        if idempotency_key:
+            if paid:
+                await db.run(lambda: idempotency.complete_key(db.connection(), user_id, idempotency_key, message))
+            else:
+                await db.run(lambda: idempotency.release_key(db.connection(), user_id, idempotency_key))
+        return message
+
+@strawberry.type
+class Subscription:
+    @strawberry.subscription
+    async def transaction_events(self) -> AsyncGenerator[TransactionEvent, None]:
+        # Transaksi PAID baru dan pembatalan, sebagai delta pendapatan untuk dashboard
+        async for event in broadcaster.subscribe(TRANSACTION_EVENTS):
+            yield event
 
-app = FastAPI()
+schema = strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription, extensions=document_cache_extensions() + [MetricsExtension, TracingExtension])
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TracingMiddleware, service="transaction-service")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 from fastapi.responses import RedirectResponse
 @app.get("/")
 def root():
     return RedirectResponse(url="/graphql")
-app.include_router(GraphQLRouter(schema, context_getter=get_context), prefix="/graphql")
+app.include_router(PersistedQueryRouter(schema, context_getter=get_auth_context), prefix="/graphql")
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+@app.get("/transactions/export")
+async def export_transactions(
+    request: Request,
+    format: str = "ndjson",
+    date_from: Optional[str] = QueryParam(None, alias="from"),
+    date_to: Optional[str] = QueryParam(None, alias="to")
+):
+    # Export histori (lama ke baru) halaman demi halaman: memori konstan, bisa jutaan baris.
+    # Query string: ?format=ndjson|csv&from=YYYY-MM-DD&to=YYYY-MM-DD
+    context = await get_auth_context(request)
+    if not can_read_ledger(context.get("user")):
+        return Response("Unauthorized: Hanya Admin/Apoteker yang boleh akses", status_code=401)
+    if format not in EXPORT_MEDIA_TYPES:
+        return Response("format harus ndjson atau csv", status_code=400)
+    try:
+        parse_date_range(date_from, date_to)
+    except ValueError as e:
+        return Response(str(e), status_code=400)
+
+    async def pages():
+        after = None
+        first_page = True
+        while True:
+            rows, items, after, has_next = await db.run(lambda: ledger.fetch_page(
+                db.connection(), ledger.EXPORT_PAGE_SIZE, after, date_from, date_to, descending=False
+            ))
+            if format == "csv":
+                yield ledger.csv_chunk(rows, items, header=first_page)
+            elif rows:
+                yield "".join(ledger.ndjson_lines(rows, items))
+            first_page = False
+            if not has_next:
+                return
+
+    filename = f"transactions-{date_from or 'awal'}-{date_to or 'akhir'}.{format}"
+    return StreamingResponse(
+        pages(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+app.add_route("/metrics", metrics_endpoint)
+app.add_route("/traces", traces_endpoint)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,188 @@
+import asyncio
+import time
+
+# Replika katalog Inventory di memori (index nama lowercase) untuk preview dan checkout.
+# Replika dibangun dari snapshot lalu mengikuti change feed Inventory (changesSince(seq)),
+# jadi pembacaan harga/stok tidak perlu round trip ke Inventory. Stok tetap divalidasi
+# ulang secara atomic oleh deductStockBatch, replika hanya untuk membaca.
+#
+# Staleness: lag = detik sejak replika terakhir dipastikan sampai di head feed. Jika lag
+# melebihi max_lag (Inventory tidak bisa dihubungi, loop tertinggal), lookup() return None
+# dan pemanggil harus query Inventory langsung.
+
+SNAPSHOT_QUERY = """
+query CatalogSnapshot($afterId: Int!, $first: Int!) {
+    catalogSnapshot(afterId: $afterId, first: $first) {
+        items { id name stock price category }
+        lastId
+        hasMore
+    }
+}
+"""
+
+CHANGE_FEED_HEAD_QUERY = """
+query ChangeFeedHead {
+    changeFeedHead
+}
+"""
+
+CHANGES_SINCE_QUERY = """
+query ChangesSince($seq: Int!, $limit: Int!) {
+    changesSince(seq: $seq, limit: $limit) {
+        changes { seq kind id name stock price category }
+        lastSeq
+        headSeq
+        hasMore
+        resetRequired
+    }
+}
+"""
+
+
+class CatalogReplica:
+    """fetch: async fn(operation, query, variables) -> field `data` dari Inventory."""
+
+    def __init__(self, fetch, poll_interval=1.0, max_lag=5.0, page_size=1000, snapshot_page_size=5000, on_sync=None):
+        self.fetch = fetch
+        self.poll_interval = poll_interval
+        self.max_lag = max_lag
+        self.page_size = page_size
+        self.snapshot_page_size = snapshot_page_size
+        self.on_sync = on_sync
+        self.by_id = {}
+        self._names = {}  # nama lowercase -> set id (nama obat tidak dijamin unik)
+        self.seq = None  # None: belum pernah bootstrap
+        self.head_seq = 0
+        self.synced_at = None  # time.monotonic() saat terakhir sampai di head feed
+        self.snapshots = 0
+        self.last_error = None
+        self._wake = None
+        self._task = None
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        # Minta sinkron segera (mis. setelah stok dipotong) tanpa menunggu interval polling
+        if self._wake is not None:
+            self._wake.set()
+
+    def lag_seconds(self):
+        return None if self.synced_at is None else time.monotonic() - self.synced_at
+
+    def is_fresh(self):
+        lag = self.lag_seconds()
+        return lag is not None and lag <= self.max_lag
+
+    def lookup(self, names):
+        """Return dict nama lowercase -> data obat (format medicinesByNames), atau None jika replika basi."""
+        if not self.is_fresh():
+            return None
+        result = {}
+        for name in names:
+            ids = self._names.get(name.lower())
+            if ids:
+                medicine = self.by_id[max(ids, key=int)]
+                result[medicine["name"].lower()] = medicine
+        return result
+
+    def stats(self):
+        lag = self.lag_seconds()
+        return {
+            "ready": self.seq is not None,
+            "fresh": self.is_fresh(),
+            "medicines": len(self.by_id),
+            "seq": self.seq or 0,
+            "headSeq": self.head_seq,
+            "lagSeconds": lag,
+            "snapshots": self.snapshots,
+            "lastError": self.last_error,
+        }
+
+    def _put(self, medicine):
+        self._remove(medicine["id"])
+        self.by_id[medicine["id"]] = medicine
+        self._names.setdefault(medicine["name"].lower(), set()).add(medicine["id"])
+
+    def _remove(self, medicine_id):
+        old = self.by_id.pop(medicine_id, None)
+        if old is not None:
+            ids = self._names.get(old["name"].lower())
+            if ids is not None:
+                ids.discard(medicine_id)
+                if not ids:
+                    del self._names[old["name"].lower()]
+
+    def apply(self, change):
+        if change["kind"] == "DELETED":
+            self._remove(change["id"])
+        else:
+            self._put({k: change[k] for k in ("id", "name", "stock", "price", "category")})
+
+    async def bootstrap(self):
+        # Head dicatat sebelum snapshot: perubahan selama snapshot diputar ulang lewat feed
+        # (isi feed adalah keadaan setelah perubahan, jadi memutar ulang aman)
+        head = (await self.fetch("changeFeedHead", CHANGE_FEED_HEAD_QUERY, {}))["changeFeedHead"]
+        medicines = []
+        after_id = 0
+        while True:
+            page = (await self.fetch(
+                "catalogSnapshot", SNAPSHOT_QUERY, {"afterId": after_id, "first": self.snapshot_page_size}
+            ))["catalogSnapshot"]
+            medicines.extend(page["items"])
+            if not page["hasMore"]:
+                break
+            after_id = page["lastId"]
+
+        self.by_id, self._names = {}, {}
+        for medicine in medicines:
+            self._put(medicine)
+        self.seq = head
+        self.snapshots += 1
+
+    async def catch_up(self):
+        while True:
+            page = (await self.fetch(
+                "changesSince", CHANGES_SINCE_QUERY, {"seq": self.seq, "limit": self.page_size}
+            ))["changesSince"]
+            if page["resetRequired"]:
+                # Tertinggal melewati retensi feed (atau database Inventory diganti)
+                await self.bootstrap()
+                continue
+            for change in page["changes"]:
+                self.apply(change)
+            self.seq = page["lastSeq"]
+            self.head_seq = page["headSeq"]
+            if not page["hasMore"]:
+                self.synced_at = time.monotonic()
+                return
+
+    async def _run(self):
+        while True:
+            try:
+                if self.seq is None:
+                    await self.bootstrap()
+                await self.catch_up()
+                self.last_error = None
+            except Exception as e:
+                if self.last_error is None:
+                    print(f"Warning: Replika katalog gagal sinkron dengan Inventory: {str(e)}")
+                self.last_error = f"{type(e).__name__}: {e}"
+            if self.on_sync is not None:
+                self.on_sync(self)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
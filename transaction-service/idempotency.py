@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import time
+
+# Checkout idempotent:
+# - idempotency_keys: hasil checkout per (user, key) agar submit ulang / retry mendapat hasil yang sama
+# - unique index prescription_id untuk transaksi PAID: satu resep hanya bisa dibayar sekali
+
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+# Key IN_PROGRESS yang lebih lama dari ini dianggap milik checkout yang mati (crash/restart)
+# dan boleh diklaim ulang oleh retry dengan key yang sama. Harus > durasi checkout terlama.
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+IN_PROGRESS = "IN_PROGRESS"
+DONE = "DONE"
+
+
+def init_idempotency(conn):
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(transactions)").fetchall()}
+    if "receipt" not in columns:
+        # Pesan sukses checkout disimpan agar bisa dikembalikan lagi untuk submit ulang
+        conn.execute("ALTER TABLE transactions ADD COLUMN receipt TEXT")
+    if "paid_by" not in columns:
+        # Pemilik struk: hanya submit ulang dengan (user, key) yang sama yang boleh melihatnya lagi
+        conn.execute("ALTER TABLE transactions ADD COLUMN paid_by TEXT")
+        conn.execute("ALTER TABLE transactions ADD COLUMN idempotency_key TEXT")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            prescription_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            response TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            claimed_at REAL,
+            PRIMARY KEY (user_id, key)
+        )
+    """)
+    key_columns = {r["name"] for r in conn.execute("PRAGMA table_info(idempotency_keys)").fetchall()}
+    if "claimed_at" not in key_columns:
+        # Baris lama tanpa claimed_at langsung bisa diklaim ulang
+        conn.execute("ALTER TABLE idempotency_keys ADD COLUMN claimed_at REAL")
+    conn.execute(
+        "DELETE FROM idempotency_keys WHERE created_at < datetime('now', ?)",
+        (f"-{IDEMPOTENCY_KEY_TTL_HOURS} hours",)
+    )
+
+    try:
+        conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_paid_prescription
+            ON transactions (prescription_id) WHERE status = 'PAID'
+        """)
+    except sqlite3.IntegrityError:
+        # Database lama bisa berisi resep yang terlanjur dibayar dua kali
+        print("Warning: Ada resep PAID ganda di tabel transactions, unique index belum bisa dibuat")
+
+
+def find_paid_transaction(conn, prescription_id):
+    # Return baris transaksi PAID untuk resep ini, None jika belum dibayar
+    return conn.execute(
+        "SELECT id, receipt, paid_by, idempotency_key FROM transactions WHERE prescription_id = ? AND status = 'PAID' LIMIT 1",
+        (prescription_id,)
+    ).fetchone()
+
+
+def paid_response(row, user_id, key):
+    """Return (struk_milik_pemanggil, pesan) untuk resep yang sudah dibayar.
+
+    Struk (berisi nominal bayar & kembalian) hanya dikembalikan ke submit ulang dari user dan
+    idempotency key yang sama dengan pembayaran aslinya; pemanggil lain hanya diberi tahu
+    bahwa resep sudah dibayar.
+    """
+    if key and row["receipt"] and row["paid_by"] == user_id and row["idempotency_key"] == key:
+        return True, row["receipt"]
+    return False, f"Error: Resep sudah dibayar (transaksi #{row['id']})"
+
+
+def claim_key(conn, user_id, key, prescription_id, lease_seconds=IDEMPOTENCY_LEASE_SECONDS):
+    """Catat key sebagai IN_PROGRESS. Return None jika berhasil, atau baris key yang sudah ada.
+
+    Key IN_PROGRESS untuk resep yang sama yang klaimnya lebih lama dari lease_seconds diambil alih.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT prescription_id, status, response, claimed_at FROM idempotency_keys WHERE user_id = ? AND key = ?",
+            (user_id, key)
+        ).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO idempotency_keys (user_id, key, prescription_id, status, claimed_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, key, prescription_id, IN_PROGRESS, now)
+            )
+        elif (row["status"] == IN_PROGRESS and row["prescription_id"] == prescription_id
+                and (row["claimed_at"] or 0) < now - lease_seconds):
+            conn.execute(
+                "UPDATE idempotency_keys SET claimed_at = ? WHERE user_id = ? AND key = ?", (now, user_id, key)
+            )
+            row = None
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+
+def complete_key(conn, user_id, key, response):
+    conn.execute(
+        "UPDATE idempotency_keys SET status = ?, response = ? WHERE user_id = ? AND key = ?",
+        (DONE, response, user_id, key)
+    )
+
+
+def release_key(conn, user_id, key):
+    # Checkout gagal sebelum ada perubahan data: key dilepas agar bisa dicoba lagi
+    conn.execute(
+        "DELETE FROM idempotency_keys WHERE user_id = ? AND key = ? AND status = ?",
+        (user_id, key, IN_PROGRESS)
+    )
@@ -0,0 +1,151 @@
+import base64
+import csv
+import io
+import json
+
+# Ledger transaksi: item obat per transaksi (transaction_items) ditulis di transaksi SQLite yang
+# sama dengan baris transactions, plus histori berhalaman dengan keyset (created_at, id) dan
+# export bertahap (halaman demi halaman) sehingga memori tetap konstan berapapun jumlah barisnya.
+
+MAX_PAGE_SIZE = 200
+EXPORT_PAGE_SIZE = 1000
+# Batas jumlah parameter per statement IN (...)
+LOOKUP_CHUNK = 500
+
+CSV_COLUMNS = (
+    "transaction_id", "created_at", "prescription_id", "status", "total_price",
+    "position", "medicine_id", "medicine_name", "qty", "unit_price", "subtotal",
+)
+
+
+def init_ledger(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transaction_items'"
+    ).fetchone() is not None
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_items (
+            transaction_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            medicine_id TEXT,
+            name TEXT NOT NULL,
+            qty INTEGER NOT NULL,
+            unit_price REAL,
+            subtotal REAL,
+            PRIMARY KEY (transaction_id, position)
+        ) WITHOUT ROWID
+    """)
+    # Keyset pagination histori (urut created_at, id) dengan/tanpa filter rentang tanggal
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_created_at_id ON transactions (created_at, id)")
+    if not exists:
+        # Transaksi lama: item masih ada di payload outbox potong stok (harga satuan tidak tersimpan)
+        conn.execute("""
+            INSERT OR IGNORE INTO transaction_items (transaction_id, position, medicine_id, name, qty)
+            SELECT CAST(o.aggregate_id AS INTEGER), CAST(j.key AS INTEGER),
+                   json_extract(j.value, '$.id'), json_extract(j.value, '$.name'), json_extract(j.value, '$.qty')
+            FROM outbox o, json_each(o.payload, '$.items') j
+            WHERE o.kind = 'deduct_stock' AND o.aggregate_id IN (SELECT CAST(id AS TEXT) FROM transactions)
+        """)
+
+
+def record_items(conn, transaction_id, items):
+    # items: list dict id, name, qty, price. Dipanggil di dalam transaksi pemanggil.
+    conn.executemany(
+        "INSERT INTO transaction_items (transaction_id, position, medicine_id, name, qty, unit_price, subtotal) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (transaction_id, i, str(x["id"]), x["name"], x["qty"], x["price"], x["price"] * x["qty"])
+            for i, x in enumerate(items)
+        ]
+    )
+
+
+def encode_cursor(created_at, transaction_id):
+    raw = json.dumps([created_at, transaction_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, transaction_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(created_at), int(transaction_id)
+    except (ValueError, TypeError):
+        raise ValueError("Cursor tidak valid")
+
+
+def fetch_page(conn, first, after=None, date_from=None, date_to=None, descending=True):
+    """Return (rows transaksi, dict transaction_id -> list item, end_cursor, has_next_page).
+
+    date_from/date_to: tanggal 'YYYY-MM-DD' (inklusif). descending=True: terbaru dulu.
+    """
+    first = max(1, min(first, EXPORT_PAGE_SIZE))
+    where = []
+    params = []
+    if date_from:
+        where.append("created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("created_at < date(?, '+1 day')")
+        params.append(date_to)
+    if after:
+        created_at, transaction_id = decode_cursor(after)
+        where.append(f"(created_at, id) {'<' if descending else '>'} (?, ?)")
+        params.extend([created_at, transaction_id])
+    order = "DESC" if descending else "ASC"
+    sql = "SELECT id, prescription_id, total_price, status, created_at FROM transactions"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY created_at {order}, id {order} LIMIT ?"
+    params.append(first + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    has_next_page = len(rows) > first
+    rows = rows[:first]
+    end_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows else None
+    return rows, fetch_items(conn, [r["id"] for r in rows]), end_cursor, has_next_page
+
+
+def fetch_items(conn, transaction_ids):
+    items = {tid: [] for tid in transaction_ids}
+    for start in range(0, len(transaction_ids), LOOKUP_CHUNK):
+        chunk = transaction_ids[start:start + LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        for item in conn.execute(
+            f"SELECT * FROM transaction_items WHERE transaction_id IN ({placeholders}) "
+            f"ORDER BY transaction_id, position",
+            chunk
+        ):
+            items[item["transaction_id"]].append(item)
+    return items
+
+
+def ndjson_lines(rows, items):
+    for r in rows:
+        yield json.dumps({
+            "id": r["id"],
+            "createdAt": r["created_at"],
+            "prescriptionId": r["prescription_id"],
+            "status": r["status"],
+            "totalPrice": r["total_price"],
+            "items": [
+                {"medicineId": i["medicine_id"], "name": i["name"], "qty": i["qty"],
+                 "unitPrice": i["unit_price"], "subtotal": i["subtotal"]}
+                for i in items[r["id"]]
+            ],
+        }) + "\n"
+
+
+def csv_chunk(rows, items, header=False):
+    # Satu baris per item obat; transaksi tanpa item tetap muncul satu baris dengan kolom item kosong
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_COLUMNS)
+    for r in rows:
+        head = [r["id"], r["created_at"], r["prescription_id"], r["status"], r["total_price"]]
+        lines = items[r["id"]] or [None]
+        for i in lines:
+            if i is None:
+                writer.writerow(head + [""] * 6)
+            else:
+                writer.writerow(head + [i["position"], i["medicine_id"], i["name"], i["qty"], i["unit_price"], i["subtotal"]])
+    return buffer.getvalue()
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+# Outbox: efek samping checkout (potong stok di Inventory, update status resep di Hospital)
+# dicatat di SQLite dalam transaksi yang sama dengan baris transactions, lalu dikirim oleh
+# dispatcher di background dengan retry + backoff. Baris yang macet (proses mati saat
+# mengirim) diambil ulang setelah lease habis, jadi handler harus idempotent.
+
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "30"))
+OUTBOX_BASE_BACKOFF = float(os.getenv("OUTBOX_BASE_BACKOFF", "1"))
+OUTBOX_MAX_BACKOFF = float(os.getenv("OUTBOX_MAX_BACKOFF", "300"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+PENDING = "PENDING"
+IN_FLIGHT = "IN_FLIGHT"
+DONE = "DONE"
+DEAD = "DEAD"
+
+
+class PermanentDeliveryError(Exception):
+    """Pengiriman tidak akan berhasil walau diulang (langsung DEAD)."""
+
+
+class UncertainDeliveryError(Exception):
+    """Hasil pengiriman tidak diketahui (mungkin sudah diterapkan, response hilang).
+
+    Diulang terus dengan backoff tanpa batas OUTBOX_MAX_ATTEMPTS dan tidak pernah DEAD,
+    karena kompensasi atas efek yang ternyata sudah terjadi justru membuat data tidak cocok.
+    """
+
+
+def init_outbox(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            aggregate_id TEXT,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, available_at)")
+
+
+def prune_done(conn):
+    # Dipanggil setelah migrasi yang membaca payload outbox lama (backfill ledger) selesai
+    conn.execute(
+        "DELETE FROM outbox WHERE status = ? AND created_at < datetime('now', ?)",
+        (DONE, f"-{OUTBOX_RETENTION_DAYS} days")
+    )
+
+
+def enqueue(conn, kind, payload, aggregate_id=None, delay=0.0):
+    # Dipanggil di dalam transaksi SQLite milik pemanggil
+    conn.execute(
+        "INSERT INTO outbox (kind, aggregate_id, payload, available_at) VALUES (?, ?, ?, ?)",
+        (kind, aggregate_id, json.dumps(payload), time.time() + delay)
+    )
+
+
+def claim_due(conn, limit, lease_seconds):
+    # Ambil entry yang jatuh tempo (termasuk IN_FLIGHT yang lease-nya habis) dan kunci dengan lease baru
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute("""
+            SELECT id, kind, aggregate_id, payload, attempts FROM outbox
+            WHERE status IN (?, ?) AND available_at <= ?
+            ORDER BY available_at LIMIT ?
+        """, (PENDING, IN_FLIGHT, now, limit)).fetchall()
+        if rows:
+            placeholders = ", ".join("?" for _ in rows)
+            conn.execute(
+                f"UPDATE outbox SET status = ?, available_at = ?, attempts = attempts + 1 WHERE id IN ({placeholders})",
+                [IN_FLIGHT, now + lease_seconds] + [r["id"] for r in rows]
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return [
+        {"id": r["id"], "kind": r["kind"], "aggregate_id": r["aggregate_id"],
+         "payload": json.loads(r["payload"]), "attempts": r["attempts"] + 1}
+        for r in rows
+    ]
+
+
+def mark_done(conn, entry_id):
+    conn.execute("UPDATE outbox SET status = ?, last_error = NULL WHERE id = ?", (DONE, entry_id))
+
+
+def mark_retry(conn, entry_id, delay, error):
+    conn.execute(
+        "UPDATE outbox SET status = ?, available_at = ?, last_error = ? WHERE id = ?",
+        (PENDING, time.time() + delay, error, entry_id)
+    )
+
+
+def mark_dead(conn, entry_id, error):
+    conn.execute("UPDATE outbox SET status = ?, last_error = ? WHERE id = ?", (DEAD, error, entry_id))
+
+
+def outbox_stats(conn):
+    counts = {status: 0 for status in (PENDING, IN_FLIGHT, DONE, DEAD)}
+    for row in conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"):
+        counts[row[0]] = row[1]
+    oldest = conn.execute(
+        "SELECT MIN(created_at) FROM outbox WHERE status IN (?, ?)", (PENDING, IN_FLIGHT)
+    ).fetchone()[0]
+    return counts, oldest
+
+
+def backoff_delay(attempts):
+    # Exponential backoff dengan jitter agar retry dari banyak entry tidak serentak
+    # Pangkat dibatasi agar retry tanpa batas (UncertainDeliveryError) tidak overflow
+    delay = min(OUTBOX_MAX_BACKOFF, OUTBOX_BASE_BACKOFF * (2 ** min(attempts - 1, 32)))
+    return delay * (0.5 + random.random() / 2)
+
+
+class OutboxDispatcher:
+    """Loop background yang mengirim entry outbox ke handler sesuai kind.
+
+    Handler: async fn(payload) -> None atau fungsi followup(conn). Followup dijalankan di
+    transaksi SQLite yang sama dengan penandaan DONE (mis. enqueue langkah berikutnya
+    atau kompensasi), sehingga langkah saga tidak hilang walau proses mati di tengah.
+    Followup boleh mengembalikan callback yang dipanggil di event loop setelah commit.
+
+    compensations: kind -> fn(payload, error) -> followup(conn), dijalankan di transaksi yang
+    sama dengan penandaan DEAD agar entry yang gagal permanen tidak meninggalkan data setengah jadi.
+    """
+
+    def __init__(self, db, handlers, on_delivery=None, compensations=None):
+        self.db = db
+        self.handlers = handlers
+        self.on_delivery = on_delivery
+        self.compensations = compensations or {}
+        self._wake = None
+        self._task = None
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task):
+        # Loop tidak pernah selesai sendiri; kalau sampai mati, outbox berhenti dikirim diam-diam
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error: Outbox dispatcher berhenti: {type(task.exception()).__name__}: {task.exception()}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        # Dipanggil setelah enqueue agar entry baru langsung dikirim tanpa menunggu polling
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await self._run_once()
+            except Exception as e:
+                # Satu iterasi gagal (mis. "database is locked") tidak boleh menghentikan loop
+                print(f"Warning: Outbox dispatcher error: {type(e).__name__}: {e}")
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+    async def _run_once(self):
+        try:
+            entries = await self.db.run(
+                lambda: claim_due(self.db.connection(), OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS)
+            )
+        except Exception as e:
+            print(f"Warning: Outbox dispatcher gagal membaca outbox: {str(e)}")
+            entries = []
+
+        if entries:
+            await asyncio.gather(*(self._deliver(entry) for entry in entries))
+            return
+
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _deliver(self, entry):
+        try:
+            outcome = await self._attempt(entry)
+        except Exception as e:
+            # Status entry gagal ditulis: entry tetap IN_FLIGHT dan diklaim ulang setelah lease habis
+            outcome = "error"
+            print(f"Warning: Outbox #{entry['id']} ({entry['kind']}) gagal diproses: {type(e).__name__}: {e}")
+
+        if outcome == "dead":
+            print(f"Warning: Outbox #{entry['id']} ({entry['kind']}) gagal permanen, lihat kolom last_error")
+        if self.on_delivery is not None:
+            try:
+                self.on_delivery(entry["kind"], outcome)
+            except Exception as e:
+                print(f"Warning: Outbox on_delivery error: {str(e)}")
+
+    async def _attempt(self, entry):
+        handler = self.handlers.get(entry["kind"])
+        try:
+            if handler is None:
+                raise PermanentDeliveryError(f"Tidak ada handler untuk '{entry['kind']}'")
+            followup = await handler(entry["payload"])
+        except PermanentDeliveryError as e:
+            await self._settle(entry, DEAD, str(e))
+            return "dead"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if entry["attempts"] >= OUTBOX_MAX_ATTEMPTS and not isinstance(e, UncertainDeliveryError):
+                await self._settle(entry, DEAD, error)
+                return "dead"
+            delay = backoff_delay(entry["attempts"])
+            await self.db.run(lambda: mark_retry(self.db.connection(), entry["id"], delay, error))
+            return "retry"
+
+        await self._settle(entry, DONE, followup=followup)
+        return "done"
+
+    async def _settle(self, entry, status, error=None, followup=None):
+        # Tandai DONE/DEAD bersama followup (langkah berikutnya atau kompensasi) dalam satu transaksi
+        if status == DEAD:
+            compensate = self.compensations.get(entry["kind"])
+            followup = compensate(entry["payload"], error) if compensate is not None else None
+
+        def settle():
+            with self.db.transaction() as conn:
+                after_commit = followup(conn) if followup is not None else None
+                if status == DEAD:
+                    mark_dead(conn, entry["id"], error)
+                else:
+                    mark_done(conn, entry["id"])
+            return after_commit
+        after_commit = await self.db.run(settle)
+        if after_commit is not None:
+            try:
+                after_commit()
+            except Exception as e:
+                # Entry sudah DONE/DEAD; kegagalan callback setelah commit hanya dicatat
+                print(f"Warning: Outbox #{entry['id']} callback setelah commit gagal: {str(e)}")
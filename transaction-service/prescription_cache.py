@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+
+
+class PrescriptionCache:
+    """Cache in-process hasil validasi resep dari Hospital Service.
+
+    - TTL per entry (resep valid dan tidak valid punya TTL sendiri / negative caching)
+    - Ukuran dibatasi, entry paling lama tidak dipakai dibuang duluan (LRU)
+    - Counter hit/miss untuk tuning TTL
+    - Resep valid yang sudah kedaluwarsa disimpan stale_ttl detik lagi, hanya untuk get_stale()
+      (fallback saat Hospital Service tidak bisa dihubungi)
+    """
+
+    def __init__(self, ttl=60.0, negative_ttl=10.0, max_size=1000, stale_ttl=0.0):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()  # prescription_id -> (expires_at, stale_until, data)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, prescription_id):
+        """Return (found, data). data None berarti resep tercatat tidak valid."""
+        entry = self._entries.get(prescription_id)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, stale_until, data = entry
+        now = time.monotonic()
+        if expires_at < now:
+            if stale_until < now:
+                del self._entries[prescription_id]
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(prescription_id)
+        self.hits += 1
+        return True, data
+
+    def get_stale(self, prescription_id):
+        """Return data resep valid walau TTL-nya habis (masih dalam stale_ttl), atau None."""
+        entry = self._entries.get(prescription_id)
+        if entry is None:
+            return None
+        _, stale_until, data = entry
+        if stale_until < time.monotonic():
+            return None
+        return data
+
+    def set(self, prescription_id, data):
+        ttl = self.ttl if data is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl
+        stale_until = expires_at + (self.stale_ttl if data is not None else 0)
+        self._entries[prescription_id] = (expires_at, stale_until, data)
+        self._entries.move_to_end(prescription_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, prescription_id):
+        self._entries.pop(prescription_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRatio": self.hits / total if total else 0.0,
+        }
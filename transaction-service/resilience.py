@@ -0,0 +1,243 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+import httpx
+
+# Lapisan ketahanan untuk panggilan ke upstream yang tidak kita kontrol (Hospital Service):
+# - circuit breaker: setelah beberapa kegagalan berturut-turut panggilan langsung ditolak,
+#   lalu setelah reset_timeout satu request "probe" (half-open) menentukan buka/tutup lagi
+# - retry terbatas dengan backoff + jitter, dan retry budget agar retry tidak melipatgandakan beban
+# - hedging: request kedua dikirim jika yang pertama belum selesai setelah latensi p95
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class UpstreamStatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+# Kegagalan yang dihitung breaker dan boleh di-retry
+RETRYABLE_ERRORS = (httpx.TransportError, UpstreamStatusError)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, half_open_max_calls=1, on_state_change=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.on_state_change = on_state_change
+        self._state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state):
+        if state == self._state:
+            return
+        self._state = state
+        self._probes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self.consecutive_failures = 0
+        if self.on_state_change is not None:
+            self.on_state_change(state)
+
+    def allow(self):
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        if self._state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state == OPEN:
+                # Request yang dikirim sebelum breaker terbuka: jangan perpanjang waktu buka
+                return
+            self._transition(OPEN)
+
+    def release(self):
+        # Request dibatalkan tanpa hasil (mis. kalah hedging): slot probe dikembalikan
+        if self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+
+class RetryBudget:
+    """Token bucket retry: tiap request menambah `ratio` token, tiap retry/hedge memakai satu.
+
+    min_per_second menjamin beberapa retry tetap boleh saat trafik sepi.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, max_tokens=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._last) * self.min_per_second)
+        self._last = now
+
+    def deposit(self):
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LatencyTracker:
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def percentile(self, q):
+        # None sampai sampel cukup (hedging belum aktif di awal)
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientUpstream:
+    def __init__(
+        self, name, breaker, budget, max_attempts=3, base_backoff=0.2, max_backoff=2.0,
+        deadline=None, hedge_quantile=0.95, hedge_min_delay=0.05, on_event=None
+    ):
+        self.name = name
+        self.breaker = breaker
+        self.budget = budget
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.on_event = on_event
+        self.latencies = LatencyTracker()
+
+    def _event(self, event):
+        if self.on_event is not None:
+            self.on_event(self.name, event)
+
+    def hedge_delay(self):
+        p = self.latencies.percentile(self.hedge_quantile)
+        return None if p is None else max(self.hedge_min_delay, p)
+
+    async def call(self, send, retry=True, hedge=False):
+        """send: fungsi tanpa argumen yang membuat coroutine request (dipanggil ulang tiap percobaan).
+
+        Return httpx.Response (status < 500). Melempar CircuitOpenError jika breaker terbuka,
+        atau error terakhir jika semua percobaan gagal.
+        """
+        started = time.monotonic()
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            attempt += 1
+            if not self.breaker.allow():
+                self._event("short_circuit")
+                raise CircuitOpenError(f"Circuit breaker {self.name} terbuka")
+            try:
+                if hedge and self.breaker.state == CLOSED:
+                    return await self._hedged(send)
+                return await self._attempt(send)
+            except RETRYABLE_ERRORS:
+                if not retry or attempt >= self.max_attempts:
+                    raise
+                delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1))) * random.uniform(0.5, 1.0)
+                if self.deadline is not None and time.monotonic() - started + delay >= self.deadline:
+                    raise
+                if not self.budget.withdraw():
+                    self._event("budget_exhausted")
+                    raise
+                self._event("retry")
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, send):
+        start = time.monotonic()
+        try:
+            resp = await send()
+        except RETRYABLE_ERRORS:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Dibatalkan (mis. kalah hedging) atau error lain: bukan sinyal kesehatan upstream
+            self.breaker.release()
+            raise
+        if resp.status_code >= 500 or resp.status_code == 429:
+            self.breaker.record_failure()
+            raise UpstreamStatusError(resp.status_code)
+        self.breaker.record_success()
+        self.latencies.add(time.monotonic() - start)
+        return resp
+
+    async def _hedged(self, send):
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._attempt(send)
+
+        first = asyncio.ensure_future(self._attempt(send))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or not self.budget.withdraw():
+            return await first
+
+        self._event("hedge")
+        pending = {first, asyncio.ensure_future(self._attempt(send))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._event("hedge_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        p95 = self.latencies.percentile(0.95)
+        return {
+            "state": self.breaker.state,
+            "consecutiveFailures": self.breaker.consecutive_failures,
+            "retryTokens": self.budget.tokens,
+            "p95LatencyMs": None if p95 is None else p95 * 1000,
+        }
@@ -0,0 +1,93 @@
+import os
+import sys
+
+# Rollup pendapatan harian: satu baris per hari, di-update setiap ada transaksi PAID,
+# sehingga dashboard tidak perlu scan seluruh tabel transactions.
+
+
+def init_rollup(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_revenue (
+            day TEXT PRIMARY KEY,
+            total_transactions INTEGER NOT NULL DEFAULT 0,
+            total_revenue REAL NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_status_created_at ON transactions (status, created_at)")
+
+    # Database lama (sebelum ada rollup): isi sekali dari histori transaksi
+    empty = conn.execute("SELECT 1 FROM daily_revenue LIMIT 1").fetchone() is None
+    has_paid = conn.execute("SELECT 1 FROM transactions WHERE status = 'PAID' LIMIT 1").fetchone() is not None
+    if empty and has_paid:
+        rebuild_daily_revenue(conn)
+
+
+def record_paid_transaction(conn, transaction_id):
+    # Dipanggil di transaksi SQLite yang sama dengan INSERT ke tabel transactions
+    conn.execute("""
+        INSERT INTO daily_revenue (day, total_transactions, total_revenue)
+        SELECT date(created_at), 1, total_price FROM transactions WHERE id = ?
+        ON CONFLICT(day) DO UPDATE SET
+            total_transactions = total_transactions + excluded.total_transactions,
+            total_revenue = total_revenue + excluded.total_revenue
+    """, (transaction_id,))
+
+
+def record_cancelled_transaction(conn, transaction_id):
+    # Kebalikan record_paid_transaction, dipanggil sebelum status transaksi diubah dari PAID
+    conn.execute("""
+        UPDATE daily_revenue SET
+            total_transactions = total_transactions - 1,
+            total_revenue = total_revenue - (SELECT total_price FROM transactions WHERE id = ?)
+        WHERE day = (SELECT date(created_at) FROM transactions WHERE id = ? AND status = 'PAID')
+    """, (transaction_id, transaction_id))
+
+
+def rebuild_daily_revenue(conn):
+    # Backfill: hitung ulang seluruh rollup dari tabel transactions
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM daily_revenue")
+        conn.execute("""
+            INSERT INTO daily_revenue (day, total_transactions, total_revenue)
+            SELECT date(created_at), COUNT(*), SUM(total_price)
+            FROM transactions
+            WHERE status = 'PAID'
+            GROUP BY date(created_at)
+        """)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def load_revenue_summary(conn, since_day):
+    # Satu query: total keseluruhan + baris rollup mulai since_day
+    rows = conn.execute("""
+        SELECT t.total_transactions, t.total_revenue, d.day, d.total_revenue AS day_revenue
+        FROM (
+            SELECT COALESCE(SUM(total_transactions), 0) AS total_transactions,
+                   COALESCE(SUM(total_revenue), 0) AS total_revenue
+            FROM daily_revenue
+        ) t
+        LEFT JOIN daily_revenue d ON d.day >= ?
+        ORDER BY d.day
+    """, (since_day,)).fetchall()
+    total_transactions = rows[0]["total_transactions"]
+    total_revenue = rows[0]["total_revenue"]
+    by_day = {r["day"]: r["day_revenue"] for r in rows if r["day"] is not None}
+    return total_transactions, total_revenue, by_day
+
+
+if __name__ == "__main__":
+    # Backfill manual: python revenue.py
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from shared.db import Database
+
+    db = Database("transaction_db.sqlite")
+    conn = db.connection()
+    init_rollup(conn)
+    rebuild_daily_revenue(conn)
+    count = conn.execute("SELECT COUNT(*) FROM daily_revenue").fetchone()[0]
+    print(f"Rollup daily_revenue dibangun ulang: {count} hari")
+    db.close_all()